@@ -0,0 +1,150 @@
+import io
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, Optional, Union
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+# 内容を読み飛ばす要素
+SKIPPED_TAGS = (MC_FALLBACK, W + "pPr")
+
+# document > body > ブロック要素（段落・表など）の深さ
+BLOCK_DEPTH = 3
+
+
+class DocxExtractionEngine:
+    """
+    word/document.xml をiterparseで逐次解析し、DOCXからテキストを抽出するエンジン
+
+    - 段落と表を文書内の順序どおりに出力
+    - 横方向の結合セル（gridSpan）は1回だけ、縦方向の結合セル（vMerge）は先頭セルのみ出力
+    - 処理済みの要素は都度破棄するため、メモリ使用量は文書サイズに比例しない
+
+    - DOCX_ENGINE: "stream"（このエンジン）または "python-docx"（従来の docx.Document）
+    """
+
+    def __init__(self, engine: Optional[str] = None):
+        self.engine = (engine or os.getenv("DOCX_ENGINE", "stream")).lower()
+        if self.engine not in ("stream", "python-docx"):
+            raise ValueError(f"Unsupported DOCX engine: {self.engine}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine == "stream"
+
+    def extract_text(self, file_content: Union[bytes, str]) -> str:
+        """
+        DOCXからテキストを抽出
+
+        Args:
+            file_content: DOCXファイルのバイトデータ、または一時ファイルのパス
+
+        Returns:
+            段落と表を文書順に連結したテキスト
+        """
+        return "\n".join(self.extract_text_iter(file_content)).strip()
+
+    def extract_text_iter(self, file_content: Union[bytes, str]) -> Iterator[str]:
+        """
+        本文の段落・表を文書順に1ブロックずつ返すジェネレーター
+        """
+        if isinstance(file_content, (bytes, bytearray)):
+            file_content = io.BytesIO(file_content)
+
+        with zipfile.ZipFile(file_content) as archive:
+            with archive.open("word/document.xml") as xml_stream:
+                yield from self._iter_blocks(xml_stream)
+
+    def _iter_blocks(self, xml_stream) -> Iterator[str]:
+        body = None
+        depth = 0
+        skip_depth = 0
+        # 入れ子の段落（テキストボックス）と表に対応するためスタックで管理
+        paragraphs = []
+        tables = []
+
+        for event, elem in ET.iterparse(xml_stream, events=("start", "end")):
+            tag = elem.tag
+
+            if event == "start":
+                depth += 1
+                # 互換用の代替表現（mc:Fallback）は本体と内容が重複するため、
+                # 段落のプロパティ（w:pPr）はタブ位置の定義のw:tabを含むため読み飛ばす
+                if tag in SKIPPED_TAGS:
+                    skip_depth += 1
+                if skip_depth:
+                    continue
+
+                if tag == W + "body":
+                    body = elem
+                elif tag == W + "p":
+                    paragraphs.append([])
+                elif tag == W + "tbl":
+                    tables.append({"rows": [], "row": None, "cell": None})
+                elif tag == W + "tr" and tables:
+                    tables[-1]["row"] = []
+                elif tag == W + "tc" and tables:
+                    tables[-1]["cell"] = {"texts": [], "merged": False}
+                continue
+
+            block_end = depth == BLOCK_DEPTH
+            depth -= 1
+
+            if skip_depth:
+                if tag in SKIPPED_TAGS:
+                    skip_depth -= 1
+                continue
+
+            if tag == W + "t":
+                if paragraphs:
+                    paragraphs[-1].append(elem.text or "")
+            elif tag == W + "tab":
+                if paragraphs:
+                    paragraphs[-1].append("\t")
+            elif tag in (W + "br", W + "cr"):
+                if paragraphs:
+                    paragraphs[-1].append("\n")
+            elif tag == W + "vMerge":
+                cell = tables[-1]["cell"] if tables else None
+                if cell is not None and elem.get(W + "val", "continue") == "continue":
+                    cell["merged"] = True
+            elif tag == W + "p":
+                text = "".join(paragraphs.pop())
+                if paragraphs:
+                    # テキストボックス内の段落は外側の段落に含める
+                    paragraphs[-1].append(text)
+                elif tables and tables[-1]["cell"] is not None:
+                    tables[-1]["cell"]["texts"].append(text)
+                else:
+                    yield text
+            elif tag == W + "tc" and tables:
+                table = tables[-1]
+                cell = table["cell"]
+                if table["row"] is not None:
+                    table["row"].append("" if cell["merged"] else "\n".join(cell["texts"]))
+                table["cell"] = None
+            elif tag == W + "tr" and tables:
+                table = tables[-1]
+                table["rows"].append("\t".join(table["row"]))
+                table["row"] = None
+            elif tag == W + "tbl" and tables:
+                text = "\n".join(tables.pop()["rows"])
+                if tables and tables[-1]["cell"] is not None:
+                    tables[-1]["cell"]["texts"].append(text)
+                elif paragraphs:
+                    paragraphs[-1].append(text)
+                else:
+                    yield text
+
+            if tag in (W + "p", W + "tc", W + "tr"):
+                elem.clear()
+
+            # 本文直下のブロックを処理し終えたら、解析済みの要素を破棄
+            if block_end and body is not None:
+                body.clear()
+
+
+# グローバルなDOCX抽出エンジンインスタンス
+docx_engine = DocxExtractionEngine()
@@ -0,0 +1,164 @@
+import io
+import os
+from typing import Optional, Union
+
+import openpyxl
+
+from .parse_pool import ParsePool, parse_pool
+
+
+def _open_workbook(file_content: Union[bytes, str]):
+    if isinstance(file_content, (bytes, bytearray)):
+        file_content = io.BytesIO(file_content)
+    return openpyxl.load_workbook(file_content, read_only=True, data_only=True)
+
+
+def _format_cell(value) -> str:
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _extract_sheet(
+    file_content: Union[bytes, str],
+    sheet_name: str,
+    max_rows: int,
+    max_cols: int,
+) -> dict:
+    """
+    1シート分のテキストを行単位のストリーミングで抽出
+
+    末尾の空セルを除き、全て空の行はスキップする。行数・列数の上限を超えた部分は切り捨てる。
+    rows_truncatedは上限で打ち切った場合の残りの行数（シートの寸法がなく行数が不明な場合はNone）
+    """
+    workbook = _open_workbook(file_content)
+    try:
+        sheet = workbook[sheet_name]
+        lines = [f"シート名: {sheet_name}"]
+        rows_read = 0
+        blank_rows_skipped = 0
+        columns_truncated = False
+        rows_capped = False
+
+        for row in sheet.iter_rows(values_only=True):
+            if rows_read >= max_rows:
+                rows_capped = True
+                break
+            rows_read += 1
+
+            if len(row) > max_cols:
+                columns_truncated = columns_truncated or any(
+                    value is not None for value in row[max_cols:]
+                )
+                row = row[:max_cols]
+
+            cells = [_format_cell(value) for value in row]
+            while cells and not cells[-1].strip():
+                cells.pop()
+
+            if not cells:
+                blank_rows_skipped += 1
+                continue
+            lines.append("\t".join(cells))
+
+        # 最後まで読んだ場合は、末尾の空行・書式のみの行でシートの寸法が大きくても省略とみなさない
+        rows_truncated = 0
+        if rows_capped:
+            # read-onlyモードではシートの寸法から残りの行数を見積もる（寸法がなければ不明）
+            rows_truncated = max(sheet.max_row - rows_read, 1) if sheet.max_row else None
+            if rows_truncated is None:
+                lines.append("（行数の上限により以降の行を省略）")
+            else:
+                lines.append(f"（行数の上限により以降の{rows_truncated}行を省略）")
+
+        return {
+            "sheet_name": sheet_name,
+            "text": "\n".join(lines),
+            "rows_read": rows_read,
+            "blank_rows_skipped": blank_rows_skipped,
+            "rows_truncated": rows_truncated,
+            "columns_truncated": columns_truncated,
+        }
+    finally:
+        workbook.close()
+
+
+class ExcelExtractionEngine:
+    """
+    read-onlyモードで行を逐次読み込み、Excelからテキストを抽出するエンジン
+
+    複数シートのブックは解析プールでシートごとに並列処理する。
+
+    - EXCEL_MAX_ROWS: 1シートあたりの最大行数
+    - EXCEL_MAX_COLS: 1行あたりの最大列数
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ParsePool] = None,
+        max_rows: Optional[int] = None,
+        max_cols: Optional[int] = None,
+    ):
+        self.pool = pool if pool is not None else parse_pool
+        self.max_rows = max_rows or int(os.getenv("EXCEL_MAX_ROWS", "100000"))
+        self.max_cols = max_cols or int(os.getenv("EXCEL_MAX_COLS", "100"))
+
+    def will_parallelize(self, file_content: Union[bytes, str]) -> bool:
+        """
+        解析プールでシートごとに並列処理するか（複数シートのブック）
+        """
+        if not self.pool.parallel_enabled:
+            return False
+        workbook = _open_workbook(file_content)
+        try:
+            return len(workbook.sheetnames) > 1
+        finally:
+            workbook.close()
+
+    def extract(self, file_content: Union[bytes, str]) -> dict:
+        """
+        Excelからテキストを抽出し、シートごとの読み込み結果を返す
+
+        Args:
+            file_content: Excelファイルのバイトデータ、または一時ファイルのパス
+
+        Returns:
+            text（抽出されたテキスト）とsheets（シートごとの行数・スキップ数）の辞書
+        """
+        workbook = _open_workbook(file_content)
+        try:
+            sheet_names = list(workbook.sheetnames)
+        finally:
+            workbook.close()
+
+        if self.pool.parallel_enabled and len(sheet_names) > 1:
+            executor = self.pool.get_executor()
+            futures = [
+                executor.submit(_extract_sheet, file_content, name, self.max_rows, self.max_cols)
+                for name in sheet_names
+            ]
+            sheets = [future.result() for future in futures]
+        else:
+            sheets = [
+                _extract_sheet(file_content, name, self.max_rows, self.max_cols)
+                for name in sheet_names
+            ]
+
+        text = "\n\n".join(sheet.pop("text") for sheet in sheets).strip()
+        return {
+            "text": text,
+            "sheets": sheets,
+            "rows_skipped": sum(
+                sheet["blank_rows_skipped"] + (sheet["rows_truncated"] or 0) for sheet in sheets
+            ),
+        }
+
+    def extract_text(self, file_content: Union[bytes, str]) -> str:
+        """
+        Excelからテキストを抽出
+        """
+        return self.extract(file_content)["text"]
+
+
+# グローバルなExcel抽出エンジンインスタンス
+excel_engine = ExcelExtractionEngine()
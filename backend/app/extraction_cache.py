@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ExtractionCache:
+    """
+    ファイル内容のハッシュをキーに抽出済みテキストと抽出時の情報（report）を保持するキャッシュ
+
+    - メモリ層: テキストのバイト数で上限を設けたLRU
+    - ディスク層: 再起動後も残るSQLiteファイル（パス指定時のみ有効）
+
+    - EXTRACTION_CACHE_MAX_MB: メモリ層の上限（MB、0で無効）
+    - EXTRACTION_CACHE_PATH: ディスク層のSQLiteファイルパス（未設定でディスク層なし）
+    - EXTRACTION_CACHE_DISK_MAX_MB: ディスク層の上限（MB）
+    """
+
+    def __init__(
+        self,
+        max_memory_mb: Optional[float] = None,
+        disk_path: Optional[str] = None,
+        max_disk_mb: Optional[float] = None,
+    ):
+        if max_memory_mb is None:
+            max_memory_mb = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "64"))
+        if disk_path is None:
+            disk_path = os.getenv("EXTRACTION_CACHE_PATH") or None
+        if max_disk_mb is None:
+            max_disk_mb = float(os.getenv("EXTRACTION_CACHE_DISK_MAX_MB", "1024"))
+
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.disk_path = disk_path
+
+        self._memory: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+        self._memory_sizes = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._evictions_memory = 0
+        self._evictions_disk = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.disk_path:
+            self._init_disk()
+
+    @property
+    def disk_enabled(self) -> bool:
+        return self._conn is not None
+
+    @staticmethod
+    def make_key(file_content: bytes, file_extension: str) -> str:
+        """
+        ファイル内容のSHA-256と拡張子からキャッシュキーを作成
+        """
+        return ExtractionCache.make_key_from_digest(
+            hashlib.sha256(file_content).hexdigest(), file_extension
+        )
+
+    @staticmethod
+    def make_key_from_file(path: str, file_extension: str, chunk_size: int = 1024 * 1024) -> str:
+        """
+        ファイルをチャンク単位で読み込んでキャッシュキーを作成
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return ExtractionCache.make_key_from_digest(digest.hexdigest(), file_extension)
+
+    @staticmethod
+    def make_key_from_digest(sha256_hex: str, file_extension: str) -> str:
+        return f"{sha256_hex}:{file_extension.lower()}"
+
+    def _init_disk(self):
+        directory = os.path.dirname(self.disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.disk_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                cache_key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                report TEXT,
+                size INTEGER NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")]
+        if "report" not in columns:
+            self._conn.execute("ALTER TABLE extractions ADD COLUMN report TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extractions_last_accessed ON extractions (last_accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, dict]]:
+        """
+        キャッシュから(テキスト, report)を取得（ディスク層でヒットした場合はメモリ層に昇格）
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits_memory += 1
+                return entry
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT text, report FROM extractions WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE extractions SET last_accessed = ? WHERE cache_key = ?",
+                        (time.time(), key),
+                    )
+                    self._conn.commit()
+                    self._hits_disk += 1
+                    # reportの列がない頃に保存したエントリは空のreportとして扱う
+                    entry = (row[0], json.loads(row[1]) if row[1] else {})
+                    self._put_memory(key, entry[0], entry[1])
+                    return entry
+
+            self._misses += 1
+            return None
+
+    def put(self, key: str, text: str, report: Optional[dict] = None):
+        """
+        抽出したテキストと抽出時の情報をキャッシュに保存
+        """
+        report = report or {}
+        with self._lock:
+            self._put_memory(key, text, report)
+
+            if self._conn is not None:
+                report_json = json.dumps(report, ensure_ascii=False)
+                size = len(text.encode("utf-8")) + len(report_json.encode("utf-8"))
+                if size > self.max_disk_bytes:
+                    return
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extractions (cache_key, text, report, size, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, text, report_json, size, time.time()),
+                )
+                self._evict_disk()
+                self._conn.commit()
+
+    def _put_memory(self, key: str, text: str, report: dict):
+        # reportは小さいので、上限の計算はテキストのバイト数のみで行う
+        size = len(text.encode("utf-8"))
+        if size > self.max_memory_bytes:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= self._memory_sizes[key]
+        self._memory[key] = (text, report)
+        self._memory.move_to_end(key)
+        self._memory_sizes[key] = size
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_memory_bytes:
+            old_key, _ = self._memory.popitem(last=False)
+            self._memory_bytes -= self._memory_sizes.pop(old_key)
+            self._evictions_memory += 1
+
+    def _evict_disk(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        while total > self.max_disk_bytes:
+            row = self._conn.execute(
+                "SELECT cache_key, size FROM extractions ORDER BY last_accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM extractions WHERE cache_key = ?", (row[0],))
+            total -= row[1]
+            self._evictions_disk += 1
+
+    def clear(self):
+        """
+        全てのキャッシュを削除
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_sizes.clear()
+            self._memory_bytes = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM extractions")
+                self._conn.commit()
+
+    def get_stats(self) -> dict:
+        """
+        ヒット・ミス・退避の件数とメモリ使用量を取得
+        """
+        with self._lock:
+            return {
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "evictions_memory": self._evictions_memory,
+                "evictions_disk": self._evictions_disk,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_enabled": self._conn is not None,
+            }
+
+
+# グローバルな抽出キャッシュインスタンス
+extraction_cache = ExtractionCache()
@@ -0,0 +1,300 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from .file_processor import FileProcessor, FileSource
+from .extraction_cache import ExtractionCache, extraction_cache
+from .parse_pool import parse_pool
+from .pdf_engine import pdf_engine
+from .excel_engine import excel_engine
+
+
+# 1ファイル内を解析プールで並列処理する形式（ファイルが並列処理の条件を満たすかの判定）
+PARALLEL_PARSE_EXTENSIONS = {
+    '.pdf': pdf_engine.will_parallelize,
+    '.xlsx': excel_engine.will_parallelize,
+}
+
+
+def _will_parallelize(file_content: FileSource, file_extension: str) -> bool:
+    try:
+        return PARALLEL_PARSE_EXTENSIONS[file_extension](file_content)
+    except Exception:
+        # 開けないファイルはワーカー側の抽出でエラーを返す
+        return False
+
+
+class ExtractionQueueFullError(Exception):
+    """
+    抽出待ちキューが上限に達した場合の例外
+    """
+    pass
+
+
+def _warm_up_worker():
+    """
+    ワーカー起動時にパーサーライブラリを読み込んでおく
+    """
+    import PyPDF2  # noqa: F401
+    import docx  # noqa: F401
+    import openpyxl  # noqa: F401
+    import mammoth  # noqa: F401
+
+
+# ワーカー内で使い回すFileProcessor
+_worker_processor: Optional[FileProcessor] = None
+
+
+def _extract_in_worker(file_content: FileSource, file_extension: str) -> dict:
+    """
+    ワーカー上でテキスト抽出を実行（プロセスプールからpickle可能な関数として呼び出す）
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = FileProcessor()
+    return _worker_processor.extract_text_with_report(file_content, file_extension)
+
+
+class ExtractionExecutor:
+    """
+    テキスト抽出をイベントループ外のワーカープールで実行するクラス
+
+    - EXTRACTION_EXECUTOR_MODE: "process" または "thread"
+    - EXTRACTION_MAX_WORKERS: 同時に実行する抽出処理数
+    - EXTRACTION_MAX_QUEUE: ワーカー待ちとして受け付ける最大件数（超過時はExtractionQueueFullError）
+
+    processモードでも、PDF_PARALLEL_MIN_PAGES以上のPDF・複数シートのExcelは親プロセスのスレッドから実行し、
+    解析プールでページ・シート単位に並列抽出する（それ以外はワーカープロセスで抽出する）。
+    同じ内容のファイルはExtractionCacheから返し、ワーカーには投入しない。
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        cache: Optional[ExtractionCache] = None,
+    ):
+        self.cache = cache if cache is not None else extraction_cache
+        self.mode = (mode or os.getenv("EXTRACTION_EXECUTOR_MODE", "process")).lower()
+        if self.mode not in ("process", "thread"):
+            raise ValueError(f"Unsupported extraction executor mode: {self.mode}")
+
+        self.max_workers = max_workers or int(
+            os.getenv("EXTRACTION_MAX_WORKERS", str(min(4, os.cpu_count() or 1)))
+        )
+        self.max_queue = max_queue if max_queue is not None else int(
+            os.getenv("EXTRACTION_MAX_QUEUE", "32")
+        )
+
+        self._executor: Optional[Executor] = None
+        self._parallel_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        self._running = 0
+        self._rejected = 0
+        self._timings: Dict[str, dict] = {}
+        self._excel_rows_skipped = 0
+
+    def start(self):
+        """
+        ワーカープールを起動し、各ワーカーでライブラリを事前読み込みする
+        """
+        executor = self._get_executor()
+        # 全ワーカーを起動させるため、ワーカー数分のウォームアップを投入
+        futures = [executor.submit(_warm_up_worker) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        """
+        ワーカープールを停止
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._parallel_executor is not None:
+                self._parallel_executor.shutdown(wait=False, cancel_futures=True)
+                self._parallel_executor = None
+        parse_pool.shutdown()
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        initializer=_warm_up_worker,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="extraction",
+                        initializer=_warm_up_worker,
+                    )
+            return self._executor
+
+    async def _get_executor_for(self, file_content: FileSource, file_extension: str) -> Executor:
+        """
+        抽出に使うワーカープールを選択
+
+        解析プールで並列処理するファイルのみ親プロセスのスレッドで実行し（解析自体は解析プールのプロセスで行う）、
+        それ以外は親プロセスでGILを保持したまま解析しないようワーカープロセスで実行する
+        """
+        if (
+            self.mode == "process"
+            and file_extension in PARALLEL_PARSE_EXTENSIONS
+            and parse_pool.parallel_enabled
+            and await asyncio.get_running_loop().run_in_executor(
+                None, _will_parallelize, file_content, file_extension
+            )
+        ):
+            with self._executor_lock:
+                if self._parallel_executor is None:
+                    self._parallel_executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="parallel-extraction",
+                    )
+                return self._parallel_executor
+        return self._get_executor()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    async def extract_text(
+        self,
+        file_content: FileSource,
+        file_extension: str,
+        content_hash: Optional[str] = None,
+    ) -> str:
+        """
+        ワーカープール上でテキストを抽出
+
+        Args:
+            file_content: ファイルのバイトデータ、または一時ファイルのパス
+            file_extension: ファイル拡張子
+            content_hash: 計算済みのファイル内容のSHA-256（省略時はここで計算）
+
+        Returns:
+            抽出されたテキスト
+        """
+        result = await self.extract(file_content, file_extension, content_hash)
+        return result["text"]
+
+    async def extract(
+        self,
+        file_content: FileSource,
+        file_extension: str,
+        content_hash: Optional[str] = None,
+    ) -> dict:
+        """
+        ワーカープール上でテキストを抽出し、抽出時の情報も返す
+
+        Returns:
+            text（抽出されたテキスト）、report（抽出時の情報）、cached（キャッシュから返したか）の辞書
+        """
+        file_extension = file_extension.lower()
+        loop = asyncio.get_running_loop()
+
+        # ハッシュ計算とディスク層の参照はループ外で行う
+        cache_key, cached = await loop.run_in_executor(
+            None, self._lookup_cache, file_content, file_extension, content_hash
+        )
+        if cached is not None:
+            cached_text, cached_report = cached
+            return {"text": cached_text, "report": cached_report, "cached": True}
+
+        semaphore = self._get_semaphore()
+
+        # 空きワーカーがなく、待ちキューも満杯なら受け付けない
+        if semaphore.locked() and self._queued >= self.max_queue:
+            self._rejected += 1
+            raise ExtractionQueueFullError("Extraction queue is full")
+
+        self._queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._running += 1
+        start_time = time.perf_counter()
+        succeeded = False
+        try:
+            result = await loop.run_in_executor(
+                await self._get_executor_for(file_content, file_extension),
+                _extract_in_worker,
+                file_content,
+                file_extension,
+            )
+            succeeded = True
+        finally:
+            self._running -= 1
+            semaphore.release()
+            self._record_timing(file_extension, time.perf_counter() - start_time, succeeded)
+
+        self._excel_rows_skipped += result["report"].get("rows_skipped", 0)
+        await loop.run_in_executor(None, self.cache.put, cache_key, result["text"], result["report"])
+        return {"text": result["text"], "report": result["report"], "cached": False}
+
+    def _lookup_cache(
+        self,
+        file_content: FileSource,
+        file_extension: str,
+        content_hash: Optional[str],
+    ) -> Tuple[str, Optional[Tuple[str, dict]]]:
+        if content_hash:
+            cache_key = self.cache.make_key_from_digest(content_hash, file_extension)
+        elif isinstance(file_content, (bytes, bytearray)):
+            cache_key = self.cache.make_key(file_content, file_extension)
+        else:
+            cache_key = self.cache.make_key_from_file(file_content, file_extension)
+        return cache_key, self.cache.get(cache_key)
+
+    def _record_timing(self, file_extension: str, elapsed: float, succeeded: bool):
+        stats = self._timings.setdefault(file_extension, {
+            "count": 0,
+            "errors": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+        })
+        stats["count"] += 1
+        if not succeeded:
+            stats["errors"] += 1
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def get_stats(self) -> dict:
+        """
+        キューの状況と形式別の処理時間を取得
+        """
+        timings = {}
+        for extension, stats in self._timings.items():
+            timings[extension] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "avg_seconds": round(stats["total_seconds"] / stats["count"], 4),
+                "max_seconds": round(stats["max_seconds"], 4),
+            }
+
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queue_depth": self._queued,
+            "rejected": self._rejected,
+            "timings": timings,
+            "excel_rows_skipped": self._excel_rows_skipped,
+        }
+
+
+# グローバルな抽出エグゼキューターインスタンス
+extraction_executor = ExtractionExecutor()
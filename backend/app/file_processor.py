@@ -1,58 +1,108 @@
 import io
-import PyPDF2
 import docx
-import openpyxl
 import mammoth
-from typing import Union
+from typing import BinaryIO, Iterator, Union
+
+from .pdf_engine import pdf_engine
+from .excel_engine import excel_engine
+from .docx_engine import docx_engine
+
+# ファイルのバイトデータ、またはスプールされた一時ファイルのパス
+FileSource = Union[bytes, str]
+
+def open_source(file_content: FileSource) -> BinaryIO:
+    """
+    バイトデータまたはファイルパスから読み込み用のストリームを開く（バイトデータはコピーしない）
+    """
+    if isinstance(file_content, (bytes, bytearray)):
+        return io.BytesIO(file_content)
+    return open(file_content, 'rb')
 
 class FileProcessor:
     """
     各種ファイル形式からテキストを抽出するクラス
     """
     
-    def extract_text(self, file_content: bytes, file_extension: str) -> str:
+    def extract_text(self, file_content: FileSource, file_extension: str) -> str:
         """
         ファイル形式に応じてテキストを抽出
         
         Args:
-            file_content: ファイルのバイトデータ
+            file_content: ファイルのバイトデータ、または一時ファイルのパス
             file_extension: ファイル拡張子 (.pdf, .docx, .doc, .xlsx, .xls)
             
         Returns:
             抽出されたテキスト
         """
+        return self.extract_text_with_report(file_content, file_extension)["text"]
+
+    def extract_text_with_report(self, file_content: FileSource, file_extension: str) -> dict:
+        """
+        ファイル形式に応じてテキストを抽出し、抽出時の情報（Excelのスキップ行数など）も返す
+        
+        Args:
+            file_content: ファイルのバイトデータ、または一時ファイルのパス
+            file_extension: ファイル拡張子 (.pdf, .docx, .doc, .xlsx, .xls)
+            
+        Returns:
+            text（抽出されたテキスト）とreport（抽出時の情報）の辞書
+        """
         try:
+            report = {}
             if file_extension.lower() == '.pdf':
-                return self._extract_from_pdf(file_content)
+                text = self._extract_from_pdf(file_content)
             elif file_extension.lower() in ['.docx']:
-                return self._extract_from_docx(file_content)
+                text = self._extract_from_docx(file_content)
             elif file_extension.lower() in ['.doc']:
-                return self._extract_from_doc(file_content)
+                text = self._extract_from_doc(file_content)
             elif file_extension.lower() in ['.xlsx', '.xls']:
-                return self._extract_from_excel(file_content)
+                report = self._extract_from_excel(file_content)
+                text = report.pop("text")
             else:
                 raise ValueError(f"Unsupported file extension: {file_extension}")
+            return {"text": text, "report": report}
         except Exception as e:
             raise Exception(f"Error extracting text from {file_extension} file: {str(e)}")
 
-    def _extract_from_pdf(self, file_content: bytes) -> str:
-        """PDFファイルからテキストを抽出"""
+    def extract_text_iter(self, file_content: FileSource, file_extension: str) -> Iterator[str]:
+        """
+        テキストを抽出できた部分から順に返す
+
+        PDFはページ単位、その他の形式はファイル全体を1つのテキストとして返す
+
+        Args:
+            file_content: ファイルのバイトデータ、または一時ファイルのパス
+            file_extension: ファイル拡張子 (.pdf, .docx, .doc, .xlsx, .xls)
+        """
+        if file_extension.lower() == '.pdf':
+            try:
+                yield from pdf_engine.extract_text_iter(file_content)
+            except Exception as e:
+                raise Exception(f"Error extracting text from {file_extension} file: PDF reading error: {str(e)}")
+        else:
+            yield self.extract_text(file_content, file_extension)
+
+    def _extract_from_pdf(self, file_content: FileSource) -> str:
+        """PDFファイルからテキストを抽出（ページ並列エンジンを使用）"""
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            text = ""
-            
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            
-            return text.strip()
+            return pdf_engine.extract_text(file_content)
         except Exception as e:
             raise Exception(f"PDF reading error: {str(e)}")
 
-    def _extract_from_docx(self, file_content: bytes) -> str:
-        """DOCXファイルからテキストを抽出"""
+    def _extract_from_docx(self, file_content: FileSource) -> str:
+        """DOCXファイルからテキストを抽出（DOCX_ENGINEで抽出方式を選択）"""
+        if docx_engine.enabled:
+            try:
+                return docx_engine.extract_text(file_content)
+            except Exception as e:
+                raise Exception(f"DOCX reading error: {str(e)}")
+        return self._extract_from_docx_document(file_content)
+
+    def _extract_from_docx_document(self, file_content: FileSource) -> str:
+        """DOCXファイルからテキストを抽出（python-docxを使用）"""
         try:
-            doc = docx.Document(io.BytesIO(file_content))
+            with open_source(file_content) as stream:
+                doc = docx.Document(stream)
             text = ""
             
             # 段落のテキストを抽出
@@ -70,49 +120,35 @@ class FileProcessor:
         except Exception as e:
             raise Exception(f"DOCX reading error: {str(e)}")
 
-    def _extract_from_doc(self, file_content: bytes) -> str:
+    def _extract_from_doc(self, file_content: FileSource) -> str:
         """DOCファイルからテキストを抽出（mammothを使用）"""
         try:
-            result = mammoth.extract_raw_text(io.BytesIO(file_content))
+            with open_source(file_content) as stream:
+                result = mammoth.extract_raw_text(stream)
             return result.value.strip()
         except Exception as e:
             raise Exception(f"DOC reading error: {str(e)}")
 
-    def _extract_from_excel(self, file_content: bytes) -> str:
-        """Excelファイルからテキストを抽出"""
+    def _extract_from_excel(self, file_content: FileSource) -> dict:
+        """Excelファイルからテキストを抽出（read-onlyモードのストリーミングエンジンを使用）"""
         try:
-            workbook = openpyxl.load_workbook(io.BytesIO(file_content), data_only=True)
-            text = ""
-            
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                text += f"シート名: {sheet_name}\n"
-                
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = []
-                    for cell in row:
-                        if cell is not None:
-                            row_text.append(str(cell))
-                    if row_text:
-                        text += "\t".join(row_text) + "\n"
-                text += "\n"
-            
-            return text.strip()
+            return excel_engine.extract(file_content)
         except Exception as e:
             raise Exception(f"Excel reading error: {str(e)}")
 
-    def validate_file_size(self, file_content: bytes, max_size_mb: int = 10) -> bool:
+    def validate_file_size(self, file_content: Union[bytes, int], max_size_mb: int = 10) -> bool:
         """
         ファイルサイズの検証
         
         Args:
-            file_content: ファイルのバイトデータ
+            file_content: ファイルのバイトデータ、またはバイト数
             max_size_mb: 最大サイズ（MB）
             
         Returns:
             サイズが許可範囲内かどうか
         """
-        file_size_mb = len(file_content) / (1024 * 1024)
+        file_size = file_content if isinstance(file_content, int) else len(file_content)
+        file_size_mb = file_size / (1024 * 1024)
         return file_size_mb <= max_size_mb
 
     def get_file_info(self, file_content: bytes, filename: str) -> dict:
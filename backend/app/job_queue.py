@@ -0,0 +1,416 @@
+import os
+import json
+import socket
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+import functools
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# ジョブの関数に渡す進捗通知（進捗率0〜100, メッセージ）
+ProgressCallback = Callable[[int, str], None]
+JobFunction = Callable[[ProgressCallback], Awaitable[dict]]
+
+
+class JobQueueFullError(Exception):
+    """
+    待機中のジョブ数が上限に達している
+    """
+
+
+class MemoryJobStore:
+    """
+    プロセス内のdictにジョブを保持するストア
+    """
+
+    # I/Oを伴わない（イベントループ上で直接呼び出せる）
+    blocking = False
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: dict):
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            return self._jobs.pop(job_id, None) is not None
+
+    def delete_expired(self, now: float) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.get("expires_at") is not None and job["expires_at"] <= now
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+    def list_unfinished(self) -> List[dict]:
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job["status"] in ("queued", "running")]
+
+
+class SQLiteJobStore:
+    """
+    SQLiteファイルにジョブを保持するストア（再起動後も完了したジョブの結果を取得できる）
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at)")
+        self._conn.commit()
+
+    def save(self, job: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, expires_at) VALUES (?, ?, ?)",
+                (job["job_id"], json.dumps(job, ensure_ascii=False), job.get("expires_at")),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def delete_expired(self, now: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def list_unfinished(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM jobs WHERE json_extract(data, '$.status') IN ('queued', 'running')"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+class JobQueue:
+    """
+    生成処理をHTTPリクエストから切り離して実行するジョブキュー
+
+    投入されたジョブはjob_idをすぐに返し、上限付きのワーカーが順に実行する。
+    状態（queued / running / succeeded / failed）・進捗・結果はストアに保存し、
+    完了したジョブはJOB_RESULT_TTL秒後に削除する。
+    SQLiteに保存する場合、ストアへのアクセスはスレッドプールで実行し、進捗の書き込みはジョブごとにまとめる
+
+    - JOB_WORKERS: 同時に実行するジョブ数
+    - JOB_MAX_QUEUE: 待機できるジョブ数の上限（超過時はJobQueueFullError）
+    - JOB_RESULT_TTL: 完了したジョブの保持期間（秒）
+    - JOB_STORE_PATH: ジョブを保存するSQLiteファイルパス（未設定でプロセス内に保持）
+    """
+
+    # 未完了のジョブの保持期間（秒、再起動などで失われたジョブもこの期間が過ぎると削除する）
+    STALE_JOB_TTL = 24 * 60 * 60
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        result_ttl: Optional[float] = None,
+        store_path: Optional[str] = None,
+    ):
+        if workers is None:
+            workers = int(os.getenv("JOB_WORKERS", "4"))
+        if max_queue is None:
+            max_queue = int(os.getenv("JOB_MAX_QUEUE", "100"))
+        if result_ttl is None:
+            result_ttl = float(os.getenv("JOB_RESULT_TTL", "3600"))
+        if store_path is None:
+            store_path = os.getenv("JOB_STORE_PATH") or None
+
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.store = SQLiteJobStore(store_path) if store_path else MemoryJobStore()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._functions: Dict[str, JobFunction] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._submitted = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._rejected = 0
+        # ジョブID → 未書き込みの進捗 / 書き込み中のタスク
+        self._pending_progress: Dict[str, dict] = {}
+        self._progress_writers: Dict[str, asyncio.Task] = {}
+        # ジョブを実行したプロセス（再起動で中断したジョブの判定に使う）
+        self._owner = {"host": socket.gethostname(), "pid": os.getpid()}
+
+    async def _call(self, func, *args):
+        """
+        ストアの処理を実行（SQLiteはスレッドプールで実行し、イベントループをブロックしない）
+        """
+        if not self.store.blocking:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+    def start(self):
+        """
+        ワーカーを起動（イベントループ上で呼び出す）
+        """
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._cleanup_loop()))
+
+    async def shutdown(self):
+        """
+        ワーカーを停止（未完了のジョブは失敗として記録）
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        for job_id in list(self._functions):
+            await self._finish(job_id, error="Server shut down before the job finished")
+        self._functions.clear()
+
+    async def recover_interrupted_jobs(self) -> int:
+        """
+        再起動・クラッシュで中断したジョブ（待機中・実行中のまま残ったもの）を失敗として記録（起動時に呼び出す）
+
+        同じホストで実行中の別のプロセスのジョブは対象外とする（他のホストのジョブは判定できないため残す）
+        """
+        return await self._call(self._recover_interrupted_jobs)
+
+    def _recover_interrupted_jobs(self) -> int:
+        now = time.time()
+        recovered = 0
+        for job in self.store.list_unfinished():
+            owner = job.get("owner") or {}
+            if owner.get("host") != self._owner["host"] or self._process_alive(owner.get("pid")):
+                continue
+            job.update(
+                status="failed",
+                progress=None,
+                message="失敗",
+                error="Job was interrupted by a server restart",
+                finished_at=now,
+                expires_at=now + self.result_ttl,
+            )
+            self.store.save(job)
+            recovered += 1
+        return recovered
+
+    def _process_alive(self, pid: Optional[int]) -> bool:
+        if pid is None:
+            return False
+        if pid == self._owner["pid"]:
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    async def submit(self, kind: str, func: JobFunction, metadata: Optional[dict] = None) -> dict:
+        """
+        ジョブを投入し、投入直後のジョブ情報を返す
+
+        Args:
+            kind: ジョブの種類（生成するセクション名など）
+            func: 進捗通知を受け取り、結果のdictを返す非同期関数
+            metadata: ジョブ情報に含める付加情報（ファイル名・セッションIDなど）
+        """
+        if self._queue is None:
+            raise RuntimeError("JobQueue is not started")
+        if self._queue.qsize() >= self.max_queue:
+            self._rejected += 1
+            raise JobQueueFullError(f"Too many queued jobs (limit: {self.max_queue})")
+
+        now = time.time()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "kind": kind,
+            "status": "queued",
+            "progress": 0,
+            "message": "待機中",
+            "metadata": metadata or {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": now + self.STALE_JOB_TTL,
+            "owner": self._owner,
+        }
+        await self._call(self.store.save, job)
+        self._functions[job["job_id"]] = func
+        self._queue.put_nowait(job["job_id"])
+        self._submitted += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """
+        ジョブ情報を取得（期限切れのジョブはNone）
+        """
+        job = await self._call(self._get, job_id)
+        if job is None:
+            return None
+        # 実行したプロセスの情報は内部用のため返さない
+        job.pop("owner", None)
+        if job["status"] == "queued":
+            job["queue_position"] = self._queue_position(job_id)
+        return job
+
+    def _get(self, job_id: str) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job.get("expires_at") is not None and job["expires_at"] <= time.time():
+            self.store.delete(job_id)
+            return None
+        return job
+
+    async def delete(self, job_id: str) -> bool:
+        """
+        完了したジョブの結果を削除
+        """
+        return await self._call(self.store.delete, job_id)
+
+    def _queue_position(self, job_id: str) -> Optional[int]:
+        if self._queue is None:
+            return None
+        # asyncio.Queueの内部のdequeを参照（表示用のため厳密さは不要）
+        pending = list(getattr(self._queue, "_queue", []))
+        return pending.index(job_id) + 1 if job_id in pending else None
+
+    def _update_sync(self, job_id: str, fields: dict):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self.store.save(job)
+
+    async def _update(self, job_id: str, **fields):
+        await self._call(self._update_sync, job_id, fields)
+
+    def _report_progress(self, job_id: str, progress: int, message: str):
+        """
+        進捗を記録（書き込み中であれば最新の進捗のみを次に書き込む）
+        """
+        self._pending_progress[job_id] = {"progress": max(0, min(99, int(progress))), "message": message}
+        if job_id not in self._progress_writers:
+            self._progress_writers[job_id] = asyncio.ensure_future(self._write_progress(job_id))
+
+    async def _write_progress(self, job_id: str):
+        try:
+            while job_id in self._pending_progress:
+                await self._update(job_id, **self._pending_progress.pop(job_id))
+        finally:
+            self._progress_writers.pop(job_id, None)
+
+    async def _finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+        # 書き込み中の進捗が完了後の状態を上書きしないようにする
+        self._pending_progress.pop(job_id, None)
+        writer = self._progress_writers.get(job_id)
+        if writer is not None:
+            await asyncio.gather(writer, return_exceptions=True)
+
+        now = time.time()
+        await self._update(
+            job_id,
+            status="failed" if error is not None else "succeeded",
+            progress=100 if error is None else None,
+            message="失敗" if error is not None else "完了",
+            result=result,
+            error=error,
+            finished_at=now,
+            expires_at=now + self.result_ttl,
+        )
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            func = self._functions.get(job_id)
+            if func is None:
+                continue
+
+            self._running += 1
+
+            def report_progress(progress: int, message: str, job_id=job_id):
+                self._report_progress(job_id, progress, message)
+
+            try:
+                await self._update(job_id, status="running", message="実行中", started_at=time.time())
+                result = await func(report_progress)
+            except asyncio.CancelledError:
+                await asyncio.shield(self._finish(job_id, error="Server shut down before the job finished"))
+                raise
+            except Exception as e:
+                self._failed += 1
+                await self._finish(job_id, error=str(e))
+            else:
+                self._succeeded += 1
+                await self._finish(job_id, result=result)
+            finally:
+                self._functions.pop(job_id, None)
+                self._running -= 1
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(60)
+            await self._call(self.store.delete_expired, time.time())
+
+    def get_stats(self) -> dict:
+        """
+        ジョブの投入・実行・完了件数を取得
+        """
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "submitted": self._submitted,
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "result_ttl_seconds": self.result_ttl,
+        }
+
+
+# グローバルなジョブキューインスタンス
+job_queue = JobQueue()
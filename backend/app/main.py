@@ -1,19 +1,49 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
-from typing import List, Optional
+import asyncio
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
 
 from .file_processor import FileProcessor
+from .extraction_executor import extraction_executor, ExtractionQueueFullError
+from .extraction_cache import extraction_cache
+from .response_cache import response_cache
+from .file_processor import FileSource
+from .upload_ingest import ingest_upload, SpooledUpload, UploadTooLargeError, UploadSizeLimitMiddleware
+from .singleflight import SingleFlight
 from .openai_client import OpenAIClient
+from .retrieval_index import RetrievalIndex
+from .job_queue import job_queue, JobQueueFullError
 from .models import SystemRequirementsResponse
-from .session_manager import session_manager
+from .session_manager import SessionRecord, session_manager
+from .response_encoding import FastJSONResponse, CompressionMiddleware, json_dumps
 
 load_dotenv()
 
-app = FastAPI(title="Requirements System Generator", version="1.0.0")
+app = FastAPI(
+    title="Requirements System Generator",
+    version="1.0.0",
+    default_response_class=FastJSONResponse
+)
+
+# 複数ファイルの一括生成の設定
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+BATCH_MAX_REQUEST_SIZE_MB = float(os.getenv("BATCH_MAX_REQUEST_SIZE_MB", "200"))
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "8"))
+
+# アップロードサイズ上限（ボディ受信中に確認、一括生成は複数ファイル分の上限）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path_limits_mb={"/batch/": BATCH_MAX_REQUEST_SIZE_MB, "/stream/batch/": BATCH_MAX_REQUEST_SIZE_MB}
+)
+
+# レスポンスの圧縮（Accept-Encodingに応じてbrotli / gzip）
+app.add_middleware(CompressionMiddleware)
 
 # CORS設定
 app.add_middleware(
@@ -28,6 +58,340 @@ app.add_middleware(
 file_processor = FileProcessor()
 openai_client = OpenAIClient()
 
+# セッションID → 作成中の検索インデックス
+index_tasks: Dict[str, asyncio.Task] = {}
+
+# セッションID → 作成済みの検索インデックス（JSONに変換できないためセッションストアではなくプロセス内に保持し、
+# 別のワーカーで作成したセッションは初回アクセス時に作成する）
+session_indexes: "OrderedDict[str, RetrievalIndex]" = OrderedDict()
+MAX_SESSION_INDEXES = int(os.getenv("SESSION_INDEX_CACHE_SIZE", "64"))
+
+# 同時に取り込んだ同じ内容のファイルの抽出を1回にまとめる
+upload_extractions = SingleFlight()
+
+@app.on_event("startup")
+async def startup_event():
+    # 抽出ワーカーを起動してパーサーを事前読み込み
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, extraction_executor.start)
+    await job_queue.recover_interrupted_jobs()
+    job_queue.start()
+    session_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.shutdown()
+    await session_manager.shutdown()
+    extraction_executor.shutdown()
+    await openai_client.aclose()
+
+async def extract_async(
+    file_content: FileSource,
+    file_extension: str,
+    content_hash: Optional[str] = None
+) -> dict:
+    """
+    抽出ワーカープール上でテキストを抽出（イベントループをブロックしない）
+    """
+    try:
+        return await extraction_executor.extract(file_content, file_extension, content_hash)
+    except ExtractionQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy extracting other files. Please retry later."
+        )
+
+async def extract_upload(file: UploadFile, file_extension: str) -> dict:
+    """
+    アップロードファイルをサイズ上限付きでスプールし、テキストを抽出
+    """
+    try:
+        upload = await ingest_upload(file, file_extension)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    with upload:
+        return await extract_async(upload.source, file_extension, upload.sha256)
+
+async def create_session(extracted_text: str, filename: str) -> str:
+    """
+    セッションを作成し、セクション生成用の検索インデックスをバックグラウンドで作成
+    """
+    session_id = await session_manager.create_session(extracted_text, filename)
+    if await openai_client.needs_retrieval_index(extracted_text):
+        start_index_task(session_id, extracted_text)
+    return session_id
+
+async def register_spooled_upload(upload: SpooledUpload, filename: str, file_extension: str) -> Tuple[str, str]:
+    """
+    取り込み済みのファイルからテキストを抽出してセッションを作成（uploadのcloseは呼び出し側で行う）
+
+    セッションはアップロードごとに作成する（同じ内容のファイルでも他のクライアントとは共有しない）。
+    同じ内容（ハッシュ値）のファイルの抽出は抽出キャッシュから返し、同時に取り込んだ場合も1回だけ抽出する
+
+    Returns:
+        (session_id, extracted_text)
+    """
+    key = extraction_cache.make_key_from_digest(upload.sha256, file_extension)
+
+    async def extract() -> str:
+        extraction = await extract_async(upload.source, file_extension, upload.sha256)
+        return extraction["text"]
+
+    extracted_text = await upload_extractions.do(key, extract)
+    if not extracted_text.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="No text could be extracted from the file"
+        )
+
+    return await create_session(extracted_text, filename), extracted_text
+
+async def register_upload(file: UploadFile, file_extension: str) -> Tuple[str, str]:
+    """
+    アップロードファイルを取り込み、テキストを抽出してセッションを作成（register_spooled_uploadを参照）
+
+    Returns:
+        (session_id, extracted_text)
+    """
+    try:
+        upload = await ingest_upload(file, file_extension)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    with upload:
+        return await register_spooled_upload(upload, file.filename, file_extension)
+
+async def register_upload_for_generation(file: UploadFile) -> Tuple[str, str]:
+    """
+    ファイル形式を検証し、生成に使うセッションを取得（register_uploadを参照）
+    """
+    allowed_extensions = {'.pdf', '.docx', '.doc', '.xlsx', '.xls'}
+    file_extension = os.path.splitext(file.filename)[1].lower()
+
+    if file_extension not in allowed_extensions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
+        )
+
+    try:
+        return await register_upload(file, file_extension)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error extracting text: {str(e)}")
+
+async def index_session(session_id: str, extracted_text: str) -> Optional[RetrievalIndex]:
+    try:
+        index = await openai_client.build_retrieval_index(extracted_text)
+    except Exception:
+        # インデックスがなくても生成時に作成できるため失敗は無視する
+        return None
+    session_indexes[session_id] = index
+    session_indexes.move_to_end(session_id)
+    while len(session_indexes) > MAX_SESSION_INDEXES:
+        session_indexes.popitem(last=False)
+    return index
+
+def start_index_task(session_id: str, extracted_text: str) -> asyncio.Task:
+    """
+    検索インデックスの作成を開始（作成中であればそのタスクを返す）
+    """
+    task = index_tasks.get(session_id)
+    if task is None:
+        task = asyncio.ensure_future(index_session(session_id, extracted_text))
+        index_tasks[session_id] = task
+        task.add_done_callback(lambda _: index_tasks.pop(session_id, None))
+    return task
+
+async def get_session_index(
+    session_id: str,
+    extracted_text: Optional[str] = None
+) -> Optional[RetrievalIndex]:
+    """
+    セッションの検索インデックスを取得（作成中であれば完了を待ち、なければ作成）
+
+    プロセス内にない場合（退避済み・別のワーカーで作成したセッション）はextracted_textから作成する
+    （省略した場合はセッションから読み込む）
+    """
+    index = session_indexes.get(session_id)
+    if index is not None:
+        session_indexes.move_to_end(session_id)
+        return index
+    task = index_tasks.get(session_id)
+    if task is not None:
+        return await asyncio.shield(task)
+    if extracted_text is None:
+        session_data = await session_manager.get_session_data(session_id)
+        if session_data is None:
+            return None
+        extracted_text = session_data['extracted_text']
+    if await openai_client.needs_retrieval_index(extracted_text):
+        # 同じセッションの複数セクションから同時に呼ばれても1回だけ作成する
+        return await asyncio.shield(start_index_task(session_id, extracted_text))
+    return None
+
+async def get_requirements_digest(
+    extracted_text: str,
+    session_id: Optional[str] = None,
+    session_data: Optional[SessionRecord] = None
+) -> str:
+    """
+    要件の抽出・分類結果を取得（セッションがあれば1回だけ作成して保存）
+
+    抽出できなかった場合は要件定義書のテキストをそのまま返す
+    """
+    if session_id is not None and session_data is None:
+        session_data = await session_manager.get_session_data(session_id, include_text=False)
+    digest = session_data.get('requirements_digest') if session_data else None
+    if digest is None:
+        digest = await openai_client.extract_key_requirements(extracted_text)
+        if session_id is not None and any(digest.values()):
+            await session_manager.update_session(session_id, requirements_digest=digest)
+    return openai_client.format_requirements_digest(digest) or extracted_text
+
+async def generation_input(
+    extracted_text: str,
+    section: str,
+    session_id: Optional[str] = None,
+    session_data: Optional[SessionRecord] = None
+) -> Tuple[str, Optional[RetrievalIndex]]:
+    """
+    生成に渡すテキストと検索インデックスを取得
+
+    OPENAI_PIPELINE_MODE=digest の場合は要件の抽出・分類結果を、それ以外は要件定義書のテキストを返す
+    """
+    if openai_client.pipeline_mode == "digest":
+        return await get_requirements_digest(extracted_text, session_id, session_data), None
+    if session_id is not None and section in openai_client.RETRIEVAL_QUERIES:
+        return extracted_text, await get_session_index(session_id, extracted_text)
+    return extracted_text, None
+
+# セクション名 → (OpenAIClientの生成メソッド名, 結果のキー)
+SECTION_GENERATORS = {
+    "functional-diagram": ("generate_functional_diagram", "functional_diagram"),
+    "external-interfaces": ("generate_external_interfaces", "external_interfaces"),
+    "performance-requirements": ("generate_performance_requirements", "performance_requirements"),
+    "security-requirements": ("generate_security_requirements", "security_requirements"),
+}
+
+# セッションに保存する生成結果のフィールド名の接頭辞（後ろにセクション名を付ける）
+SESSION_RESULT_PREFIX = "generated:"
+
+def get_session_result(session_data: Optional[SessionRecord], section: str) -> Optional[dict]:
+    """
+    セッションに保存した生成結果を取得（プロンプトテンプレート・生成設定が変わっていればNone）
+    """
+    result = session_data.get(f"{SESSION_RESULT_PREFIX}{section}") if session_data else None
+    if result is None or result.get("version") != openai_client.generation_version():
+        return None
+    return result
+
+async def save_session_result(session_id: str, section: str, content: str, generation_report: Optional[dict] = None):
+    await session_manager.update_session(session_id, **{
+        f"{SESSION_RESULT_PREFIX}{section}": {
+            "version": openai_client.generation_version(),
+            "content": content,
+            "generation_report": generation_report,
+            "generated_at": time.time()
+        }
+    })
+
+def session_result_sections(session_data: SessionRecord) -> List[str]:
+    """
+    生成結果を保存済みのセクション名の一覧
+    """
+    return [
+        section for section in openai_client.SECTIONS
+        if get_session_result(session_data, section) is not None
+    ]
+
+async def generate_section_result(
+    section: str,
+    extracted_text: Optional[str] = None,
+    session_id: Optional[str] = None,
+    session_data: Optional[SessionRecord] = None,
+    regenerate: bool = False,
+    on_section_done=None
+) -> dict:
+    """
+    指定セクションを生成（セッションに生成結果が保存済みであればそれを返す）
+
+    extracted_textを省略した場合はセッションの抽出テキストを使用する（保存済みの結果を返す場合は展開しない）。
+    regenerate=Trueの場合は保存済みの結果・生成結果キャッシュのいずれも使わずに生成する
+
+    Returns:
+        content（生成結果）・generation_report（包括的な生成のみ）・cached（保存済みの結果か）
+    """
+    if session_id is not None:
+        if session_data is None:
+            session_data = await session_manager.get_session_data(session_id, include_text=extracted_text is None)
+            if session_data is None:
+                raise HTTPException(status_code=404, detail="Session not found or expired")
+        if not regenerate:
+            saved = get_session_result(session_data, section)
+            if saved is not None:
+                return {"content": saved["content"], "generation_report": saved["generation_report"], "cached": True}
+    if extracted_text is None:
+        extracted_text = session_data['extracted_text']
+
+    generation_text, index = await generation_input(extracted_text, section, session_id, session_data)
+    if section == "comprehensive":
+        generation = await openai_client.generate_comprehensive(
+            generation_text, on_section_done, refresh=regenerate
+        )
+        content, generation_report = generation["document"], generation["report"]
+    else:
+        method_name, _ = SECTION_GENERATORS[section]
+        args = (generation_text, index) if section in openai_client.RETRIEVAL_QUERIES else (generation_text,)
+        content = await getattr(openai_client, method_name)(*args, refresh=regenerate)
+        generation_report = None
+
+    if session_id is not None:
+        await save_session_result(session_id, section, content, generation_report)
+    return {"content": content, "generation_report": generation_report, "cached": False}
+
+# 包括的な生成のレスポンスに含められるフィールド
+GENERATION_RESPONSE_FIELDS = (
+    "original_filename", "extracted_text", "text_length", "generated_requirements",
+    "generation_report", "session_id", "cached", "status"
+)
+
+def parse_response_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    カンマ区切りのフィールド名を検証して一覧にする（省略時はNone＝すべて）
+    """
+    if not fields or not fields.strip():
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in GENERATION_RESPONSE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(GENERATION_RESPONSE_FIELDS)}"
+        )
+    return selected
+
+def shape_generation_response(
+    payload: dict,
+    include_text: bool = True,
+    fields: Optional[List[str]] = None
+) -> FastJSONResponse:
+    """
+    包括的な生成のレスポンスから必要なフィールドだけを返す
+
+    include_text=falseの場合は抽出テキストの代わりに文字数（text_length）を返す
+    （テキストは GET /session/{session_id}/text で取得できる）。
+    大きな文字列を検証・変換し直さないよう、response_modelを経由せずにJSONへ変換する
+    """
+    payload["text_length"] = len(payload["extracted_text"])
+    if not include_text:
+        del payload["extracted_text"]
+    if fields is not None:
+        payload = {field: payload[field] for field in fields if field in payload}
+    return FastJSONResponse(payload)
+
 @app.get("/")
 async def root():
     return {"message": "Requirements System Generator API"}
@@ -36,51 +400,56 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    抽出ワーカーなどの内部メトリクスを取得
+    """
+    return {
+        "extraction": extraction_executor.get_stats(),
+        "extraction_cache": extraction_cache.get_stats(),
+        "openai": openai_client.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "jobs": job_queue.get_stats(),
+        "sessions": await session_manager.get_stats()
+    }
+
 @app.get("/favicon.ico")
 async def favicon():
     return {"message": "No favicon"}
 
-@app.post("/upload-and-generate", response_model=SystemRequirementsResponse)
-async def upload_and_generate_requirements(file: UploadFile = File(...)):
+# FastJSONResponseを直接返すためresponse_modelによる検証・絞り込みは行われない。
+# スキーマはドキュメント用にresponsesで示す
+@app.post("/upload-and-generate", responses={200: {"model": SystemRequirementsResponse}})
+async def upload_and_generate_requirements(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False),
+    include_text: bool = Form(True),
+    fields: Optional[str] = Form(None)
+):
     """
     要件定義書をアップロードし、システム要件定義書のドラフトを生成
     """
+    response_fields = parse_response_fields(fields)
     try:
-        # ファイル形式のチェック
-        allowed_extensions = {'.pdf', '.docx', '.doc', '.xlsx', '.xls'}
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        
-        if file_extension not in allowed_extensions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
-            )
-
-        # ファイル内容を読み込み
-        file_content = await file.read()
-        
-        # テキスト抽出
-        extracted_text = file_processor.extract_text(file_content, file_extension)
-        
-        if not extracted_text.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="No text could be extracted from the file"
-            )
-
-        # セッションを作成してテキストを保存
-        session_id = session_manager.create_session(extracted_text, file.filename)
+        # ファイル形式をチェックし、テキストを抽出してアップロードごとに新しいセッションを作成
+        # （同じ内容のファイルの抽出はキャッシュから返し、同時に取り込んだ場合も抽出は1回だけ）
+        session_id, extracted_text = await register_upload_for_generation(file)
         
         # OpenAI APIでシステム要件定義書生成
-        system_requirements = await openai_client.generate_system_requirements(extracted_text)
+        generation = await generate_section_result(
+            "comprehensive", extracted_text, session_id, regenerate=regenerate
+        )
         
-        return {
+        return shape_generation_response({
             "original_filename": file.filename,
             "extracted_text": extracted_text,
-            "generated_requirements": system_requirements,
+            "generated_requirements": generation["content"],
+            "generation_report": generation["generation_report"],
             "session_id": session_id,
+            "cached": generation["cached"],
             "status": "success"
-        }
+        }, include_text, response_fields)
 
     except HTTPException:
         raise
@@ -94,60 +463,51 @@ async def extract_text_only(file: UploadFile = File(...)):
     """
     try:
         file_extension = os.path.splitext(file.filename)[1].lower()
-        file_content = await file.read()
-        
-        extracted_text = file_processor.extract_text(file_content, file_extension)
+        extraction = await extract_upload(file, file_extension)
+        extracted_text = extraction["text"]
         
         return {
             "filename": file.filename,
             "extracted_text": extracted_text,
-            "text_length": len(extracted_text)
+            "text_length": len(extracted_text),
+            "extraction_report": extraction["report"]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error extracting text: {str(e)}")
 
 @app.post("/generate-comprehensive")
-async def generate_comprehensive_requirements(file: UploadFile = File(...)):
+async def generate_comprehensive_requirements(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False),
+    include_text: bool = Form(True),
+    fields: Optional[str] = Form(None)
+):
     """
     包括的なシステム要件定義書を生成（機能構成図・外部IF・性能・セキュリティ要件を含む）
     """
+    response_fields = parse_response_fields(fields)
     try:
-        # ファイル形式のチェック
-        allowed_extensions = {'.pdf', '.docx', '.doc', '.xlsx', '.xls'}
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        
-        if file_extension not in allowed_extensions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
-            )
-
-        # ファイル内容を読み込み
-        file_content = await file.read()
-        
-        # テキスト抽出
-        extracted_text = file_processor.extract_text(file_content, file_extension)
-        
-        if not extracted_text.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="No text could be extracted from the file"
-            )
-
-        # セッションを作成してテキストを保存
-        session_id = session_manager.create_session(extracted_text, file.filename)
+        # ファイル形式をチェックし、テキストを抽出してアップロードごとに新しいセッションを作成
+        # （同じ内容のファイルの抽出はキャッシュから返し、同時に取り込んだ場合も抽出は1回だけ）
+        session_id, extracted_text = await register_upload_for_generation(file)
         
         # 包括的なシステム要件定義書生成
-        system_requirements = await openai_client.generate_system_requirements(extracted_text)
+        generation = await generate_section_result(
+            "comprehensive", extracted_text, session_id, regenerate=regenerate
+        )
         
-        return {
+        return shape_generation_response({
             "original_filename": file.filename,
             "extracted_text": extracted_text,
-            "generated_requirements": system_requirements,
+            "generated_requirements": generation["content"],
+            "generation_report": generation["generation_report"],
             "session_id": session_id,
+            "cached": generation["cached"],
             "status": "success"
-        }
+        }, include_text, response_fields)
 
     except HTTPException:
         raise
@@ -155,105 +515,140 @@ async def generate_comprehensive_requirements(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/generate-functional-diagram")
-async def generate_functional_diagram(file: UploadFile = File(...)):
+async def generate_functional_diagram(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
     """
     機能構成図を生成
     """
     try:
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        file_content = await file.read()
-        extracted_text = file_processor.extract_text(file_content, file_extension)
+        session_id, extracted_text = await register_upload_for_generation(file)
         
-        functional_diagram = await openai_client.generate_functional_diagram(extracted_text)
+        generation = await generate_section_result(
+            "functional-diagram", extracted_text, session_id, regenerate=regenerate
+        )
         
         return {
             "original_filename": file.filename,
-            "functional_diagram": functional_diagram,
+            "functional_diagram": generation["content"],
+            "session_id": session_id,
+            "cached": generation["cached"],
             "status": "success"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating functional diagram: {str(e)}")
 
 @app.post("/generate-external-interfaces")
-async def generate_external_interfaces(file: UploadFile = File(...)):
+async def generate_external_interfaces(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
     """
     外部インターフェース要件を生成
     """
     try:
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        file_content = await file.read()
-        extracted_text = file_processor.extract_text(file_content, file_extension)
+        session_id, extracted_text = await register_upload_for_generation(file)
         
-        external_interfaces = await openai_client.generate_external_interfaces(extracted_text)
+        generation = await generate_section_result(
+            "external-interfaces", extracted_text, session_id, regenerate=regenerate
+        )
         
         return {
             "original_filename": file.filename,
-            "external_interfaces": external_interfaces,
+            "external_interfaces": generation["content"],
+            "session_id": session_id,
+            "cached": generation["cached"],
             "status": "success"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating external interfaces: {str(e)}")
 
 @app.post("/generate-performance-requirements")
-async def generate_performance_requirements(file: UploadFile = File(...)):
+async def generate_performance_requirements(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
     """
     性能要件を生成
     """
     try:
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        file_content = await file.read()
-        extracted_text = file_processor.extract_text(file_content, file_extension)
+        session_id, extracted_text = await register_upload_for_generation(file)
         
-        performance_requirements = await openai_client.generate_performance_requirements(extracted_text)
+        generation = await generate_section_result(
+            "performance-requirements", extracted_text, session_id, regenerate=regenerate
+        )
         
         return {
             "original_filename": file.filename,
-            "performance_requirements": performance_requirements,
+            "performance_requirements": generation["content"],
+            "session_id": session_id,
+            "cached": generation["cached"],
             "status": "success"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating performance requirements: {str(e)}")
 
 @app.post("/generate-security-requirements")
-async def generate_security_requirements(file: UploadFile = File(...)):
+async def generate_security_requirements(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
     """
     セキュリティ要件を生成
     """
     try:
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        file_content = await file.read()
-        extracted_text = file_processor.extract_text(file_content, file_extension)
+        session_id, extracted_text = await register_upload_for_generation(file)
         
-        security_requirements = await openai_client.generate_security_requirements(extracted_text)
+        generation = await generate_section_result(
+            "security-requirements", extracted_text, session_id, regenerate=regenerate
+        )
         
         return {
             "original_filename": file.filename,
-            "security_requirements": security_requirements,
+            "security_requirements": generation["content"],
+            "session_id": session_id,
+            "cached": generation["cached"],
             "status": "success"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating security requirements: {str(e)}")
 
 # セッションベースの生成エンドポイント
 @app.post("/generate-from-session/functional-diagram")
-async def generate_functional_diagram_from_session(session_id: str = Form(...)):
+async def generate_functional_diagram_from_session(
+    session_id: str = Form(...),
+    regenerate: bool = Form(False)
+):
     """
-    セッションIDを使用して機能構成図を生成
+    セッションIDを使用して機能構成図を生成（生成済みの場合は保存した結果を返す）
     """
     try:
-        session_data = session_manager.get_session_data(session_id)
+        session_data = await session_manager.get_session_data(session_id)
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found or expired")
         
-        functional_diagram = await openai_client.generate_functional_diagram(session_data['extracted_text'])
+        # 生成済みの結果があれば再利用（regenerate=trueで再生成）
+        generation = await generate_section_result(
+            "functional-diagram", session_id=session_id, session_data=session_data, regenerate=regenerate
+        )
         
         return {
             "original_filename": session_data['filename'],
-            "functional_diagram": functional_diagram,
+            "functional_diagram": generation["content"],
+            "cached": generation["cached"],
             "status": "success"
         }
 
@@ -263,20 +658,27 @@ async def generate_functional_diagram_from_session(session_id: str = Form(...)):
         raise HTTPException(status_code=500, detail=f"Error generating functional diagram: {str(e)}")
 
 @app.post("/generate-from-session/external-interfaces")
-async def generate_external_interfaces_from_session(session_id: str = Form(...)):
+async def generate_external_interfaces_from_session(
+    session_id: str = Form(...),
+    regenerate: bool = Form(False)
+):
     """
-    セッションIDを使用して外部インターフェース要件を生成
+    セッションIDを使用して外部インターフェース要件を生成（生成済みの場合は保存した結果を返す）
     """
     try:
-        session_data = session_manager.get_session_data(session_id)
+        session_data = await session_manager.get_session_data(session_id)
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found or expired")
         
-        external_interfaces = await openai_client.generate_external_interfaces(session_data['extracted_text'])
+        # 生成済みの結果があれば再利用（regenerate=trueで再生成）
+        generation = await generate_section_result(
+            "external-interfaces", session_id=session_id, session_data=session_data, regenerate=regenerate
+        )
         
         return {
             "original_filename": session_data['filename'],
-            "external_interfaces": external_interfaces,
+            "external_interfaces": generation["content"],
+            "cached": generation["cached"],
             "status": "success"
         }
 
@@ -286,20 +688,27 @@ async def generate_external_interfaces_from_session(session_id: str = Form(...))
         raise HTTPException(status_code=500, detail=f"Error generating external interfaces: {str(e)}")
 
 @app.post("/generate-from-session/performance-requirements")
-async def generate_performance_requirements_from_session(session_id: str = Form(...)):
+async def generate_performance_requirements_from_session(
+    session_id: str = Form(...),
+    regenerate: bool = Form(False)
+):
     """
-    セッションIDを使用して性能要件を生成
+    セッションIDを使用して性能要件を生成（生成済みの場合は保存した結果を返す）
     """
     try:
-        session_data = session_manager.get_session_data(session_id)
+        session_data = await session_manager.get_session_data(session_id)
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found or expired")
         
-        performance_requirements = await openai_client.generate_performance_requirements(session_data['extracted_text'])
+        # 生成済みの結果があれば再利用（regenerate=trueで再生成）
+        generation = await generate_section_result(
+            "performance-requirements", session_id=session_id, session_data=session_data, regenerate=regenerate
+        )
         
         return {
             "original_filename": session_data['filename'],
-            "performance_requirements": performance_requirements,
+            "performance_requirements": generation["content"],
+            "cached": generation["cached"],
             "status": "success"
         }
 
@@ -309,20 +718,27 @@ async def generate_performance_requirements_from_session(session_id: str = Form(
         raise HTTPException(status_code=500, detail=f"Error generating performance requirements: {str(e)}")
 
 @app.post("/generate-from-session/security-requirements")
-async def generate_security_requirements_from_session(session_id: str = Form(...)):
+async def generate_security_requirements_from_session(
+    session_id: str = Form(...),
+    regenerate: bool = Form(False)
+):
     """
-    セッションIDを使用してセキュリティ要件を生成
+    セッションIDを使用してセキュリティ要件を生成（生成済みの場合は保存した結果を返す）
     """
     try:
-        session_data = session_manager.get_session_data(session_id)
+        session_data = await session_manager.get_session_data(session_id)
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found or expired")
         
-        security_requirements = await openai_client.generate_security_requirements(session_data['extracted_text'])
+        # 生成済みの結果があれば再利用（regenerate=trueで再生成）
+        generation = await generate_section_result(
+            "security-requirements", session_id=session_id, session_data=session_data, regenerate=regenerate
+        )
         
         return {
             "original_filename": session_data['filename'],
-            "security_requirements": security_requirements,
+            "security_requirements": generation["content"],
+            "cached": generation["cached"],
             "status": "success"
         }
 
@@ -331,12 +747,602 @@ async def generate_security_requirements_from_session(session_id: str = Form(...
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating security requirements: {str(e)}")
 
+# 複数セクションの一括生成エンドポイント
+def parse_sections(sections: Optional[str], default: Optional[List[str]] = None) -> List[str]:
+    """
+    カンマ区切りのセクション名を検証して一覧にする（省略時はdefault、defaultもなければ機能構成図・外部IF・性能・セキュリティ要件）
+    """
+    if not sections or not sections.strip():
+        return list(default or SECTION_GENERATORS)
+
+    selected = []
+    for section in sections.split(","):
+        section = section.strip()
+        if not section or section in selected:
+            continue
+        if section not in openai_client.SECTIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
+        selected.append(section)
+    if not selected:
+        raise HTTPException(status_code=400, detail="No sections specified")
+    return selected
+
+async def resolve_generation_source(
+    file: Optional[UploadFile],
+    session_id: Optional[str]
+) -> Tuple[str, str, Optional[str], Optional[SessionRecord]]:
+    """
+    ファイルまたはセッションIDから生成に使うセッションを取得
+
+    Returns:
+        (session_id, original_filename, extracted_text, session_data)
+        （セッションIDを指定した場合、抽出テキストは生成時にセッションから1回だけ展開する）
+    """
+    if file is not None:
+        session_id, extracted_text = await register_upload_for_generation(file)
+        return session_id, file.filename, extracted_text, None
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Either file or session_id is required")
+
+    session_data = await session_manager.get_session_data(session_id)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session_id, session_data['filename'], None, session_data
+
+def generation_error_detail(error: BaseException) -> str:
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error)
+
+def collect_section_outcomes(selected: List[str], outcomes: list) -> Tuple[dict, dict]:
+    """
+    asyncio.gather(return_exceptions=True)の結果を、セクション名 → 生成結果 / 失敗理由に分ける
+    """
+    results = {}
+    errors = {}
+    for section, outcome in zip(selected, outcomes):
+        if isinstance(outcome, BaseException):
+            errors[section] = generation_error_detail(outcome)
+        else:
+            results[section] = outcome
+    return results, errors
+
+@app.post("/generate-all")
+async def generate_all_sections(
+    file: Optional[UploadFile] = File(None),
+    session_id: Optional[str] = Form(None),
+    sections: Optional[str] = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    ファイルまたはセッションIDから指定した複数のセクションを並行して生成し、まとめて返す
+
+    ファイルのテキスト抽出は1回だけ行い、各セクションで同じセッション（抽出テキスト・検索インデックス・
+    生成済みの結果）を共有する。一部のセクションが失敗した場合はerrorsに理由を入れてstatus=partialを返す
+    """
+    selected = parse_sections(sections)
+    session_id, filename, extracted_text, session_data = await resolve_generation_source(file, session_id)
+
+    outcomes = await asyncio.gather(
+        *(
+            generate_section_result(section, extracted_text, session_id, session_data, regenerate)
+            for section in selected
+        ),
+        return_exceptions=True
+    )
+
+    results, errors = collect_section_outcomes(selected, outcomes)
+    if not results:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating sections: {'; '.join(f'{k}: {v}' for k, v in errors.items())}"
+        )
+
+    return {
+        "original_filename": filename,
+        "session_id": session_id,
+        "sections": results,
+        "errors": errors,
+        "status": "partial" if errors else "success"
+    }
+
+# ストリーミング（Server-Sent Events）エンドポイント
+def format_sse(event: str, data: dict) -> str:
+    """
+    Server-Sent Events形式のメッセージを作成
+    """
+    return f"event: {event}\ndata: {json_dumps(data).decode('utf-8')}\n\n"
+
+async def stream_generation(
+    section: str,
+    extracted_text: Optional[str],
+    metadata: dict,
+    session_id: Optional[str] = None,
+    session_data: Optional[SessionRecord] = None,
+    regenerate: bool = False
+) -> AsyncIterator[str]:
+    """
+    生成されたトークンをSSEとして順次送信し、最後に使用量と所要時間を送信
+
+    セッションに生成結果が保存済みであれば全体を1つのdeltaとして送信する
+    （extracted_textを省略した場合はセッションの抽出テキストを使用）
+    """
+    yield format_sse("metadata", {"section": section, **metadata})
+    try:
+        if session_id is not None and session_data is None:
+            session_data = await session_manager.get_session_data(session_id, include_text=extracted_text is None)
+        saved = None if regenerate else get_session_result(session_data, section)
+        if saved is not None:
+            yield format_sse("delta", {"content": saved["content"]})
+            yield format_sse("done", {
+                "section": section,
+                "status": "success",
+                "finish_reason": "stop",
+                "usage": None,
+                "cached": True,
+                "timing": {"first_token_seconds": 0.0, "total_seconds": 0.0}
+            })
+            return
+
+        if extracted_text is None:
+            extracted_text = session_data['extracted_text']
+        generation_text, index = await generation_input(extracted_text, section, session_id, session_data)
+        parts = []
+        async for event in openai_client.stream_section(section, generation_text, index, refresh=regenerate):
+            if event["type"] == "delta":
+                parts.append(event["content"])
+                yield format_sse("delta", {"content": event["content"]})
+            else:
+                # 最後まで生成できた結果のみ保存する
+                if session_id is not None and event["finish_reason"] == "stop":
+                    await save_session_result(session_id, section, "".join(parts))
+                yield format_sse("done", {
+                    "section": section,
+                    "status": "success",
+                    "finish_reason": event["finish_reason"],
+                    "usage": event["usage"],
+                    "cached": event["cached"],
+                    "timing": event["timing"]
+                })
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e), "status": "error"})
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+def validate_stream_section(section: str):
+    if section not in openai_client.SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown section: {section}")
+
+@app.post("/stream/upload-and-generate")
+async def stream_upload_and_generate(
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
+    """
+    要件定義書をアップロードし、システム要件定義書をストリーミングで生成
+    """
+    session_id, extracted_text = await register_upload_for_generation(file)
+
+    return sse_response(stream_generation(
+        "comprehensive",
+        extracted_text,
+        {"original_filename": file.filename, "session_id": session_id},
+        session_id,
+        regenerate=regenerate
+    ))
+
+async def stream_all_sections(
+    selected: List[str],
+    metadata: dict,
+    session_id: str,
+    extracted_text: Optional[str],
+    session_data: Optional[SessionRecord],
+    regenerate: bool
+) -> AsyncIterator[str]:
+    """
+    複数のセクションを並行して生成し、完了した順にsectionイベントとして送信
+
+    失敗したセクションはsection_errorイベントとして送信し、最後に全体の結果をdoneとして送信する
+    （クライアントが切断した場合は生成中のセクションを取り消す）
+    """
+    yield format_sse("metadata", {"sections": selected, **metadata})
+    start = time.perf_counter()
+    pending = {
+        asyncio.ensure_future(
+            generate_section_result(section, extracted_text, session_id, session_data, regenerate)
+        ): section
+        for section in selected
+    }
+    completed = []
+    failed = []
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                section = pending.pop(task)
+                if task.exception() is not None:
+                    failed.append(section)
+                    yield format_sse("section_error", {
+                        "section": section,
+                        "detail": generation_error_detail(task.exception()),
+                        "status": "error"
+                    })
+                    continue
+                completed.append(section)
+                generation = task.result()
+                yield format_sse("section", {
+                    "section": section,
+                    "content": generation["content"],
+                    "generation_report": generation["generation_report"],
+                    "cached": generation["cached"],
+                    "seconds": round(time.perf_counter() - start, 3)
+                })
+
+        yield format_sse("done", {
+            "status": "error" if not completed else "partial" if failed else "success",
+            "completed": completed,
+            "failed": failed,
+            "timing": {"total_seconds": round(time.perf_counter() - start, 3)}
+        })
+    finally:
+        for task in pending:
+            task.cancel()
+
+@app.post("/stream/generate-all")
+async def stream_generate_all_sections(
+    file: Optional[UploadFile] = File(None),
+    session_id: Optional[str] = Form(None),
+    sections: Optional[str] = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    ファイルまたはセッションIDから指定した複数のセクションを並行して生成し、完了した順にストリーミングで送信
+    """
+    selected = parse_sections(sections)
+    session_id, filename, extracted_text, session_data = await resolve_generation_source(file, session_id)
+
+    return sse_response(stream_all_sections(
+        selected,
+        {"original_filename": filename, "session_id": session_id},
+        session_id,
+        extracted_text,
+        session_data,
+        regenerate
+    ))
+
+@app.post("/stream/generate-{section}")
+async def stream_generate_section(
+    section: str,
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
+    """
+    ファイルから指定セクション（comprehensive / functional-diagram / external-interfaces /
+    performance-requirements / security-requirements）をストリーミングで生成
+    """
+    validate_stream_section(section)
+    session_id, extracted_text = await register_upload_for_generation(file)
+
+    return sse_response(stream_generation(
+        section,
+        extracted_text,
+        {"original_filename": file.filename, "session_id": session_id},
+        session_id,
+        regenerate=regenerate
+    ))
+
+@app.post("/stream/generate-from-session/{section}")
+async def stream_generate_section_from_session(
+    section: str,
+    session_id: str = Form(...),
+    regenerate: bool = Form(False)
+):
+    """
+    セッションIDを使用して指定セクションをストリーミングで生成（生成済みの場合は保存した結果を返す）
+    """
+    validate_stream_section(section)
+    session_data = await session_manager.get_session_data(session_id)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    return sse_response(stream_generation(
+        section,
+        None,
+        {"original_filename": session_data['filename'], "session_id": session_id},
+        session_id,
+        session_data,
+        regenerate
+    ))
+
+# 複数ファイルの一括生成エンドポイント
+# 抽出は抽出ワーカー数まで（抽出キューを一括生成で埋めないため）、生成はBATCH_GENERATION_CONCURRENCYファイルまで
+# 並行して実行し、OpenAI APIへのリクエストはさらにレート制限・同時実行数の上限を全体で共有する
+batch_extraction_slots = asyncio.Semaphore(extraction_executor.max_workers)
+batch_generation_slots = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+async def spool_batch_files(files: List[UploadFile]) -> List[dict]:
+    """
+    一括生成のファイルを並行して取り込む（形式・サイズが不正なファイルはerrorに理由を入れて続行）
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum: {BATCH_MAX_FILES}")
+
+    allowed_extensions = {'.pdf', '.docx', '.doc', '.xlsx', '.xls'}
+
+    async def spool(index: int, file: UploadFile) -> dict:
+        file_extension = os.path.splitext(file.filename or "")[1].lower()
+        entry = {"index": index, "filename": file.filename, "extension": file_extension, "upload": None, "error": None}
+        if file_extension not in allowed_extensions:
+            entry["error"] = f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
+            return entry
+        try:
+            entry["upload"] = await ingest_upload(file, file_extension)
+        except Exception as e:
+            entry["error"] = str(e)
+        return entry
+
+    return await asyncio.gather(*(spool(index, file) for index, file in enumerate(files)))
+
+def close_batch_files(entries: List[dict]):
+    for entry in entries:
+        if entry["upload"] is not None:
+            entry["upload"].close()
+            entry["upload"] = None
+
+async def run_batch(
+    entries: List[dict],
+    selected: List[str],
+    regenerate: bool = False
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    取り込んだファイルごとにテキスト抽出・セクション生成を並行して実行し、ファイルの状態を発生順に返す
+
+    Yields:
+        (イベント名, データ)。file_extracted（抽出完了）→ file_done（生成完了、一部のセクションの失敗を含む）
+        またはfile_error（取り込み・抽出の失敗）。全ファイルのfile_done / file_errorを返すと終了する
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def process(entry: dict):
+        base = {"index": entry["index"], "filename": entry["filename"]}
+        stage = "upload"
+        try:
+            if entry["error"] is not None:
+                raise HTTPException(status_code=400, detail=entry["error"])
+
+            stage = "extraction"
+            try:
+                async with batch_extraction_slots:
+                    session_id, extracted_text = await register_spooled_upload(
+                        entry["upload"], entry["filename"], entry["extension"]
+                    )
+            finally:
+                entry["upload"].close()
+                entry["upload"] = None
+            events.put_nowait(("file_extracted", {
+                **base, "session_id": session_id, "text_length": len(extracted_text)
+            }))
+
+            stage = "generation"
+            async with batch_generation_slots:
+                outcomes = await asyncio.gather(
+                    *(
+                        generate_section_result(section, extracted_text, session_id, regenerate=regenerate)
+                        for section in selected
+                    ),
+                    return_exceptions=True
+                )
+            results, errors = collect_section_outcomes(selected, outcomes)
+            events.put_nowait(("file_done", {
+                **base,
+                "session_id": session_id,
+                "sections": results,
+                "errors": errors,
+                "status": "success" if not errors else "partial" if results else "error"
+            }))
+        except Exception as e:
+            events.put_nowait(("file_error", {
+                **base, "stage": stage, "detail": generation_error_detail(e), "status": "error"
+            }))
+
+    tasks = [asyncio.ensure_future(process(entry)) for entry in entries]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            event, data = await events.get()
+            if event != "file_extracted":
+                remaining -= 1
+            yield event, data
+    finally:
+        for task in tasks:
+            task.cancel()
+        close_batch_files(entries)
+
+def batch_summary(files: List[dict], start: float) -> dict:
+    succeeded = sum(1 for result in files if result["status"] != "error")
+    failed = len(files) - succeeded
+    return {
+        "succeeded": succeeded,
+        "failed": failed,
+        "status": "error" if not succeeded else "partial" if failed else "success",
+        "timing": {"total_seconds": round(time.perf_counter() - start, 3)}
+    }
+
+@app.post("/batch/generate")
+async def batch_generate(
+    files: List[UploadFile] = File(...),
+    sections: Optional[str] = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    複数の要件定義書をまとめてアップロードし、ファイルごとに指定セクション（省略時はcomprehensive）を生成
+
+    抽出・生成はファイル間で並行して行い、失敗したファイルがあっても他のファイルの結果を返す
+    """
+    selected = parse_sections(sections, default=["comprehensive"])
+    start = time.perf_counter()
+    entries = await spool_batch_files(files)
+
+    results: List[Optional[dict]] = [None] * len(entries)
+    async for event, data in run_batch(entries, selected, regenerate):
+        if event != "file_extracted":
+            results[data["index"]] = data
+
+    return {"sections": selected, "files": results, **batch_summary(results, start)}
+
+@app.post("/stream/batch/generate")
+async def stream_batch_generate(
+    files: List[UploadFile] = File(...),
+    sections: Optional[str] = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    複数の要件定義書をまとめてアップロードし、ファイルごとの抽出・生成の完了をストリーミングで送信
+    """
+    selected = parse_sections(sections, default=["comprehensive"])
+    start = time.perf_counter()
+    # レスポンスの送信中はアップロードファイルが閉じられる可能性があるため、先に取り込んでおく
+    entries = await spool_batch_files(files)
+
+    async def events() -> AsyncIterator[str]:
+        yield format_sse("metadata", {
+            "sections": selected,
+            "files": [{"index": entry["index"], "filename": entry["filename"]} for entry in entries]
+        })
+        finished = []
+        try:
+            async for event, data in run_batch(entries, selected, regenerate):
+                if event != "file_extracted":
+                    finished.append(data)
+                yield format_sse(event, data)
+            yield format_sse("done", batch_summary(finished, start))
+        finally:
+            close_batch_files(entries)
+
+    return sse_response(events())
+
+# ジョブ（バックグラウンド生成）エンドポイント
+async def run_generation_job(
+    section: str,
+    extracted_text: Optional[str],
+    session_id: Optional[str],
+    report_progress,
+    regenerate: bool = False
+) -> dict:
+    """
+    ジョブとして指定セクションを生成し、同期版エンドポイントと同じキーで結果を返す
+    """
+    report_progress(5, "入力を準備中")
+
+    def on_section_done(title: str, completed: int, total: int):
+        report_progress(15 + 80 * completed // total, f"{title}を生成しました（{completed}/{total}）")
+
+    report_progress(15, "システム要件定義書を生成中" if section == "comprehensive" else "生成中")
+    generation = await generate_section_result(
+        section, extracted_text, session_id, regenerate=regenerate, on_section_done=on_section_done
+    )
+
+    if section == "comprehensive":
+        return {
+            "generated_requirements": generation["content"],
+            "generation_report": generation["generation_report"],
+            "cached": generation["cached"]
+        }
+    _, result_key = SECTION_GENERATORS[section]
+    return {result_key: generation["content"], "cached": generation["cached"]}
+
+async def submit_generation_job(
+    section: str,
+    extracted_text: Optional[str],
+    filename: str,
+    session_id: str,
+    regenerate: bool = False
+) -> dict:
+    try:
+        job = await job_queue.submit(
+            section,
+            lambda report_progress: run_generation_job(
+                section, extracted_text, session_id, report_progress, regenerate
+            ),
+            {"original_filename": filename, "session_id": session_id}
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "job_id": job["job_id"],
+        "section": section,
+        "status": job["status"],
+        "original_filename": filename,
+        "session_id": session_id
+    }
+
+@app.post("/jobs/generate-{section}", status_code=202)
+async def submit_generation_job_from_file(
+    section: str,
+    file: UploadFile = File(...),
+    regenerate: bool = Form(False)
+):
+    """
+    ファイルから指定セクションを生成するジョブを投入し、ジョブIDをすぐに返す
+    """
+    validate_stream_section(section)
+    session_id, extracted_text = await register_upload_for_generation(file)
+    return await submit_generation_job(section, extracted_text, file.filename, session_id, regenerate)
+
+@app.post("/jobs/generate-from-session/{section}", status_code=202)
+async def submit_generation_job_from_session(
+    section: str,
+    session_id: str = Form(...),
+    regenerate: bool = Form(False)
+):
+    """
+    セッションIDを使用して指定セクションを生成するジョブを投入し、ジョブIDをすぐに返す
+
+    抽出テキストはジョブの実行時にセッションから読み込む（生成済みの場合は保存した結果を返す）
+    """
+    validate_stream_section(section)
+    session_data = await session_manager.get_session_data(session_id, include_text=False)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    return await submit_generation_job(section, None, session_data['filename'], session_id, regenerate)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    ジョブの状態・進捗・結果を取得
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """
+    ジョブの結果を削除
+    """
+    if not await job_queue.delete(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"message": "Job deleted successfully"}
+
 @app.get("/session/{session_id}")
 async def get_session_info(session_id: str):
     """
     セッション情報を取得
     """
-    session_data = session_manager.get_session_data(session_id)
+    session_data = await session_manager.get_session_data(session_id, include_text=False)
     if not session_data:
         raise HTTPException(status_code=404, detail="Session not found or expired")
     
@@ -345,15 +1351,34 @@ async def get_session_info(session_id: str):
         "filename": session_data['filename'],
         "created_at": session_data['created_at'].isoformat(),
         "last_accessed": session_data['last_accessed'].isoformat(),
-        "text_length": len(session_data['extracted_text'])
+        "text_length": session_data['text_length'],
+        "available_sections": session_result_sections(session_data)
     }
 
+@app.get("/session/{session_id}/text")
+async def get_session_text(session_id: str):
+    """
+    セッションの抽出テキストを取得（生成のレスポンスでinclude_text=falseとした場合に使用）
+    """
+    session_data = await session_manager.get_session_data(session_id)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    extracted_text = session_data['extracted_text']
+    return FastJSONResponse({
+        "session_id": session_id,
+        "filename": session_data['filename'],
+        "extracted_text": extracted_text,
+        "text_length": len(extracted_text)
+    })
+
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """
     セッションを削除
     """
-    success = session_manager.delete_session(session_id)
+    success = await session_manager.delete_session(session_id)
+    session_indexes.pop(session_id, None)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -2,10 +2,14 @@ from pydantic import BaseModel
 from typing import Optional
 
 class SystemRequirementsResponse(BaseModel):
-    original_filename: str
-    extracted_text: str
-    generated_requirements: str
-    status: str
+    original_filename: Optional[str] = None
+    extracted_text: Optional[str] = None
+    text_length: Optional[int] = None
+    generated_requirements: Optional[str] = None
+    generation_report: Optional[dict] = None
+    session_id: Optional[str] = None
+    cached: Optional[bool] = None
+    status: Optional[str] = None
 
 class FileUploadResponse(BaseModel):
     filename: str
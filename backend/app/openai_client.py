@@ -1,30 +1,214 @@
 import os
-from openai import OpenAI
-from typing import Optional
+import time
+from openai import AsyncOpenAI
+from typing import AsyncIterator, Callable, Optional
 import asyncio
-import functools
+
+from .response_cache import ResponseCache, response_cache
+from .singleflight import SingleFlight
+from .upstream_scheduler import UpstreamScheduler
+from .token_budget import estimate_tokens, split_into_chunks
+from .retrieval_index import RetrievalIndex
+
+# システム要件定義書の構成（見出しと記載項目）
+SYSTEM_REQUIREMENTS_SECTIONS = [
+    ("システム概要", [
+        "システムの目的と背景",
+        "対象ユーザー",
+        "システムのスコープ",
+    ]),
+    ("機能要件", [
+        "主要機能の詳細",
+        "ユーザーストーリー/ユースケース",
+        "入出力要件",
+        "データ要件",
+    ]),
+    ("機能構成図", [
+        "システム全体の機能構成をMermaid記法で表現",
+        "主要機能モジュール間の関係",
+        "データフローの概要",
+    ]),
+    ("外部インターフェース要件", [
+        "外部システムとの連携仕様",
+        "API接続要件",
+        "データ交換フォーマット",
+        "認証・認可方式",
+    ]),
+    ("性能要件", [
+        "レスポンス時間要件（具体的な数値）",
+        "スループット要件（トランザクション数/秒）",
+        "同時接続ユーザー数",
+        "データ容量・成長予測",
+        "可用性要件（稼働率）",
+    ]),
+    ("セキュリティ要件", [
+        "認証・認可方式",
+        "データ暗号化要件",
+        "アクセス制御ポリシー",
+        "監査ログ要件",
+        "セキュリティテスト要件",
+        "脆弱性対策",
+    ]),
+    ("非機能要件（その他）", [
+        "運用・保守要件",
+        "拡張性要件",
+        "互換性要件",
+        "国際化・ローカライゼーション",
+    ]),
+    ("システム構成", [
+        "システムアーキテクチャ概要",
+        "技術スタック",
+        "データベース設計方針",
+        "インフラ構成",
+    ]),
+    ("制約事項", [
+        "技術的制約",
+        "業務上の制約",
+        "予算・スケジュール制約",
+    ]),
+    ("リスクと対策", [
+        "想定されるリスク",
+        "対応策",
+    ]),
+]
+
+
+def format_system_requirements_outline() -> str:
+    """
+    システム要件定義書に含めるべき項目の一覧を作成
+    """
+    blocks = []
+    for number, (title, items) in enumerate(SYSTEM_REQUIREMENTS_SECTIONS, start=1):
+        marker = f"{number}. "
+        lines = [f"{marker}**{title}**"]
+        lines.extend(f"{' ' * len(marker)}- {item}" for item in items)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+# 要件の抽出・分類のカテゴリ（JSONのキー, 見出し）
+REQUIREMENTS_DIGEST_CATEGORIES = [
+    ("system_overview", "システムの目的・背景・スコープ"),
+    ("stakeholders", "ステークホルダー"),
+    ("business_requirements", "業務要件"),
+    ("functional_requirements", "機能要件"),
+    ("data_requirements", "データ要件"),
+    ("external_interfaces", "外部インターフェース"),
+    ("performance_requirements", "性能要件"),
+    ("security_requirements", "セキュリティ要件"),
+    ("non_functional_requirements", "その他の非機能要件"),
+    ("technical_constraints", "技術制約"),
+    ("risks", "リスク・課題"),
+]
+
 
 class OpenAIClient:
     """
     OpenAI APIとの連携を行うクラス
+
+    - OPENAI_MAX_CONCURRENCY: 同時に実行する生成リクエスト数の上限（429が続くと自動的に下げる）
+    - OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT / OPENAI_MAX_RETRIES: 送信レートと再試行（UpstreamScheduler参照）
+    - OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE_CONNECTIONS: コネクションプールの上限
+    - OPENAI_KEEPALIVE_EXPIRY: アイドル状態のコネクションを保持する秒数
+    - OPENAI_HTTP2: HTTP/2を使用するか（h2パッケージが必要）
+    - OPENAI_TIMEOUT: リクエストのタイムアウト秒数
+    - OPENAI_COMPREHENSIVE_MODE: 包括的な要件定義書の生成方式
+      （single: 1回のリクエストで生成 / sections: セクションごとに並列生成。
+      sectionsは各セクションに要件定義書全体を渡すため、入力トークンがセクション数倍になる）
+    - OPENAI_SECTION_MAX_TOKENS: セクションごとに並列生成する場合の1セクションあたりのmax_tokens
+    - OPENAI_MAP_REDUCE_THRESHOLD_TOKENS: 要件定義書の見積もりトークン数がこれを超えると分割して要約してから生成
+    - OPENAI_CHUNK_TOKENS / OPENAI_CHUNK_SUMMARY_MAX_TOKENS: 分割時の1チャンクのトークン数・要約のmax_tokens
+    - OPENAI_RETRIEVAL_MIN_TOKENS: 要件定義書の見積もりトークン数がこれを超えると、
+      外部IF・性能・セキュリティ要件には関連するチャンクのみを渡す
+    - OPENAI_RETRIEVAL_TOP_K: 関連するチャンクとして渡す件数
+    - OPENAI_PIPELINE_MODE: 生成の入力（direct: 要件定義書のテキスト / digest: 最初に1回抽出・分類した要件）
+    - OPENAI_DETERMINISTIC: 全ての生成をtemperature 0で行うか（同じ入力に同じ結果を返しキャッシュと一致させる）
     """
+
+    # プロンプトテンプレートを変更した場合は更新する（古い生成結果のキャッシュを無効化）
+    PROMPT_TEMPLATE_VERSION = "1"
+
+    # 要約しても閾値に収まらない場合に要約を繰り返す回数の上限
+    MAX_MAP_REDUCE_ROUNDS = 3
+
+    # セクション名 → 関連するチャンクを検索するクエリ（ここにないセクションは全文を使う）
+    RETRIEVAL_QUERIES = {
+        "external-interfaces": (
+            "外部システム 連携 インターフェース API 接続 連携先 ファイル 送信 受信 取込 出力 "
+            "データ交換 形式 CSV XML JSON 文字コード プロトコル 認証 バッチ 他システム"
+        ),
+        "performance-requirements": (
+            "性能 レスポンス 応答時間 秒 スループット 同時接続 ユーザー数 件数 処理量 データ量 "
+            "可用性 稼働率 停止 バッチ 処理時間 ピーク 負荷 拡張 容量 増加 監視"
+        ),
+        "security-requirements": (
+            "セキュリティ 認証 認可 ログイン パスワード 権限 アクセス制御 暗号化 個人情報 "
+            "ログ 監査 不正アクセス 脆弱性 ウイルス バックアップ 情報漏洩 SSL TLS 多要素"
+        ),
+    }
+
+    # セクション名 → (プロンプト作成メソッド, max_tokens, temperature, エラーメッセージの接頭辞)
+    SECTIONS = {
+        "comprehensive": ("_create_system_requirements_prompt", 16000, 0.7, "OpenAI API error"),
+        "functional-diagram": ("_create_functional_diagram_prompt", 8000, 0.7, "機能構成図生成エラー"),
+        "external-interfaces": ("_create_external_interfaces_prompt", 8000, 0.7, "外部IF要件生成エラー"),
+        "performance-requirements": ("_create_performance_requirements_prompt", 8000, 0.7, "性能要件生成エラー"),
+        "security-requirements": ("_create_security_requirements_prompt", 8000, 0.7, "セキュリティ要件生成エラー"),
+    }
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
+
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "120"))
+        self.scheduler = UpstreamScheduler()
+        self.comprehensive_mode = os.getenv("OPENAI_COMPREHENSIVE_MODE", "single").lower()
+        if self.comprehensive_mode not in ("sections", "single"):
+            raise ValueError(f"Unknown OPENAI_COMPREHENSIVE_MODE: {self.comprehensive_mode}")
+        self.section_max_tokens = int(os.getenv("OPENAI_SECTION_MAX_TOKENS", "4000"))
+        self.map_reduce_threshold = int(os.getenv("OPENAI_MAP_REDUCE_THRESHOLD_TOKENS", "40000"))
+        self.chunk_tokens = int(os.getenv("OPENAI_CHUNK_TOKENS", "8000"))
+        self.chunk_summary_max_tokens = int(os.getenv("OPENAI_CHUNK_SUMMARY_MAX_TOKENS", "2000"))
+        self.retrieval_min_tokens = int(os.getenv("OPENAI_RETRIEVAL_MIN_TOKENS", "4000"))
+        self.retrieval_top_k = int(os.getenv("OPENAI_RETRIEVAL_TOP_K", "8"))
+        self._retrieval_calls = 0
+        self._retrieval_full_tokens = 0
+        self._retrieval_context_tokens = 0
+        self.pipeline_mode = os.getenv("OPENAI_PIPELINE_MODE", "direct").lower()
+        if self.pipeline_mode not in ("direct", "digest"):
+            raise ValueError(f"Unknown OPENAI_PIPELINE_MODE: {self.pipeline_mode}")
+        self.deterministic = os.getenv("OPENAI_DETERMINISTIC", "false").lower() in ("1", "true", "yes")
+        self.cache = cache if cache is not None else response_cache
+        self._singleflight = SingleFlight()
         
         # HTTPXクライアント問題を回避
         try:
             import httpx
-            # シンプルなHTTPクライアントを作成（タイムアウトを延長）
-            http_client = httpx.Client(timeout=120.0)
-            self.client = OpenAI(api_key=self.api_key, http_client=http_client, timeout=120.0)
+            # コネクションプールを明示したHTTPクライアントを作成
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+                keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+            )
+            self.http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=limits,
+                http2=self._http2_enabled(),
+            )
+            # 再試行はUpstreamSchedulerで行う
+            self.client = AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=self.http_client,
+                timeout=self.timeout,
+                max_retries=0
+            )
         except Exception:
             # フォールバック: 環境変数経由で初期化
+            self.http_client = None
             original_key = os.environ.get('OPENAI_API_KEY')
             os.environ['OPENAI_API_KEY'] = self.api_key
-            self.client = OpenAI(timeout=120.0)
+            self.client = AsyncOpenAI(timeout=self.timeout, max_retries=0)
             # 元の環境変数を復元
             if original_key:
                 os.environ['OPENAI_API_KEY'] = original_key
@@ -32,6 +216,272 @@ class OpenAIClient:
                 del os.environ['OPENAI_API_KEY']
             
         self.model = "gpt-4o"
+
+    @staticmethod
+    def _http2_enabled() -> bool:
+        if os.getenv("OPENAI_HTTP2", "true").lower() not in ("1", "true", "yes"):
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    async def aclose(self):
+        """
+        HTTPクライアントのコネクションを閉じる
+        """
+        await self.client.close()
+
+    def get_stats(self) -> dict:
+        """
+        生成リクエストの同時実行状況を取得
+        """
+        return {
+            **self.scheduler.get_stats(),
+            "singleflight": self._singleflight.get_stats(),
+            "retrieval": {
+                "calls": self._retrieval_calls,
+                "full_text_tokens": self._retrieval_full_tokens,
+                "context_tokens": self._retrieval_context_tokens,
+                "tokens_saved": self._retrieval_full_tokens - self._retrieval_context_tokens,
+            },
+        }
+
+    @staticmethod
+    def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+        """
+        レート制限用にリクエストのトークン数を見積もる（日本語は概ね1文字1トークン）
+        """
+        return len(prompt) + max_tokens
+
+    def _resolve_temperature(self, temperature: float) -> float:
+        return 0.0 if self.deterministic else temperature
+
+    def generation_version(self) -> str:
+        """
+        生成結果の再利用可否の判定に使う識別子（プロンプトテンプレートのバージョンと生成設定）
+        """
+        return ":".join([
+            self.PROMPT_TEMPLATE_VERSION,
+            self.model,
+            self.pipeline_mode,
+            self.comprehensive_mode,
+            "deterministic" if self.deterministic else "sampled",
+        ])
+
+    def _cache_key(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        response_format: Optional[dict] = None
+    ) -> Optional[str]:
+        if not self.cache.enabled:
+            return None
+        return self._prompt_fingerprint(prompt, max_tokens, temperature, response_format)
+
+    def _prompt_fingerprint(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        response_format: Optional[dict] = None
+    ) -> str:
+        return ResponseCache.make_key(
+            self.model,
+            self.PROMPT_TEMPLATE_VERSION,
+            prompt,
+            temperature,
+            max_tokens,
+            {"response_format": response_format} if response_format else None
+        )
+
+    async def _create_completion(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        response_format: Optional[dict] = None,
+        refresh: bool = False
+    ) -> str:
+        """
+        同時実行数の上限内でChat Completions APIを呼び出す
+
+        同じプロンプトはキャッシュから返し、実行中の同じリクエストには相乗りする。
+        refresh=Trueの場合はキャッシュ・相乗りを使わずに呼び出し、キャッシュを新しい結果で上書きする
+        """
+        temperature = self._resolve_temperature(temperature)
+        cache_key = self._cache_key(prompt, max_tokens, temperature, response_format)
+        if refresh:
+            return await self._request_completion(prompt, max_tokens, temperature, cache_key, response_format)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        return await self._singleflight.do(
+            self._prompt_fingerprint(prompt, max_tokens, temperature, response_format),
+            lambda: self._request_completion(prompt, max_tokens, temperature, cache_key, response_format)
+        )
+
+    async def _request_completion(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        cache_key: Optional[str],
+        response_format: Optional[dict] = None
+    ) -> str:
+        """
+        Chat Completions APIを呼び出し、結果をキャッシュに保存
+        """
+        response = await self.scheduler.call(
+            lambda: self.client.chat.completions.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                **({"response_format": response_format} if response_format else {})
+            ),
+            self._estimate_tokens(prompt, max_tokens)
+        )
+
+        content = response.choices[0].message.content
+        if cache_key is not None and content:
+            tokens = response.usage.total_tokens if response.usage is not None else 0
+            self.cache.put(cache_key, content, tokens)
+        return content
+
+    async def _create_completion_stream(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        refresh: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        同時実行数の上限内でChat Completions APIをストリーミングで呼び出す
+
+        生成されたトークンを {"type": "delta"} として順次返し、最後に使用量と所要時間を
+        {"type": "done"} として返す。キャッシュにヒットした場合は生成結果全体を1つのdeltaとして返す
+        （refresh=Trueの場合はキャッシュを使わずに生成し、キャッシュを新しい結果で上書きする）
+        """
+        temperature = self._resolve_temperature(temperature)
+        start_time = time.perf_counter()
+        cache_key = self._cache_key(prompt, max_tokens, temperature)
+        if cache_key is not None and not refresh:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield {"type": "delta", "content": cached}
+                elapsed = round(time.perf_counter() - start_time, 3)
+                yield {
+                    "type": "done",
+                    "finish_reason": "stop",
+                    "usage": None,
+                    "cached": True,
+                    "timing": {"first_token_seconds": elapsed, "total_seconds": elapsed}
+                }
+                return
+
+        # ストリームを開くまでは再試行し、開いた後は読み終わるまで枠を確保したままにする
+        stream = await self.scheduler.open(
+            lambda: self.client.chat.completions.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                stream=True,
+                stream_options={"include_usage": True}
+            ),
+            self._estimate_tokens(prompt, max_tokens)
+        )
+        first_token_seconds = None
+        finish_reason = None
+        usage = None
+        parts = []
+        completed = False
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                if choice.delta and choice.delta.content:
+                    if first_token_seconds is None:
+                        first_token_seconds = time.perf_counter() - start_time
+                    parts.append(choice.delta.content)
+                    yield {"type": "delta", "content": choice.delta.content}
+            completed = True
+        finally:
+            await stream.close()
+            await self.scheduler.release(success=completed)
+
+        # 最後まで生成できた結果のみキャッシュする（max_tokensで打ち切られた・中断された結果は再利用しない）
+        if cache_key is not None and parts and completed and finish_reason == "stop":
+            tokens = usage.get("total_tokens", 0) if usage else 0
+            self.cache.put(cache_key, "".join(parts), tokens)
+
+        yield {
+            "type": "done",
+            "finish_reason": finish_reason,
+            "usage": usage,
+            "cached": False,
+            "timing": {
+                "first_token_seconds": round(first_token_seconds, 3) if first_token_seconds is not None else None,
+                "total_seconds": round(time.perf_counter() - start_time, 3)
+            }
+        }
+
+    def build_section_prompt(self, section: str, requirements_text: str) -> str:
+        """
+        セクション名に対応するプロンプトを作成
+        """
+        if section not in self.SECTIONS:
+            raise ValueError(f"Unknown section: {section}")
+        builder_name = self.SECTIONS[section][0]
+        return getattr(self, builder_name)(requirements_text)
+
+    async def stream_section(
+        self,
+        section: str,
+        requirements_text: str,
+        index: Optional[RetrievalIndex] = None,
+        refresh: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        指定セクションをストリーミングで生成
+
+        Args:
+            section: セクション名（SECTIONSのキー）
+            requirements_text: 抽出された要件定義書のテキスト
+            index: セッションの検索インデックス（未指定で必要な場合はその場で作成）
+            refresh: 生成結果キャッシュを使わずに生成する
+
+        Returns:
+            delta（生成されたトークン）とdone（使用量・所要時間）のイベントを返す非同期イテレーター
+        """
+        _, max_tokens, temperature, error_prefix = self.SECTIONS[section]
+        try:
+            requirements_text = await self.prepare_section_text(section, requirements_text, index)
+            prompt = self.build_section_prompt(section, requirements_text)
+            async for event in self._create_completion_stream(prompt, max_tokens, temperature, refresh):
+                yield event
+        except Exception as e:
+            raise Exception(f"{error_prefix}: {str(e)}")
     
     async def generate_system_requirements(self, requirements_text: str) -> str:
         """
@@ -43,44 +493,258 @@ class OpenAIClient:
         Returns:
             生成されたシステム要件定義書のドラフト
         """
+        result = await self.generate_comprehensive(requirements_text)
+        return result["document"]
+
+    async def generate_comprehensive(
+        self,
+        requirements_text: str,
+        on_section_done: Optional[Callable[[str, int, int], None]] = None,
+        refresh: bool = False
+    ) -> dict:
+        """
+        OPENAI_COMPREHENSIVE_MODEに従ってシステム要件定義書を生成
+
+        Args:
+            requirements_text: 抽出された要件定義書のテキスト
+            on_section_done: sectionsモードで各セクションの生成が終わるたびに
+                (セクション名, 完了数, セクション数) で呼び出される
+            refresh: 生成結果キャッシュを使わずに生成する（チャンクの要約はキャッシュを使う）
+
+        Returns:
+            document（生成された文書）とreport（生成方式・所要時間・セクションごとの所要時間）
+        """
+        start_time = time.perf_counter()
         try:
-            # 非同期でOpenAI APIを呼び出し
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                functools.partial(self._call_openai_api, requirements_text)
-            )
-            return response
+            requirements_text, input_report = await self.fit_requirements_text(requirements_text)
+            if self.comprehensive_mode == "sections":
+                document, sections = await self._generate_sections_parallel(
+                    requirements_text, on_section_done, refresh
+                )
+            else:
+                document = await self._call_openai_api(requirements_text, refresh)
+                sections = []
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
+
+        return {
+            "document": document,
+            "report": {
+                "mode": self.comprehensive_mode,
+                "total_seconds": round(time.perf_counter() - start_time, 3),
+                "input": input_report,
+                "sections": sections
+            }
+        }
     
-    def _call_openai_api(self, requirements_text: str) -> str:
+    async def _call_openai_api(self, requirements_text: str, refresh: bool = False) -> str:
         """
-        OpenAI APIの同期呼び出し
+        OpenAI APIの非同期呼び出し
         """
         prompt = self._create_system_requirements_prompt(requirements_text)
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            max_tokens=16000,
-            temperature=0.7,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        )
-        
-        return response.choices[0].message.content
+        return await self._create_completion(prompt, max_tokens=16000, temperature=0.7, refresh=refresh)
+
+    async def _generate_sections_parallel(
+        self,
+        requirements_text: str,
+        on_section_done: Optional[Callable[[str, int, int], None]] = None,
+        refresh: bool = False
+    ) -> tuple:
+        """
+        システム要件定義書の各セクションを並列に生成し、セクション順に結合
+
+        全体の所要時間は最も遅いセクションの所要時間で決まる。
+        いずれかのセクションが失敗した場合は残りのリクエストをキャンセルする
+        """
+        total = len(SYSTEM_REQUIREMENTS_SECTIONS)
+        completed = 0
+
+        async def generate(index: int) -> tuple:
+            nonlocal completed
+            result = await self._generate_section(requirements_text, index, refresh)
+            completed += 1
+            if on_section_done is not None:
+                on_section_done(SYSTEM_REQUIREMENTS_SECTIONS[index][0], completed, total)
+            return result
+
+        results = await self._gather_or_cancel(generate(index) for index in range(total))
+
+        blocks = ["# システム要件定義書"]
+        sections = []
+        for number, ((title, _), (content, seconds)) in enumerate(
+            zip(SYSTEM_REQUIREMENTS_SECTIONS, results), start=1
+        ):
+            blocks.append(f"## {number}. {title}\n\n{content.strip()}")
+            sections.append({"section": title, "seconds": seconds})
+        return "\n\n".join(blocks) + "\n", sections
+
+    @staticmethod
+    async def _gather_or_cancel(coroutines) -> list:
+        """
+        コルーチンを並列に実行して結果を順番に返す（いずれかが失敗した場合は残りをキャンセル）
+        """
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def fit_requirements_text(self, requirements_text: str) -> tuple:
+        """
+        要件定義書がトークン数の閾値を超える場合、見出しの境界で分割して各チャンクを並列に要約し、
+        要約を結合したテキストを返す（map-reduce）。閾値以下の場合はそのまま返す
+
+        各セクションの生成（reduce）は結合した要約をもとに行う。
+        チャンクの要約は同じプロンプトになるため、複数セクションから同時に呼ばれても
+        キャッシュ・相乗りにより1回だけ実行される
+
+        Returns:
+            (生成に使うテキスト, 見積もりトークン数・チャンク数・要約回数のレポート)
+        """
+        loop = asyncio.get_running_loop()
+        original_tokens = await self._count_tokens(requirements_text)
+        tokens = original_tokens
+        chunks = 0
+        rounds = 0
+        while tokens > self.map_reduce_threshold and rounds < self.MAX_MAP_REDUCE_ROUNDS:
+            parts = await loop.run_in_executor(None, split_into_chunks, requirements_text, self.chunk_tokens)
+            summaries = await self._gather_or_cancel(
+                self._summarize_chunk(part, index, len(parts))
+                for index, part in enumerate(parts, start=1)
+            )
+            requirements_text = "\n\n".join(
+                f"### 抜粋 {index}/{len(parts)}\n{summary.strip()}"
+                for index, summary in enumerate(summaries, start=1)
+            )
+            tokens = await self._count_tokens(requirements_text)
+            chunks = chunks or len(parts)
+            rounds += 1
+
+        return requirements_text, {
+            "estimated_tokens": original_tokens,
+            "condensed_tokens": tokens if rounds else None,
+            "chunks": chunks,
+            "map_reduce_rounds": rounds
+        }
+
+    @staticmethod
+    async def _count_tokens(text: str) -> int:
+        """
+        テキストのトークン数をイベントループをブロックせずに見積もる
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, estimate_tokens, text)
+
+    async def needs_retrieval_index(self, requirements_text: str) -> bool:
+        # 見積もりトークン数は文字数を超えないため、短いテキストは数えずに判定する
+        if len(requirements_text) <= self.retrieval_min_tokens:
+            return False
+        return await self._count_tokens(requirements_text) > self.retrieval_min_tokens
+
+    @staticmethod
+    async def build_retrieval_index(requirements_text: str) -> RetrievalIndex:
+        """
+        検索インデックスをイベントループをブロックせずに作成
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, RetrievalIndex, requirements_text)
+
+    async def prepare_section_text(
+        self,
+        section: str,
+        requirements_text: str,
+        index: Optional[RetrievalIndex] = None
+    ) -> str:
+        """
+        セクションの生成に渡すテキストを作成
+
+        RETRIEVAL_QUERIESにあるセクションで要件定義書がOPENAI_RETRIEVAL_MIN_TOKENSを超える場合は
+        目次と関連するチャンクのみを返し、それ以外はfit_requirements_textの結果を返す
+        """
+        query = self.RETRIEVAL_QUERIES.get(section)
+        if query is not None and await self.needs_retrieval_index(requirements_text):
+            if index is None:
+                index = await self.build_retrieval_index(requirements_text)
+            context = index.build_context(query, self.retrieval_top_k)
+            report = context["report"]
+            if report["chunks_selected"] > 0:
+                self._retrieval_calls += 1
+                self._retrieval_full_tokens += report["full_tokens"]
+                self._retrieval_context_tokens += report["context_tokens"]
+                return context["text"]
+
+        requirements_text, _ = await self.fit_requirements_text(requirements_text)
+        return requirements_text
+
+    async def _summarize_chunk(self, chunk: str, index: int, total: int) -> str:
+        """
+        要件定義書の1チャンクから要件を抽出・要約
+        """
+        prompt = self._create_chunk_summary_prompt(chunk, index, total)
+        return await self._create_completion(
+            prompt, max_tokens=self.chunk_summary_max_tokens, temperature=0.0
+        ) or ""
+
+    def _create_chunk_summary_prompt(self, chunk: str, index: int, total: int) -> str:
+        """
+        要件定義書のチャンク要約用のプロンプトを作成
+        """
+        prompt = f"""
+以下は大きな要件定義書を分割した一部（{index}/{total}）です。この部分から、システム要件定義書の作成に必要な情報を漏れなく抽出し、簡潔に要約してください。
+
+## 要件定義書の一部（{index}/{total}）:
+{chunk}
+
+## 抽出する内容:
+- 業務・システムの目的、対象ユーザー、スコープ
+- 機能要件（機能名と処理内容、入出力、データ項目）
+- 外部システム・インターフェース
+- 性能・可用性・セキュリティ・運用などの非機能要件（数値はそのまま残す）
+- 制約事項・前提条件・リスク
+
+## 注意事項:
+- 原文にない内容を補完しないでください
+- 固有名詞・数値・画面名・帳票名・項目名は原文のまま残してください
+- 章・節の見出しがあれば残し、箇条書きで出力してください
+- 該当する内容がない項目は省略してください
+"""
+        return prompt
+
+    async def _generate_section(self, requirements_text: str, index: int, refresh: bool = False) -> tuple:
+        """
+        システム要件定義書の1セクションを生成し、本文と所要時間を返す
+        """
+        title = SYSTEM_REQUIREMENTS_SECTIONS[index][0]
+        prompt = self._create_system_requirements_section_prompt(requirements_text, index)
+        start_time = time.perf_counter()
+        try:
+            content = await self._create_completion(
+                prompt, max_tokens=self.section_max_tokens, temperature=0.7, refresh=refresh
+            )
+        except Exception as e:
+            raise Exception(f"{title}: {str(e)}")
+        return content or "", round(time.perf_counter() - start_time, 3)
     
     
-    async def generate_functional_diagram(self, requirements_text: str) -> str:
+    async def generate_functional_diagram(self, requirements_text: str, refresh: bool = False) -> str:
         """
         機能構成図をMermaid記法で生成
         """
         try:
-            prompt = f"""
+            requirements_text, _ = await self.fit_requirements_text(requirements_text)
+            prompt = self._create_functional_diagram_prompt(requirements_text)
+            return await self._call_openai_api_simple(prompt, refresh)
+        except Exception as e:
+            raise Exception(f"機能構成図生成エラー: {str(e)}")
+    
+    def _create_functional_diagram_prompt(self, requirements_text: str) -> str:
+        """
+        機能構成図生成用のプロンプトを作成
+        """
+        prompt = f"""
 以下の要件定義書を分析し、システムの機能構成図をMermaid記法で作成してください。
 
 要件定義書:
@@ -104,22 +768,29 @@ flowchart TD
 
 機能構成図のMermaidコードを生成してください:
 """
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                functools.partial(self._call_openai_api_simple, prompt)
-            )
-            return response
-        except Exception as e:
-            raise Exception(f"機能構成図生成エラー: {str(e)}")
+        return prompt
     
-    async def generate_external_interfaces(self, requirements_text: str) -> str:
+    async def generate_external_interfaces(
+        self,
+        requirements_text: str,
+        index: Optional[RetrievalIndex] = None,
+        refresh: bool = False
+    ) -> str:
         """
         外部インターフェース要件を生成
         """
         try:
-            prompt = f"""
+            requirements_text = await self.prepare_section_text("external-interfaces", requirements_text, index)
+            prompt = self._create_external_interfaces_prompt(requirements_text)
+            return await self._call_openai_api_simple(prompt, refresh)
+        except Exception as e:
+            raise Exception(f"外部IF要件生成エラー: {str(e)}")
+    
+    def _create_external_interfaces_prompt(self, requirements_text: str) -> str:
+        """
+        外部インターフェース要件生成用のプロンプトを作成
+        """
+        prompt = f"""
 以下の要件定義書を分析し、外部インターフェース要件を詳細に記述してください。
 
 要件定義書:
@@ -154,22 +825,29 @@ flowchart TD
 
 Markdown形式で詳細な外部インターフェース要件を作成してください:
 """
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                functools.partial(self._call_openai_api_simple, prompt)
-            )
-            return response
-        except Exception as e:
-            raise Exception(f"外部IF要件生成エラー: {str(e)}")
+        return prompt
     
-    async def generate_performance_requirements(self, requirements_text: str) -> str:
+    async def generate_performance_requirements(
+        self,
+        requirements_text: str,
+        index: Optional[RetrievalIndex] = None,
+        refresh: bool = False
+    ) -> str:
         """
         性能要件を詳細に生成
         """
         try:
-            prompt = f"""
+            requirements_text = await self.prepare_section_text("performance-requirements", requirements_text, index)
+            prompt = self._create_performance_requirements_prompt(requirements_text)
+            return await self._call_openai_api_simple(prompt, refresh)
+        except Exception as e:
+            raise Exception(f"性能要件生成エラー: {str(e)}")
+    
+    def _create_performance_requirements_prompt(self, requirements_text: str) -> str:
+        """
+        性能要件生成用のプロンプトを作成
+        """
+        prompt = f"""
 以下の要件定義書を分析し、詳細な性能要件を作成してください。
 
 要件定義書:
@@ -209,22 +887,29 @@ Markdown形式で詳細な外部インターフェース要件を作成してく
 
 具体的な数値を含む詳細な性能要件をMarkdown形式で作成してください:
 """
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                functools.partial(self._call_openai_api_simple, prompt)
-            )
-            return response
-        except Exception as e:
-            raise Exception(f"性能要件生成エラー: {str(e)}")
+        return prompt
     
-    async def generate_security_requirements(self, requirements_text: str) -> str:
+    async def generate_security_requirements(
+        self,
+        requirements_text: str,
+        index: Optional[RetrievalIndex] = None,
+        refresh: bool = False
+    ) -> str:
         """
         セキュリティ要件を詳細に生成
         """
         try:
-            prompt = f"""
+            requirements_text = await self.prepare_section_text("security-requirements", requirements_text, index)
+            prompt = self._create_security_requirements_prompt(requirements_text)
+            return await self._call_openai_api_simple(prompt, refresh)
+        except Exception as e:
+            raise Exception(f"セキュリティ要件生成エラー: {str(e)}")
+    
+    def _create_security_requirements_prompt(self, requirements_text: str) -> str:
+        """
+        セキュリティ要件生成用のプロンプトを作成
+        """
+        prompt = f"""
 以下の要件定義書を分析し、包括的なセキュリティ要件を作成してください。
 
 要件定義書:
@@ -274,33 +959,13 @@ Markdown形式で詳細な外部インターフェース要件を作成してく
 
 詳細なセキュリティ要件をMarkdown形式で作成してください:
 """
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                functools.partial(self._call_openai_api_simple, prompt)
-            )
-            return response
-        except Exception as e:
-            raise Exception(f"セキュリティ要件生成エラー: {str(e)}")
+        return prompt
     
-    def _call_openai_api_simple(self, prompt: str) -> str:
+    async def _call_openai_api_simple(self, prompt: str, refresh: bool = False) -> str:
         """
         シンプルなOpenAI API呼び出し
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
-            max_tokens=8000,
-            temperature=0.7,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        )
-        
-        return response.choices[0].message.content
+        return await self._create_completion(prompt, max_tokens=8000, temperature=0.7, refresh=refresh)
     
     def _create_system_requirements_prompt(self, requirements_text: str) -> str:
         """
@@ -314,63 +979,7 @@ Markdown形式で詳細な外部インターフェース要件を作成してく
 
 ## システム要件定義書に含めるべき項目:
 
-1. **システム概要**
-   - システムの目的と背景
-   - 対象ユーザー
-   - システムのスコープ
-
-2. **機能要件**
-   - 主要機能の詳細
-   - ユーザーストーリー/ユースケース
-   - 入出力要件
-   - データ要件
-
-3. **機能構成図**
-   - システム全体の機能構成をMermaid記法で表現
-   - 主要機能モジュール間の関係
-   - データフローの概要
-
-4. **外部インターフェース要件**
-   - 外部システムとの連携仕様
-   - API接続要件
-   - データ交換フォーマット
-   - 認証・認可方式
-
-5. **性能要件**
-   - レスポンス時間要件（具体的な数値）
-   - スループット要件（トランザクション数/秒）
-   - 同時接続ユーザー数
-   - データ容量・成長予測
-   - 可用性要件（稼働率）
-
-6. **セキュリティ要件**
-   - 認証・認可方式
-   - データ暗号化要件
-   - アクセス制御ポリシー
-   - 監査ログ要件
-   - セキュリティテスト要件
-   - 脆弱性対策
-
-7. **非機能要件（その他）**
-   - 運用・保守要件
-   - 拡張性要件
-   - 互換性要件
-   - 国際化・ローカライゼーション
-
-8. **システム構成**
-   - システムアーキテクチャ概要
-   - 技術スタック
-   - データベース設計方針
-   - インフラ構成
-
-9. **制約事項**
-   - 技術的制約
-   - 業務上の制約
-   - 予算・スケジュール制約
-
-10. **リスクと対策**
-    - 想定されるリスク
-    - 対応策
+{format_system_requirements_outline()}
 
 ## 出力フォーマット:
 Markdown形式で構造化された文書として出力してください。
@@ -384,6 +993,44 @@ Markdown形式で構造化された文書として出力してください。
 - 性能要件とセキュリティ要件は特に詳細に記述してください
 
 システム要件定義書のドラフトを作成してください:
+"""
+        return prompt
+    
+    def _create_system_requirements_section_prompt(self, requirements_text: str, index: int) -> str:
+        """
+        システム要件定義書の1セクション生成用のプロンプトを作成
+
+        要件定義書と文書全体の構成は全セクション共通とし、担当セクションのみを指示する
+        """
+        number = index + 1
+        title, items = SYSTEM_REQUIREMENTS_SECTIONS[index]
+        item_lines = "\n".join(f"- {item}" for item in items)
+        prompt = f"""
+あなたは経験豊富なシステムアナリストです。以下の要件定義書の内容を分析し、詳細なシステム要件定義書のドラフトを作成しています。
+
+## 入力された要件定義書:
+{requirements_text}
+
+## システム要件定義書の全体構成:
+
+{format_system_requirements_outline()}
+
+## 今回作成するセクション:
+{number}. **{title}**
+{item_lines}
+
+## 出力フォーマット:
+- 「{number}. {title}」セクションの本文のみをMarkdown形式で出力してください
+- セクション見出し（## {number}. {title}）は付与済みのため出力しないでください。小見出しは###以下を使用してください
+- 他のセクションの内容は他の担当者が作成するため、重複して記述しないでください
+- 必要に応じて表やリストを使用して整理し、図はMermaid記法を使用してください
+
+## 注意事項:
+- 入力された要件定義書に明記されていない部分については、一般的なベストプラクティスに基づいて補完してください
+- 具体的で実装可能な要件として記述してください
+- 曖昧な表現は避け、定量的な指標を可能な限り含めてください
+
+「{number}. {title}」セクションの本文を作成してください:
 """
         return prompt
     
@@ -395,58 +1042,65 @@ Markdown形式で構造化された文書として出力してください。
             requirements_text: 要件定義書のテキスト
             
         Returns:
-            分類された要件の辞書
+            分類された要件の辞書（REQUIREMENTS_DIGEST_CATEGORIESのキーごとの文字列リスト）
         """
         try:
+            requirements_text, _ = await self.fit_requirements_text(requirements_text)
+            fields = ",\n".join(
+                f'    "{key}": ["{label}1", "{label}2", ...]'
+                for key, label in REQUIREMENTS_DIGEST_CATEGORIES
+            )
             prompt = f"""
 以下の要件定義書から主要な要件を抽出し、カテゴリごとに分類してください。
 
 要件定義書:
 {requirements_text}
 
+## 注意事項:
+- 後続の工程ではこの抽出結果のみをもとにシステム要件定義書を作成するため、要件を漏れなく抽出してください
+- 数値（件数・時間・稼働率など）・固有名詞・外部システム名・画面名・帳票名は原文のまま残してください
+- 原文にない内容は補完せず、該当がないカテゴリは空のリストにしてください
+
 以下のJSON形式で出力してください:
 {{
-    "functional_requirements": ["機能要件1", "機能要件2", ...],
-    "non_functional_requirements": ["非機能要件1", "非機能要件2", ...],
-    "business_requirements": ["業務要件1", "業務要件2", ...],
-    "technical_constraints": ["技術制約1", "技術制約2", ...],
-    "stakeholders": ["ステークホルダー1", "ステークホルダー2", ...]
+{fields}
 }}
 """
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                functools.partial(self._call_openai_api_json, prompt)
-            )
+            response = await self._call_openai_api_json(prompt)
             
             import json
-            return json.loads(response)
+            extracted = json.loads(response)
+            digest = {}
+            for key, _ in REQUIREMENTS_DIGEST_CATEGORIES:
+                # JSONモードでもリストの代わりに文字列を返すことがあるため、リストに揃える
+                value = extracted.get(key) or []
+                items = value if isinstance(value, list) else [value]
+                digest[key] = [item.strip() for item in items if isinstance(item, str) and item.strip()]
+            return digest
             
         except Exception as e:
             # エラー時は空の辞書を返す
-            return {
-                "functional_requirements": [],
-                "non_functional_requirements": [],
-                "business_requirements": [],
-                "technical_constraints": [],
-                "stakeholders": []
-            }
+            return {key: [] for key, _ in REQUIREMENTS_DIGEST_CATEGORIES}
+
+    @staticmethod
+    def format_requirements_digest(digest: dict) -> str:
+        """
+        抽出・分類した要件をプロンプトに含めるMarkdownに変換（要件がない場合は空文字列）
+        """
+        blocks = []
+        for key, label in REQUIREMENTS_DIGEST_CATEGORIES:
+            items = digest.get(key) or []
+            if items:
+                lines = [f"### {label}"]
+                lines.extend(f"- {item}" for item in items)
+                blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
     
-    def _call_openai_api_json(self, prompt: str) -> str:
+    async def _call_openai_api_json(self, prompt: str) -> str:
         """
         JSON出力用のOpenAI API呼び出し
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
-            max_tokens=2000,
-            temperature=0.3,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+        return await self._create_completion(
+            prompt, max_tokens=4000, temperature=0.3, response_format={"type": "json_object"}
         )
-        
-        return response.choices[0].message.content
\ No newline at end of file
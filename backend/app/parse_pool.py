@@ -0,0 +1,48 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+class ParsePool:
+    """
+    PDFのページ範囲やExcelのシートなど、1ファイル内の分割単位を並列に解析するプロセスプール
+
+    - PARSE_POOL_WORKERS: 解析に使うプロセス数（1で逐次処理）
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or int(
+            os.getenv("PARSE_POOL_WORKERS", str(os.cpu_count() or 1))
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def parallel_enabled(self) -> bool:
+        """
+        このプロセスから並列解析が可能かどうか
+
+        抽出ワーカープールの子プロセス内ではプロセス数が膨らまないよう逐次処理にする
+        """
+        return self.max_workers > 1 and multiprocessing.parent_process() is None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def shutdown(self):
+        """
+        プロセスプールを停止
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# グローバルな解析プールインスタンス
+parse_pool = ParsePool()
@@ -0,0 +1,142 @@
+import io
+import os
+import hashlib
+import tempfile
+from collections import deque
+from typing import Iterator, List, Optional, Tuple, Union
+
+import PyPDF2
+
+from .parse_pool import ParsePool, parse_pool
+
+
+# ワーカー内で直近に開いたPDFを保持（同じファイルの別ページ範囲で再解析しないため）
+_worker_reader: Optional[Tuple[str, PyPDF2.PdfReader]] = None
+
+
+def _open_reader(file_content: Union[bytes, str]) -> PyPDF2.PdfReader:
+    if isinstance(file_content, (bytes, bytearray)):
+        return PyPDF2.PdfReader(io.BytesIO(file_content))
+    return PyPDF2.PdfReader(file_content)
+
+
+def _extract_page_range(path: str, doc_key: str, start: int, end: int) -> List[str]:
+    """
+    ワーカー上で指定ページ範囲のテキストを抽出
+
+    ワーカーには一時ファイルのパスだけを渡して直接読み込ませるため、バイトデータの転送は発生しない
+    """
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != doc_key:
+        _worker_reader = (doc_key, _open_reader(path))
+    reader = _worker_reader[1]
+
+    return [reader.pages[page_num].extract_text() for page_num in range(start, end)]
+
+
+class PdfExtractionEngine:
+    """
+    ページ範囲を解析プールの複数プロセスに分割してPDFからテキストを抽出するエンジン
+
+    - PDF_PAGES_PER_CHUNK: 1タスクあたりのページ数
+    - PDF_PARALLEL_MIN_PAGES: 並列処理を行う最小ページ数
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ParsePool] = None,
+        pages_per_chunk: Optional[int] = None,
+        parallel_min_pages: Optional[int] = None,
+    ):
+        self.pool = pool if pool is not None else parse_pool
+        self.pages_per_chunk = pages_per_chunk or int(os.getenv("PDF_PAGES_PER_CHUNK", "8"))
+        self.parallel_min_pages = parallel_min_pages or int(
+            os.getenv("PDF_PARALLEL_MIN_PAGES", "32")
+        )
+
+    @property
+    def parallel_enabled(self) -> bool:
+        return self.pool.parallel_enabled
+
+    def will_parallelize(self, file_content: Union[bytes, str]) -> bool:
+        """
+        解析プールでページ範囲ごとに並列処理するか（ページ数がPDF_PARALLEL_MIN_PAGES以上）
+        """
+        if not self.parallel_enabled:
+            return False
+        return len(_open_reader(file_content).pages) >= self.parallel_min_pages
+
+    def extract_text(self, file_content: Union[bytes, str]) -> str:
+        """
+        PDFからテキストを抽出
+
+        Args:
+            file_content: PDFファイルのバイトデータ、または一時ファイルのパス
+
+        Returns:
+            ページ順に連結されたテキスト
+        """
+        return "\n".join(self.extract_text_iter(file_content)).strip()
+
+    def extract_text_iter(self, file_content: Union[bytes, str]) -> Iterator[str]:
+        """
+        ページごとのテキストをページ順に逐次返すジェネレーター
+
+        並列処理時は先頭から順に、ページ範囲の抽出が終わり次第そのページを返す。
+        実行中のページ範囲はワーカー数の2倍までに抑え、メモリ使用量を一定に保つ。
+        メモリ上のバイトデータは一時ファイルに書き出し、各タスクにはパスとページ範囲だけを渡す。
+        """
+        reader = _open_reader(file_content)
+        page_count = len(reader.pages)
+
+        if not self.parallel_enabled or page_count < self.parallel_min_pages:
+            for page in reader.pages:
+                yield page.extract_text()
+            return
+
+        # 並列処理ではワーカー側で再度開くため、親プロセスのリーダーは破棄
+        del reader
+
+        executor = self.pool.get_executor()
+        temp_path = None
+        if isinstance(file_content, (bytes, bytearray)):
+            doc_key = hashlib.sha1(file_content).hexdigest()
+            fd, temp_path = tempfile.mkstemp(prefix="pdf_", suffix=".pdf")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(file_content)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            path = temp_path
+        else:
+            doc_key = f"{file_content}:{os.path.getmtime(file_content)}"
+            path = file_content
+
+        ranges = deque(
+            (start, min(start + self.pages_per_chunk, page_count))
+            for start in range(0, page_count, self.pages_per_chunk)
+        )
+        max_in_flight = self.pool.max_workers * 2
+        in_flight = deque()
+
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < max_in_flight:
+                    start, end = ranges.popleft()
+                    in_flight.append(
+                        executor.submit(_extract_page_range, path, doc_key, start, end)
+                    )
+
+                for page_text in in_flight.popleft().result():
+                    yield page_text
+        finally:
+            for future in in_flight:
+                future.cancel()
+            # 取り消せなかったタスクの結果は使わないため、完了を待たずに削除する
+            if temp_path is not None:
+                os.remove(temp_path)
+
+
+# グローバルなPDF抽出エンジンインスタンス
+pdf_engine = PdfExtractionEngine()
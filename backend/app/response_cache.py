@@ -0,0 +1,245 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ResponseCache:
+    """
+    プロンプトのフィンガープリントをキーに生成結果を保持するキャッシュ
+
+    - メモリ層: 生成テキストのバイト数で上限を設けたLRU
+    - ディスク層: 再起動後も残るSQLiteファイル（パス指定時のみ有効）
+    - 両層ともTTLを過ぎたエントリはヒットとして扱わない
+
+    - OPENAI_RESPONSE_CACHE_MAX_MB: メモリ層の上限（MB、0で無効）
+    - OPENAI_RESPONSE_CACHE_PATH: ディスク層のSQLiteファイルパス（未設定でディスク層なし）
+    - OPENAI_RESPONSE_CACHE_DISK_MAX_MB: ディスク層の上限（MB）
+    - OPENAI_RESPONSE_CACHE_TTL: エントリの有効期間（秒、0で無期限）
+    """
+
+    def __init__(
+        self,
+        max_memory_mb: Optional[float] = None,
+        disk_path: Optional[str] = None,
+        max_disk_mb: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        if max_memory_mb is None:
+            max_memory_mb = float(os.getenv("OPENAI_RESPONSE_CACHE_MAX_MB", "32"))
+        if disk_path is None:
+            disk_path = os.getenv("OPENAI_RESPONSE_CACHE_PATH") or None
+        if max_disk_mb is None:
+            max_disk_mb = float(os.getenv("OPENAI_RESPONSE_CACHE_DISK_MAX_MB", "256"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("OPENAI_RESPONSE_CACHE_TTL", "86400"))
+
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+
+        # cache_key -> (生成テキスト, 使用トークン数, 有効期限)
+        self._memory: "OrderedDict[str, Tuple[str, int, Optional[float]]]" = OrderedDict()
+        self._memory_sizes = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions_memory = 0
+        self._evictions_disk = 0
+        self._tokens_saved = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.disk_path:
+            self._init_disk()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_memory_bytes > 0 or self._conn is not None
+
+    @staticmethod
+    def make_key(
+        model: str,
+        template_version: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        options: Optional[dict] = None
+    ) -> str:
+        """
+        モデル・プロンプトテンプレートのバージョン・プロンプト・生成パラメータからキャッシュキーを作成
+
+        optionsにはresponse_formatなど出力に影響するその他のパラメータを渡す
+        """
+        parts = [model, template_version, prompt, temperature, max_tokens]
+        if options:
+            parts.append(options)
+        fingerprint = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def _init_disk(self):
+        directory = os.path.dirname(self.disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.disk_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses (last_accessed)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _is_expired(expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        キャッシュから生成テキストを取得（ディスク層でヒットした場合はメモリ層に昇格）
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[2], now):
+                    self._memory.move_to_end(key)
+                    self._hits_memory += 1
+                    self._tokens_saved += entry[1]
+                    return entry[0]
+                self._remove_memory(key)
+                self._expired += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response, tokens, expires_at FROM responses WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if self._is_expired(row[2], now):
+                        self._conn.execute("DELETE FROM responses WHERE cache_key = ?", (key,))
+                        self._conn.commit()
+                        self._expired += 1
+                    else:
+                        self._conn.execute(
+                            "UPDATE responses SET last_accessed = ? WHERE cache_key = ?",
+                            (now, key),
+                        )
+                        self._conn.commit()
+                        self._hits_disk += 1
+                        self._tokens_saved += row[1]
+                        self._put_memory(key, (row[0], row[1], row[2]))
+                        return row[0]
+
+            self._misses += 1
+            return None
+
+    def put(self, key: str, response: str, tokens: int = 0):
+        """
+        生成テキストと使用トークン数をキャッシュに保存
+        """
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._put_memory(key, (response, tokens, expires_at))
+
+            if self._conn is not None:
+                size = len(response.encode("utf-8"))
+                if size > self.max_disk_bytes:
+                    return
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (cache_key, response, tokens, size, expires_at, last_accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, response, tokens, size, expires_at, time.time()),
+                )
+                self._evict_disk()
+                self._conn.commit()
+
+    def _put_memory(self, key: str, entry: Tuple[str, int, Optional[float]]):
+        size = len(entry[0].encode("utf-8"))
+        if size > self.max_memory_bytes:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= self._memory_sizes[key]
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        self._memory_sizes[key] = size
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_memory_bytes:
+            old_key, _ = self._memory.popitem(last=False)
+            self._memory_bytes -= self._memory_sizes.pop(old_key)
+            self._evictions_memory += 1
+
+    def _remove_memory(self, key: str):
+        del self._memory[key]
+        self._memory_bytes -= self._memory_sizes.pop(key)
+
+    def _evict_disk(self):
+        self._conn.execute(
+            "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_disk_bytes:
+            row = self._conn.execute(
+                "SELECT cache_key, size FROM responses ORDER BY last_accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM responses WHERE cache_key = ?", (row[0],))
+            total -= row[1]
+            self._evictions_disk += 1
+
+    def clear(self):
+        """
+        全てのキャッシュを削除
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_sizes.clear()
+            self._memory_bytes = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def get_stats(self) -> dict:
+        """
+        ヒット・ミス・期限切れ・退避の件数と節約したトークン数を取得
+        """
+        with self._lock:
+            return {
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "expired": self._expired,
+                "evictions_memory": self._evictions_memory,
+                "evictions_disk": self._evictions_disk,
+                "tokens_saved": self._tokens_saved,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": self._conn is not None,
+            }
+
+
+# グローバルな生成結果キャッシュインスタンス
+response_cache = ResponseCache()
@@ -0,0 +1,191 @@
+import os
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+
+def json_dumps(data: Any) -> bytes:
+    """
+    JSONをUTF-8のバイト列に変換（orjsonがあれば使用）
+
+    標準のjsonでも日本語を\\uXXXXにエスケープしない（1文字6バイト → 3バイト）
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    json_dumpsで変換するJSONレスポンス
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31: gzip形式のヘッダー・フッターを付ける
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Accept-Encodingに応じてレスポンスをbrotli（brotliパッケージがある場合）またはgzipで圧縮するASGIミドルウェア
+
+    minimum_size未満のレスポンス、圧縮済みのレスポンス、Server-Sent Events（トークンごとの送信を遅らせないため）は圧縮しない
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else RESPONSE_COMPRESSION_MIN_BYTES
+        self.gzip_level = gzip_level if gzip_level is not None else RESPONSE_GZIP_LEVEL
+        self.brotli_quality = brotli_quality if brotli_quality is not None else RESPONSE_BROTLI_QUALITY
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    @staticmethod
+    def negotiate(accept_encoding: str) -> Optional[str]:
+        """
+        Accept-Encodingから使用する圧縮方式を選ぶ（qが同じ場合はbrotliを優先）
+        """
+        qualities: Dict[str, float] = {}
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            name = name.strip().lower()
+            if not name:
+                continue
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            qualities[name] = quality
+
+        wildcard = qualities.get("*", 0.0)
+        candidates = [("gzip", qualities.get("gzip", wildcard))]
+        if brotli is not None:
+            candidates.insert(0, ("br", qualities.get("br", wildcard)))
+        name, quality = max(candidates, key=lambda candidate: candidate[1])
+        return name if quality > 0 else None
+
+    def create_compressor(self, encoding: str):
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _CompressionResponder:
+    """
+    最初のボディを受け取るまでレスポンスヘッダーの送信を遅らせ、圧縮するかどうかを決める
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+        if self.compressor is None:
+            await self._start(message)
+            return
+
+        more_body = message.get("more_body", False)
+        data = self.compressor.process(message.get("body", b""))
+        if not more_body:
+            data += self.compressor.finish()
+        if data or not more_body:
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _start(self, message):
+        start_message = self.start_message
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if (
+            "content-encoding" in headers
+            or headers.get("content-type", "").startswith("text/event-stream")
+            or (not more_body and len(body) < self.middleware.minimum_size)
+        ):
+            self.passthrough = True
+            await self._send(start_message)
+            await self._send(message)
+            return
+
+        self.compressor = self.middleware.create_compressor(self.encoding)
+        data = self.compressor.process(body)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            data += self.compressor.finish()
+            headers["Content-Length"] = str(len(data))
+
+        await self._send({**start_message, "headers": headers.raw})
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
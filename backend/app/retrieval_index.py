@@ -0,0 +1,131 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import List, Optional
+
+from .token_budget import HEADING_PATTERN, estimate_tokens, split_into_chunks
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    検索用にテキストを語に分割
+
+    英数字は単語単位、日本語は形態素解析を使わずに文字bigramで分割する
+    """
+    terms = []
+    for match in WORD_PATTERN.finditer(text.lower()):
+        word = match.group()
+        if word.isascii():
+            if len(word) > 1:
+                terms.append(word)
+        elif len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+class RetrievalIndex:
+    """
+    要件定義書のチャンクをBM25で検索するローカルインデックス（ネットワークを使わない）
+
+    - OPENAI_RETRIEVAL_CHUNK_TOKENS: 1チャンクあたりの見積もりトークン数
+    - OPENAI_RETRIEVAL_OUTLINE_TOKENS: 検索結果に付ける文書の見出し一覧の上限トークン数
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(
+        self,
+        text: str,
+        chunk_tokens: Optional[int] = None,
+        outline_tokens: Optional[int] = None,
+    ):
+        if chunk_tokens is None:
+            chunk_tokens = int(os.getenv("OPENAI_RETRIEVAL_CHUNK_TOKENS", "500"))
+        if outline_tokens is None:
+            outline_tokens = int(os.getenv("OPENAI_RETRIEVAL_OUTLINE_TOKENS", "1000"))
+
+        self.total_tokens = estimate_tokens(text)
+        self.chunks = split_into_chunks(text, chunk_tokens)
+        self.outline = self._build_outline(text, outline_tokens)
+
+        self._term_counts = [Counter(tokenize(chunk)) for chunk in self.chunks]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    @staticmethod
+    def _build_outline(text: str, max_tokens: int) -> str:
+        """
+        見出し行を文書順に並べた目次を作成
+        """
+        lines = []
+        tokens = 0
+        for line in text.splitlines():
+            if not HEADING_PATTERN.match(line):
+                continue
+            line = line.strip()[:100]
+            line_tokens = estimate_tokens(line) + 1
+            if tokens + line_tokens > max_tokens:
+                break
+            lines.append(line)
+            tokens += line_tokens
+        return "\n".join(lines)
+
+    def search(self, query: str, top_k: int) -> List[int]:
+        """
+        クエリとの関連度が高いチャンクの番号を関連度順に返す
+        """
+        terms = set(tokenize(query))
+        scores = []
+        for index, counts in enumerate(self._term_counts):
+            length_norm = self.K1 * (
+                1 - self.B + self.B * self._lengths[index] / (self._average_length or 1)
+            )
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.K1 + 1) / (tf + length_norm)
+            if score > 0:
+                scores.append((score, index))
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return [index for _, index in scores[:top_k]]
+
+    def build_context(self, query: str, top_k: int) -> dict:
+        """
+        文書の目次と関連するチャンク（文書順）からプロンプト用のテキストを作成
+
+        Returns:
+            text（プロンプト用テキスト）と、全文とのトークン数の比較
+        """
+        selected = sorted(self.search(query, top_k))
+        blocks = []
+        if self.outline:
+            blocks.append(f"### 文書の目次\n{self.outline}")
+        for index in selected:
+            blocks.append(f"### 抜粋 {index + 1}/{len(self.chunks)}\n{self.chunks[index]}")
+        text = "\n\n".join(blocks)
+        context_tokens = estimate_tokens(text)
+        return {
+            "text": text,
+            "report": {
+                "full_tokens": self.total_tokens,
+                "context_tokens": context_tokens,
+                "tokens_saved": max(0, self.total_tokens - context_tokens),
+                "chunks_selected": len(selected),
+                "chunks_total": len(self.chunks),
+            },
+        }
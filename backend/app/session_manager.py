@@ -1,104 +1,222 @@
+import os
+import time
 import uuid
-from typing import Dict, Optional
+import zlib
+import asyncio
+import functools
+from typing import Any, Optional
 from datetime import datetime, timedelta
-import threading
+
+from .session_store import TEXT_FIELD, create_session_store
+
+# 日時として扱うセッションのフィールド（ストアにはUNIX時刻で保存する）
+DATETIME_FIELDS = ('created_at', 'last_accessed')
+
+class SessionRecord:
+    """
+    セッションデータ（抽出テキストは圧縮したまま保持し、参照された時に1回だけ展開する）
+
+    dictと同じく session['extracted_text'] / session.get('requirements_digest') で参照できる
+    """
+
+    __slots__ = ('filename', 'created_at', 'last_accessed', 'text_length', 'extra', '_compressed_text', '_text')
+
+    def __init__(self, stored: dict):
+        stored = dict(stored)
+        self.filename: str = stored.pop('filename', "")
+        self.created_at: datetime = datetime.fromtimestamp(stored.pop('created_at'))
+        self.last_accessed: datetime = datetime.fromtimestamp(stored.pop('last_accessed'))
+        self.text_length: int = stored.pop('text_length', 0)
+        self._compressed_text: Optional[bytes] = stored.pop(TEXT_FIELD, None)
+        self._text: Optional[str] = None
+        self.extra: dict = stored
+
+    @property
+    def extracted_text(self) -> str:
+        if self._text is None:
+            if self._compressed_text is None:
+                raise KeyError('extracted_text')
+            self._text = zlib.decompress(self._compressed_text).decode('utf-8')
+        return self._text
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'extracted_text':
+            return self.extracted_text
+        if key in ('filename', 'created_at', 'last_accessed', 'text_length'):
+            return getattr(self, key)
+        return self.extra[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
 class SessionManager:
-    def __init__(self, session_timeout_minutes: int = 60):
-        self._sessions: Dict[str, dict] = {}
-        self._lock = threading.Lock()
+    """
+    アップロードした要件定義書のテキストをセッションとして保持する
+
+    保存先はSESSION_STOREで切り替える（sqlite / redis にすると複数のワーカー・サーバー間で共有できる）。
+    共有ストアに保存するため、セッションに格納する値はJSONに変換できるものに限る。
+    ストアへのアクセスはI/Oを伴うストア（sqlite / redis / SESSION_PERSIST_PATH）ではスレッドプールで実行し、
+    イベントループをブロックしない
+
+    - SESSION_TIMEOUT_MINUTES: セッションの有効期間（分、作成時刻から数える）
+    - SESSION_CLEANUP_INTERVAL: 期限切れのセッションを削除する間隔（秒）
+    - SESSION_COMPRESSION_LEVEL: 抽出テキストのzlib圧縮レベル（1〜9）
+    """
+
+    # 期限切れのセッションを1回の削除で処理する件数
+    CLEANUP_BATCH = 256
+
+    def __init__(
+        self,
+        session_timeout_minutes: Optional[int] = None,
+        store=None,
+        cleanup_interval: Optional[float] = None,
+        compression_level: Optional[int] = None,
+    ):
+        if session_timeout_minutes is None:
+            session_timeout_minutes = int(os.getenv("SESSION_TIMEOUT_MINUTES", "60"))
+        if cleanup_interval is None:
+            cleanup_interval = float(os.getenv("SESSION_CLEANUP_INTERVAL", "30"))
+        if compression_level is None:
+            compression_level = int(os.getenv("SESSION_COMPRESSION_LEVEL", "6"))
         self.timeout = timedelta(minutes=session_timeout_minutes)
-    
-    def create_session(self, extracted_text: str, filename: str) -> str:
+        self.compression_level = compression_level
+        self.cleanup_interval = cleanup_interval
+        self.store = store if store is not None else create_session_store()
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        期限切れのセッションを定期的に削除するタスクを起動（イベントループ上で呼び出す）
+        """
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.ensure_future(self._cleanup_loop())
+
+    async def shutdown(self):
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            await asyncio.gather(self._cleanup_task, return_exceptions=True)
+            self._cleanup_task = None
+
+    async def _call(self, func, *args, **kwargs):
+        """
+        ストアの処理を実行（I/Oを伴うストアはスレッドプールで実行する）
+        """
+        if not self.store.blocking:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                await self.sweep_expired_sessions()
+            except Exception:
+                # ストアに一時的に接続できない場合も次の周期で再試行する
+                pass
+
+    async def sweep_expired_sessions(self) -> int:
+        """
+        期限切れのセッションをCLEANUP_BATCH件ずつ削除（削除の合間にイベントループへ処理を戻す）
+        """
+        total = 0
+        while True:
+            deleted = await self._call(self.cleanup_expired_sessions, self.CLEANUP_BATCH)
+            if deleted == 0:
+                return total
+            total += deleted
+            await asyncio.sleep(0)
+
+    @staticmethod
+    def _to_stored(fields: dict) -> dict:
+        return {
+            key: value.timestamp() if key in DATETIME_FIELDS and isinstance(value, datetime) else value
+            for key, value in fields.items()
+        }
+
+    async def create_session(self, extracted_text: str, filename: str) -> str:
         """
         新しいセッションを作成し、抽出されたテキストを保存
+
+        テキストの圧縮（数MBで1秒近くかかる）はストアによらずスレッドプールで実行する
         """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._create, extracted_text, filename)
+
+    def _create(self, extracted_text: str, filename: str) -> str:
         session_id = str(uuid.uuid4())
-        
-        with self._lock:
-            self._sessions[session_id] = {
-                'extracted_text': extracted_text,
-                'filename': filename,
-                'created_at': datetime.now(),
-                'last_accessed': datetime.now()
-            }
-        
+        now = time.time()
+        self.store.create(session_id, {
+            TEXT_FIELD: zlib.compress(extracted_text.encode('utf-8'), self.compression_level),
+            'text_length': len(extracted_text),
+            'filename': filename,
+            'created_at': now,
+            'last_accessed': now
+        }, now + self.timeout.total_seconds())
         return session_id
+
+    def _get(self, session_id: str, include_text: bool) -> Optional[dict]:
+        now = time.time()
+        session = self.store.get(session_id, now, include_text=include_text)
+        if session is None:
+            return None
+
+        # 最終アクセス時刻はプロセス内のストアのみ読み込みごとに更新する
+        # （共有ストアでは読み込みのたびに書き込まず、セッションの更新時に記録する）
+        if not self.store.shared:
+            session['last_accessed'] = now
+            self.store.update(session_id, {'last_accessed': now}, now)
+        return session
     
-    def get_session_data(self, session_id: str) -> Optional[dict]:
+    async def get_session_data(self, session_id: str, include_text: bool = True) -> Optional[SessionRecord]:
         """
         セッションデータを取得
+
+        Args:
+            include_text: Falseの場合は抽出テキストを読み込まない（ファイル名・文字数などのみ参照する場合）
         """
-        with self._lock:
-            if session_id not in self._sessions:
-                return None
-            
-            session = self._sessions[session_id]
-            
-            # セッションの有効期限をチェック
-            if datetime.now() - session['created_at'] > self.timeout:
-                del self._sessions[session_id]
-                return None
-            
-            # 最終アクセス時刻を更新
-            session['last_accessed'] = datetime.now()
-            return session.copy()
+        session = await self._call(self._get, session_id, include_text)
+        return SessionRecord(session) if session is not None else None
     
-    def update_session(self, session_id: str, **kwargs) -> bool:
+    async def update_session(self, session_id: str, **kwargs) -> bool:
         """
         セッションデータを更新
         """
-        with self._lock:
-            if session_id not in self._sessions:
-                return False
-            
-            session = self._sessions[session_id]
-            
-            # セッションの有効期限をチェック
-            if datetime.now() - session['created_at'] > self.timeout:
-                del self._sessions[session_id]
-                return False
-            
-            # データを更新
-            for key, value in kwargs.items():
-                session[key] = value
-            
-            session['last_accessed'] = datetime.now()
-            return True
+        now = time.time()
+        fields = self._to_stored(kwargs)
+        fields['last_accessed'] = now
+        return await self._call(self.store.update, session_id, fields, now)
     
-    def delete_session(self, session_id: str) -> bool:
+    async def delete_session(self, session_id: str) -> bool:
         """
         セッションを削除
         """
-        with self._lock:
-            if session_id in self._sessions:
-                del self._sessions[session_id]
-                return True
-            return False
+        return await self._call(self.store.delete, session_id)
     
-    def cleanup_expired_sessions(self):
-        """
-        期限切れのセッションを削除
-        """
-        current_time = datetime.now()
-        expired_sessions = []
-        
-        with self._lock:
-            for session_id, session in self._sessions.items():
-                if current_time - session['created_at'] > self.timeout:
-                    expired_sessions.append(session_id)
-            
-            for session_id in expired_sessions:
-                del self._sessions[session_id]
-        
-        return len(expired_sessions)
+    def cleanup_expired_sessions(self, limit: Optional[int] = None) -> int:
+        """
+        期限切れのセッションを削除（limitを指定するとその件数程度で打ち切る）
+        """
+        return self.store.delete_expired(time.time(), limit)
     
     def get_session_count(self) -> int:
         """
         アクティブなセッション数を取得
         """
-        with self._lock:
-            return len(self._sessions)
+        return self.store.count(time.time())
+
+    async def get_stats(self) -> dict:
+        """
+        セッション数・保持しているバイト数・期限切れ/退避の件数を取得
+        """
+        return {
+            **await self._call(self.store.get_stats),
+            "timeout_seconds": self.timeout.total_seconds(),
+        }
 
 # グローバルなセッションマネージャーインスタンス
-session_manager = SessionManager()
\ No newline at end of file
+session_manager = SessionManager()
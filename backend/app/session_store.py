@@ -0,0 +1,560 @@
+import os
+import sys
+import json
+import heapq
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 圧縮した抽出テキストを格納するフィールド（他のフィールドと分けて保存し、必要な時だけ読み込む）
+TEXT_FIELD = "compressed_text"
+
+
+class _MemoryShard:
+    """
+    MemorySessionStoreの1区画（区画ごとにロック・LRU・有効期限のヒープを持つ）
+    """
+
+    __slots__ = ("sessions", "sizes", "bytes", "expiry_heap", "lock", "expired", "evicted")
+
+    def __init__(self):
+        # session_id -> (セッションデータ, 有効期限)（アクセス順）
+        self.sessions: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        # session_id -> フィールド名 -> 推定サイズ（更新時は変更したフィールドのみ計算し直す）
+        self.sizes: Dict[str, Dict[str, int]] = {}
+        self.bytes = 0
+        # (有効期限, session_id)（削除・再作成されたセッションの古い要素は取り出した時に読み飛ばす）
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self.lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def remove(self, session_id: str):
+        del self.sessions[session_id]
+        self.bytes -= sum(self.sizes.pop(session_id).values())
+
+
+class MemorySessionStore:
+    """
+    プロセス内のdictにセッションを保持するストア（複数プロセス間では共有されない）
+
+    - session_idのハッシュで区画に分け、区画ごとのロックで保護する（他の区画へのアクセスを妨げない）
+    - 区画ごとに合計バイト数の上限（全体の上限 / 区画数）を超えると、最後にアクセスされた時刻が古い順に退避する
+    - 期限切れのセッションは区画ごとに有効期限順のヒープから取り出して削除する（全件を走査しない）
+    """
+
+    # I/Oを伴わない（イベントループ上で直接呼び出せる）
+    blocking = False
+    # 他のプロセスと共有しない（読み込みごとに最終アクセス時刻を更新できる）
+    shared = False
+
+    def __init__(self, max_bytes: Optional[int] = None, shards: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("SESSION_MEMORY_MAX_MB", "512")) * 1024 * 1024)
+        if shards is None:
+            shards = int(os.getenv("SESSION_STORE_SHARDS", "16"))
+        self.max_bytes = max_bytes
+        self._shards = [_MemoryShard() for _ in range(max(1, shards))]
+        self._shard_max_bytes = max_bytes // len(self._shards)
+
+    def _shard(self, session_id: str) -> _MemoryShard:
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    @staticmethod
+    def _estimate_size(key: str, value) -> int:
+        size = sys.getsizeof(key)
+        if isinstance(value, (str, bytes)):
+            return size + sys.getsizeof(value)
+        return size + len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def _resize(self, shard: _MemoryShard, session_id: str, fields: dict):
+        """
+        変更したフィールドのサイズを反映し、区画の上限を超えた分を退避
+        """
+        sizes = shard.sizes.setdefault(session_id, {})
+        for key, value in fields.items():
+            size = self._estimate_size(key, value)
+            shard.bytes += size - sizes.get(key, 0)
+            sizes[key] = size
+
+        # 1件で上限を超えるセッションは退避せずに残す
+        while shard.bytes > self._shard_max_bytes and len(shard.sessions) > 1:
+            oldest = next(iter(shard.sessions))
+            if oldest == session_id:
+                shard.sessions.move_to_end(session_id)
+                oldest = next(iter(shard.sessions))
+            shard.remove(oldest)
+            shard.evicted += 1
+
+    def create(self, session_id: str, session: dict, expires_at: float):
+        shard = self._shard(session_id)
+        with shard.lock:
+            if session_id in shard.sessions:
+                shard.remove(session_id)
+            shard.sessions[session_id] = (dict(session), expires_at)
+            heapq.heappush(shard.expiry_heap, (expires_at, session_id))
+            self._resize(shard, session_id, session)
+
+    def get(self, session_id: str, now: float, include_text: bool = True) -> Optional[dict]:
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = shard.sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                shard.remove(session_id)
+                shard.expired += 1
+                return None
+            shard.sessions.move_to_end(session_id)
+            session = dict(entry[0])
+        if not include_text:
+            session.pop(TEXT_FIELD, None)
+        return session
+
+    def update(self, session_id: str, fields: dict, now: float) -> bool:
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = shard.sessions.get(session_id)
+            if entry is None:
+                return False
+            if entry[1] <= now:
+                shard.remove(session_id)
+                shard.expired += 1
+                return False
+            entry[0].update(fields)
+            shard.sessions.move_to_end(session_id)
+            # 最終アクセス時刻のみの更新（参照ごとの更新）ではサイズを計算し直さない
+            if set(fields) != {"last_accessed"}:
+                self._resize(shard, session_id, fields)
+            return True
+
+    def delete(self, session_id: str) -> bool:
+        shard = self._shard(session_id)
+        with shard.lock:
+            if session_id not in shard.sessions:
+                return False
+            shard.remove(session_id)
+            return True
+
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        """
+        期限切れのセッションを削除（limitを指定するとlimit件で打ち切る）
+
+        ロックは区画ごとに取得するため、削除中も他の区画のセッションにはアクセスできる
+        """
+        deleted = 0
+        for shard in self._shards:
+            if limit is not None and deleted >= limit:
+                break
+            shard_deleted = 0
+            with shard.lock:
+                heap = shard.expiry_heap
+                while heap and heap[0][0] <= now and (limit is None or deleted + shard_deleted < limit):
+                    expires_at, session_id = heapq.heappop(heap)
+                    entry = shard.sessions.get(session_id)
+                    if entry is not None and entry[1] == expires_at:
+                        shard.remove(session_id)
+                        shard_deleted += 1
+                shard.expired += shard_deleted
+            deleted += shard_deleted
+        return deleted
+
+    def count(self, now: float) -> int:
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "shards": len(self._shards),
+            "sessions": self.count(0),
+            "resident_bytes": sum(shard.bytes for shard in self._shards),
+            "max_bytes": self.max_bytes,
+            "expired": sum(shard.expired for shard in self._shards),
+            "evicted": sum(shard.evicted for shard in self._shards),
+        }
+
+
+class SQLiteSessionStore:
+    """
+    SQLiteファイル（WALモード）にセッションを保持するストア
+
+    同じファイルを参照する複数のワーカープロセス間でセッションを共有できる
+    """
+
+    blocking = True
+    shared = True
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # トランザクションは明示的に開始する（他プロセスとの読み込み・更新の競合を防ぐ）
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # 削除で空いた領域をcompact()で返却できるようにする（テーブル作成前のみ有効）
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WALモードではNORMALでもプロセスのクラッシュで書き込み済みのデータは失われない
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                text BLOB,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if "text" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN text BLOB")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+        self._expired = 0
+
+    def create(self, session_id: str, session: dict, expires_at: float):
+        data = dict(session)
+        text = data.pop(TEXT_FIELD, None)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, text, expires_at) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(data, ensure_ascii=False), text, expires_at),
+            )
+
+    def load(self, session_id: str, now: float) -> Optional[Tuple[dict, float]]:
+        """
+        抽出テキストを含むセッションデータと有効期限を取得
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, text, expires_at FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, now),
+            ).fetchone()
+        if row is None:
+            return None
+        session = json.loads(row[0])
+        if row[1] is not None:
+            session[TEXT_FIELD] = bytes(row[1])
+        return session, row[2]
+
+    def get(self, session_id: str, now: float, include_text: bool = True) -> Optional[dict]:
+        columns = "data, text" if include_text else "data"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns} FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, now)
+            ).fetchone()
+        if row is None:
+            return None
+        session = json.loads(row[0])
+        if include_text and row[1] is not None:
+            session[TEXT_FIELD] = bytes(row[1])
+        return session
+
+    def update(self, session_id: str, fields: dict, now: float) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return False
+                session = json.loads(row[0])
+                session.update(fields)
+                self._conn.execute(
+                    "UPDATE sessions SET data = ? WHERE session_id = ?",
+                    (json.dumps(session, ensure_ascii=False), session_id),
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return cursor.rowcount > 0
+
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        with self._lock:
+            if limit is None:
+                cursor = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN "
+                    "(SELECT session_id FROM sessions WHERE expires_at <= ? LIMIT ?)",
+                    (now, limit),
+                )
+            self._expired += cursor.rowcount
+            return cursor.rowcount
+
+    def count(self, now: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (now,)
+            ).fetchone()[0]
+
+    def compact(self):
+        """
+        WALをデータベースファイルに書き戻して切り詰め、削除したセッションの領域を返却
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("PRAGMA incremental_vacuum")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            sessions, resident_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(data AS BLOB)) + COALESCE(LENGTH(text), 0)), 0) "
+                "FROM sessions"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "resident_bytes": resident_bytes,
+            "expired": self._expired,
+        }
+
+
+class PersistentSessionStore:
+    """
+    プロセス内のストアにSQLiteファイルへの書き込みを組み合わせたストア（再起動後もセッションを引き継ぐ）
+
+    - 作成・更新はSQLiteにも書き込み、読み込みはメモリから行う
+    - 起動時にはセッションを読み込まず、メモリにないセッションへの初回アクセス時にSQLiteから読み込む
+      （起動時間が保存件数に比例しない。メモリの上限で退避したセッションも同様に読み込む）
+    - 最終アクセス時刻のみの更新はSQLiteに書き込まない
+    - 期限切れのセッションの削除に合わせて、compact_interval秒ごとにSQLiteファイルを圧縮する
+
+    複数プロセスで共有する場合はSESSION_STORE=sqlite / redis を使用する
+    """
+
+    # SQLiteへの書き込み・初回アクセス時の読み込みでブロックする
+    blocking = True
+    shared = False
+
+    def __init__(
+        self,
+        memory: MemorySessionStore,
+        disk: SQLiteSessionStore,
+        compact_interval: float = 3600,
+    ):
+        self.memory = memory
+        self.disk = disk
+        self.compact_interval = compact_interval
+        self._last_compact = time.monotonic()
+        self._warm_loads = 0
+        self._compactions = 0
+
+    def _load(self, session_id: str, now: float) -> bool:
+        loaded = self.disk.load(session_id, now)
+        if loaded is None:
+            return False
+        self.memory.create(session_id, loaded[0], loaded[1])
+        self._warm_loads += 1
+        return True
+
+    def create(self, session_id: str, session: dict, expires_at: float):
+        # ディスクへの書き込みに失敗した場合はセッションを作成しない
+        self.disk.create(session_id, session, expires_at)
+        self.memory.create(session_id, session, expires_at)
+
+    def get(self, session_id: str, now: float, include_text: bool = True) -> Optional[dict]:
+        session = self.memory.get(session_id, now, include_text=include_text)
+        if session is None and self._load(session_id, now):
+            session = self.memory.get(session_id, now, include_text=include_text)
+        return session
+
+    def update(self, session_id: str, fields: dict, now: float) -> bool:
+        if set(fields) == {"last_accessed"}:
+            return self.memory.update(session_id, fields, now) or (
+                self._load(session_id, now) and self.memory.update(session_id, fields, now)
+            )
+        if not self.disk.update(session_id, fields, now):
+            self.memory.delete(session_id)
+            return False
+        # メモリにない場合は次のアクセス時に更新後のデータを読み込む
+        self.memory.update(session_id, fields, now)
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        deleted_memory = self.memory.delete(session_id)
+        return self.disk.delete(session_id) or deleted_memory
+
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        # メモリのみに残っている期限切れのセッションも削除し終えるまで0を返さない
+        deleted = max(self.memory.delete_expired(now, limit), self.disk.delete_expired(now, limit))
+        if time.monotonic() - self._last_compact >= self.compact_interval:
+            self.disk.compact()
+            self._last_compact = time.monotonic()
+            self._compactions += 1
+        return deleted
+
+    def count(self, now: float) -> int:
+        return self.disk.count(now)
+
+    def get_stats(self) -> dict:
+        disk_stats = self.disk.get_stats()
+        return {
+            **self.memory.get_stats(),
+            "backend": "memory+sqlite",
+            "persisted_sessions": disk_stats["sessions"],
+            "persisted_bytes": disk_stats["resident_bytes"],
+            "expired": disk_stats["expired"],
+            "warm_loads": self._warm_loads,
+            "compactions": self._compactions,
+        }
+
+
+class RedisSessionStore:
+    """
+    Redis（またはRedis互換サーバー）にセッションを保持するストア（redisパッケージが必要）
+
+    セッションはフィールドごとにJSONで格納したハッシュとし、有効期限はRedisのキーの期限で管理する。
+    圧縮した抽出テキストは別のキーに保存する（メタデータのみの取得で本文を転送しない）。
+    件数の集計用に有効期限をスコアとしたソート済みセットを併せて持つ
+    """
+
+    blocking = True
+    shared = True
+
+    # キーが存在する場合のみフィールドを更新する（期限切れのセッションを作り直さない）
+    UPDATE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+    return 1
+    """
+
+    def __init__(self, url: str, prefix: str = "session:", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("SESSION_STORE=redis requires the 'redis' package") from e
+            client = redis.Redis.from_url(url)
+
+        self._client = client
+        self._prefix = prefix
+        self._index_key = f"{prefix}expires"
+        self._update = self._client.register_script(self.UPDATE_SCRIPT)
+        self._expired = 0
+
+    def _key(self, session_id: str) -> str:
+        return f"{self._prefix}{session_id}"
+
+    def _text_key(self, session_id: str) -> str:
+        return f"{self._prefix}{session_id}:text"
+
+    def create(self, session_id: str, session: dict, expires_at: float):
+        data = dict(session)
+        text = data.pop(TEXT_FIELD, None)
+        key = self._key(session_id)
+        text_key = self._text_key(session_id)
+        expires_at_ms = int(expires_at * 1000)
+
+        pipe = self._client.pipeline(transaction=True)
+        pipe.delete(key, text_key)
+        pipe.hset(key, mapping={
+            field: json.dumps(value, ensure_ascii=False) for field, value in data.items()
+        })
+        pipe.pexpireat(key, expires_at_ms)
+        if text is not None:
+            pipe.set(text_key, text)
+            pipe.pexpireat(text_key, expires_at_ms)
+        pipe.zadd(self._index_key, {session_id: expires_at})
+        pipe.execute()
+
+    def get(self, session_id: str, now: float, include_text: bool = True) -> Optional[dict]:
+        # 期限切れのキーはRedisが削除するためnowは使わない
+        if include_text:
+            pipe = self._client.pipeline(transaction=False)
+            pipe.hgetall(self._key(session_id))
+            pipe.get(self._text_key(session_id))
+            raw, text = pipe.execute()
+        else:
+            raw, text = self._client.hgetall(self._key(session_id)), None
+        if not raw:
+            return None
+        session = {
+            (field.decode("utf-8") if isinstance(field, bytes) else field): json.loads(value)
+            for field, value in raw.items()
+        }
+        if text is not None:
+            session[TEXT_FIELD] = text
+        return session
+
+    def update(self, session_id: str, fields: dict, now: float) -> bool:
+        args = []
+        for field, value in fields.items():
+            args.extend([field, json.dumps(value, ensure_ascii=False)])
+        if not args:
+            return self._client.exists(self._key(session_id)) > 0
+        return bool(self._update(keys=[self._key(session_id)], args=args))
+
+    def delete(self, session_id: str) -> bool:
+        pipe = self._client.pipeline(transaction=True)
+        pipe.delete(self._key(session_id), self._text_key(session_id))
+        pipe.zrem(self._index_key, session_id)
+        deleted, _ = pipe.execute()
+        return deleted > 0
+
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        # セッション本体はRedisが削除するため、件数集計用のセットのみ整理する（1回の操作で完了する）
+        expired = self._client.zremrangebyscore(self._index_key, "-inf", now)
+        self._expired += expired
+        return expired
+
+    def count(self, now: float) -> int:
+        return self._client.zcount(self._index_key, f"({now}", "+inf")
+
+    def get_stats(self) -> dict:
+        # メモリ使用量と退避はRedisサーバー側（maxmemory-policy）で管理する
+        return {
+            "backend": "redis",
+            "sessions": self._client.zcard(self._index_key),
+            "expired": self._expired,
+        }
+
+
+def create_session_store(backend: Optional[str] = None):
+    """
+    環境変数の設定に応じたセッションストアを作成
+
+    - SESSION_STORE: memory（プロセス内） / sqlite / redis
+    - SESSION_MEMORY_MAX_MB: memory の場合に保持するセッションの合計サイズの上限（MB）
+    - SESSION_STORE_SHARDS: memory の場合のロックの区画数
+    - SESSION_PERSIST_PATH: memory の場合にセッションを書き込むSQLiteファイルパス（未設定で再起動時に破棄）
+    - SESSION_COMPACT_INTERVAL: SESSION_PERSIST_PATH のファイルを圧縮する間隔（秒）
+    - SESSION_STORE_PATH: sqlite の場合のファイルパス
+    - SESSION_REDIS_URL: redis の場合の接続先URL
+    - SESSION_REDIS_PREFIX: redis の場合のキーの接頭辞
+    """
+    if backend is None:
+        backend = os.getenv("SESSION_STORE", "memory")
+    backend = backend.lower()
+
+    if backend == "memory":
+        persist_path = os.getenv("SESSION_PERSIST_PATH") or None
+        if persist_path is None:
+            return MemorySessionStore()
+        return PersistentSessionStore(
+            MemorySessionStore(),
+            SQLiteSessionStore(persist_path),
+            compact_interval=float(os.getenv("SESSION_COMPACT_INTERVAL", "3600")),
+        )
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_STORE_PATH", "./data/sessions.db"))
+    if backend == "redis":
+        return RedisSessionStore(
+            os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("SESSION_REDIS_PREFIX", "reqdoc:session:"),
+        )
+    raise ValueError(f"Unknown SESSION_STORE: {backend}")
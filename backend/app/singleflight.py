@@ -0,0 +1,47 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    同じキーで同時に実行される処理を1回の実行にまとめる
+
+    最初の呼び出しが処理をタスクとして開始し、実行中に同じキーで呼び出した側は
+    そのタスクの完了を待って同じ結果（または例外）を受け取る。
+    呼び出し元がキャンセルされても共有タスクは他の待機者のために継続する
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+        if task is None:
+            self._leaders += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # 待機者が全てキャンセルされた場合でも例外を回収しておく
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> dict:
+        """
+        実行した件数・相乗りした件数・実行中の件数を取得
+        """
+        return {
+            "leaders": self._leaders,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight),
+        }
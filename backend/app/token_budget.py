@@ -0,0 +1,92 @@
+import re
+from typing import List
+
+# 見出しとみなす行（ここで分割すると章・節の途中で切れにくい）
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"#{1,6}\s"                                          # Markdown見出し
+    r"|第[0-9０-９一二三四五六七八九十百]+[章節条部編]"  # 第1章 / 第二節
+    r"|シート名: "                                       # Excelのシート区切り
+    r"|[0-9０-９]+(?:[.．][0-9０-９]+)*[.．、\s]\s*\S"     # 1. 概要 / 2.3 機能要件
+    r"|[■□◆◇●【]"                                        # 記号付きの見出し
+    r")"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を見積もる
+
+    日本語（かな・漢字）は概ね1文字1トークン、英数字・記号は4文字程度で1トークンになるため、
+    ASCII以外を1、ASCIIを0.25として数える（多めに見積もる）
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def _split_sections(text: str) -> List[str]:
+    """
+    見出し行の直前でテキストを分割
+    """
+    sections = []
+    current = []
+    for line in text.splitlines():
+        if current and HEADING_PATTERN.match(line):
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+
+def _split_oversized(section: str, max_tokens: int) -> List[str]:
+    """
+    上限を超えるセクションを行単位で、上限を超える行は文字数で分割
+    """
+    pieces = []
+    current = []
+    current_tokens = 0
+    for line in section.splitlines():
+        line_tokens = estimate_tokens(line) + 1
+        if line_tokens > max_tokens:
+            if current:
+                pieces.append("\n".join(current))
+                current, current_tokens = [], 0
+            # 1文字1トークンとみなして切り詰める
+            pieces.extend(line[i:i + max_tokens] for i in range(0, len(line), max_tokens))
+            continue
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    見出しの境界でテキストを分割し、1チャンクあたりの見積もりトークン数が上限以下になるようにまとめる
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for section in _split_sections(text):
+        section_tokens = estimate_tokens(section) + 1
+        if section_tokens > max_tokens:
+            pieces = _split_oversized(section, max_tokens)
+        else:
+            pieces = [section]
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) + 1
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
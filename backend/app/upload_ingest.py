@@ -0,0 +1,239 @@
+import io
+import os
+import asyncio
+import hashlib
+import tempfile
+from typing import BinaryIO, Dict, Optional, Union
+
+from fastapi import HTTPException
+
+
+DEFAULT_MAX_UPLOAD_SIZE_MB = float(os.getenv("MAX_UPLOAD_SIZE_MB", "10"))
+UPLOAD_SPOOL_MAX_MB = float(os.getenv("UPLOAD_SPOOL_MAX_MB", "2"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """
+    アップロードサイズが上限を超えた場合の例外
+    """
+    pass
+
+
+class SpooledUpload:
+    """
+    取り込み済みのアップロードファイル
+
+    小さいファイルはメモリ上に、スプール上限を超えたファイルは一時ファイルに保持する。
+    source はパーサーにそのまま渡せる形（バイト列または一時ファイルのパス）を返す。
+    """
+
+    def __init__(self, filename: str, file_extension: str):
+        self.filename = filename
+        self.file_extension = file_extension
+        self.size = 0
+        self.sha256 = ""
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._path: Optional[str] = None
+        self._file: Optional[BinaryIO] = None
+
+    @property
+    def size_mb(self) -> float:
+        return self.size / (1024 * 1024)
+
+    @property
+    def on_disk(self) -> bool:
+        return self._path is not None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """
+        パーサーに渡すデータ（メモリ上ならバイト列、ディスク上なら一時ファイルのパス）
+        """
+        if self._path is not None:
+            return self._path
+        return self._buffer.getvalue()
+
+    def _write(self, chunk: bytes, spool_max_bytes: int):
+        if self._path is None and self.size + len(chunk) > spool_max_bytes:
+            self._roll_over()
+
+        if self._path is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+        self.size += len(chunk)
+
+    def _roll_over(self):
+        fd, path = tempfile.mkstemp(prefix="upload_", suffix=self.file_extension)
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(self._buffer.getbuffer())
+        self._buffer = None
+        self._path = path
+
+    def _finish(self, sha256_hex: str):
+        self.sha256 = sha256_hex
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """
+        保持しているデータと一時ファイルを破棄
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+        self._buffer = None
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _spool(
+    file: BinaryIO,
+    upload: SpooledUpload,
+    max_size_bytes: int,
+    spool_max_bytes: int,
+    chunk_size: int,
+):
+    digest = hashlib.sha256()
+    file.seek(0)
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            if upload.size + len(chunk) > max_size_bytes:
+                raise UploadTooLargeError(
+                    f"File size exceeds the limit of {max_size_bytes / (1024 * 1024):g} MB"
+                )
+            digest.update(chunk)
+            upload._write(chunk, spool_max_bytes)
+    except Exception:
+        upload.close()
+        raise
+
+    upload._finish(digest.hexdigest())
+
+
+async def ingest_upload(
+    file,
+    file_extension: str,
+    max_size_mb: Optional[float] = None,
+    spool_max_mb: Optional[float] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpooledUpload:
+    """
+    アップロードファイルをチャンク単位で読み込み、サイズ上限を確認しながらスプールする
+
+    Args:
+        file: FastAPIのUploadFile
+        file_extension: ファイル拡張子
+        max_size_mb: 最大サイズ（MB）
+        spool_max_mb: メモリ上に保持する最大サイズ（MB、超過分は一時ファイルへ）
+        chunk_size: 1回に読み込むバイト数
+
+    Returns:
+        SpooledUpload（使用後はcloseすること）
+    """
+    max_size_mb = max_size_mb if max_size_mb is not None else DEFAULT_MAX_UPLOAD_SIZE_MB
+    spool_max_mb = spool_max_mb if spool_max_mb is not None else UPLOAD_SPOOL_MAX_MB
+
+    upload = SpooledUpload(file.filename, file_extension)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None,
+        _spool,
+        file.file,
+        upload,
+        int(max_size_mb * 1024 * 1024),
+        int(spool_max_mb * 1024 * 1024),
+        chunk_size,
+    )
+    return upload
+
+
+class UploadSizeLimitMiddleware:
+    """
+    リクエストボディのサイズ上限を受信中に確認するASGIミドルウェア
+
+    Content-Lengthが上限を超える場合はボディを読む前に413を返し、
+    Content-Lengthがない場合も受信したバイト数が上限を超えた時点で打ち切る。
+    path_limits_mb でパスの接頭辞ごとに別の上限（複数ファイルを受け付けるエンドポイントなど）を指定できる
+    """
+
+    def __init__(
+        self,
+        app,
+        max_body_size_mb: Optional[float] = None,
+        path_limits_mb: Optional[Dict[str, float]] = None
+    ):
+        self.app = app
+        if max_body_size_mb is None:
+            # multipartの境界やヘッダー分の余裕を持たせる
+            max_body_size_mb = float(
+                os.getenv("MAX_REQUEST_SIZE_MB", str(DEFAULT_MAX_UPLOAD_SIZE_MB + 1))
+            )
+        self.max_body_size = int(max_body_size_mb * 1024 * 1024)
+        self.path_limits = {
+            prefix: int(limit_mb * 1024 * 1024)
+            for prefix, limit_mb in (path_limits_mb or {}).items()
+        }
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.path_limits.items():
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self._limit_for(scope.get("path", ""))
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    break
+                if content_length > max_body_size:
+                    await self._send_too_large(send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise HTTPException(status_code=413, detail="Request body is too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _send_too_large(self, send):
+        body = b'{"detail":"Request body is too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
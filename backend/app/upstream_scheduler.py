@@ -0,0 +1,274 @@
+import os
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+
+class TokenBucket:
+    """
+    1分あたりの上限をもとに補充されるトークンバケット
+
+    上限を超える要求はバケット容量に切り詰める（単独で上限を超えるリクエストも1分待てば送信できる）
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(float(amount), self.capacity)
+        # ロックを保持したまま待つことで待機者を到着順に処理する
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class UpstreamScheduler:
+    """
+    OpenAI APIへのリクエストの送信タイミングを制御するスケジューラー
+
+    - リクエスト数/分・トークン数/分のトークンバケット
+    - 429を受けると同時実行数を半減し、成功ごとに少しずつ戻すAIMD方式の同時実行数制御
+    - 429・5xx・接続エラーはジッター付きの指数バックオフで再試行（Retry-Afterがあればそれに従う）
+
+    - OPENAI_MAX_CONCURRENCY: 同時実行数の上限（429が続くと1まで下げる）
+    - OPENAI_RPM_LIMIT: リクエスト数/分の上限（0で無制限）
+    - OPENAI_TPM_LIMIT: トークン数/分の上限（0で無制限、プロンプト長 + max_tokens で見積もる）
+    - OPENAI_MAX_RETRIES: 5xx・接続エラーの再試行回数の上限
+    - OPENAI_RETRY_MAX_WAIT: 429の再試行を続ける最大時間（秒）
+    - OPENAI_RETRY_BASE_DELAY / OPENAI_RETRY_MAX_DELAY: バックオフの初期値・上限（秒）
+    """
+
+    # 同時実行数を続けて下げないための間隔（秒）
+    DECREASE_COOLDOWN = 2.0
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        rpm_limit: Optional[float] = None,
+        tpm_limit: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        max_wait: Optional[float] = None,
+    ):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "64"))
+        if rpm_limit is None:
+            rpm_limit = float(os.getenv("OPENAI_RPM_LIMIT", "0"))
+        if tpm_limit is None:
+            tpm_limit = float(os.getenv("OPENAI_TPM_LIMIT", "0"))
+        if max_retries is None:
+            max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+        if base_delay is None:
+            base_delay = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+        if max_delay is None:
+            max_delay = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "30"))
+        if max_wait is None:
+            max_wait = float(os.getenv("OPENAI_RETRY_MAX_WAIT", "120"))
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+
+        self._request_bucket = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self._token_bucket = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+
+        self._limit = float(self.max_concurrency)
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._condition = asyncio.Condition()
+
+        self._in_flight = 0
+        self._waiting = 0
+        self._requests = 0
+        self._retries = 0
+        self._rate_limited = 0
+        self._server_errors = 0
+        self._failures = 0
+
+    @property
+    def concurrency_limit(self) -> int:
+        return max(1, int(self._limit))
+
+    async def acquire(self, estimated_tokens: int = 0):
+        """
+        同時実行枠とレート制限の枠を確保（Retry-Afterによる停止中は解除まで待つ）
+        """
+        self._waiting += 1
+        try:
+            async with self._condition:
+                await self._condition.wait_for(lambda: self._in_flight < self.concurrency_limit)
+                self._in_flight += 1
+        finally:
+            self._waiting -= 1
+
+        try:
+            delay = self._blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._request_bucket is not None:
+                await self._request_bucket.acquire(1)
+            if self._token_bucket is not None and estimated_tokens > 0:
+                await self._token_bucket.acquire(estimated_tokens)
+        except BaseException:
+            await self.release(success=False)
+            raise
+        self._requests += 1
+
+    async def release(self, success: bool = True, rate_limited: bool = False):
+        """
+        同時実行枠を返却し、結果に応じて同時実行数の上限を調整
+        """
+        async with self._condition:
+            self._in_flight -= 1
+            if rate_limited:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.DECREASE_COOLDOWN:
+                    self._limit = max(1.0, self._limit / 2)
+                    self._last_decrease = now
+            elif success:
+                self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self._limit)
+            self._condition.notify_all()
+
+    async def open(self, func: Callable[[], Awaitable[Any]], estimated_tokens: int = 0) -> Any:
+        """
+        枠を確保してfuncを呼び出し、失敗時は再試行する
+
+        成功した場合は枠を確保したまま結果を返す（ストリームの読み込み完了後に呼び出し側でreleaseする）
+        """
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            await self.acquire(estimated_tokens)
+            try:
+                return await func()
+            except Exception as e:
+                rate_limited = isinstance(e, RateLimitError)
+                await self.release(success=False, rate_limited=rate_limited)
+                delay = self._retry_delay(e, attempt, time.monotonic() - started)
+                if delay is None:
+                    self._failures += 1
+                    raise
+                if rate_limited:
+                    self._rate_limited += 1
+                else:
+                    self._server_errors += 1
+                self._retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                await self.release(success=False)
+                raise
+
+    async def call(self, func: Callable[[], Awaitable[Any]], estimated_tokens: int = 0) -> Any:
+        """
+        枠を確保してfuncを呼び出し、結果を返す（失敗時は再試行）
+        """
+        result = await self.open(func, estimated_tokens)
+        await self.release(success=True)
+        return result
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, RateLimitError):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code >= 500 or error.status_code in (408, 409)
+        # APITimeoutErrorはAPIConnectionErrorのサブクラス
+        return isinstance(error, APIConnectionError)
+
+    def _retry_delay(self, error: Exception, attempt: int, elapsed: float) -> Optional[float]:
+        """
+        再試行までの待ち時間を計算（再試行しない場合はNone）
+
+        429は上流が処理できる量を超えているだけなので回数ではなく経過時間で打ち切る
+        """
+        if not self._is_retryable(error):
+            return None
+        if isinstance(error, RateLimitError):
+            if elapsed >= self.max_wait:
+                return None
+        elif attempt >= self.max_retries:
+            return None
+
+        # フルジッター付き指数バックオフ
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** min(attempt, 16))))
+
+        retry_after = self._parse_retry_after(error)
+        if retry_after is None:
+            return backoff
+
+        delay = min(retry_after, self.max_delay)
+        if isinstance(error, RateLimitError):
+            # 上流が指定した時間は他のリクエストも送信しない
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        # 同時に429を受けたリクエストが一斉に再送しないようにバックオフ分ずらす
+        return delay + backoff
+
+    @staticmethod
+    def _parse_retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return max(0.0, float(retry_after_ms) / 1000)
+            except ValueError:
+                pass
+
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get_stats(self) -> dict:
+        """
+        同時実行数・再試行・レート制限の状況を取得
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "concurrency_limit": self.concurrency_limit,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "requests": self._requests,
+            "retries": self._retries,
+            "rate_limited": self._rate_limited,
+            "server_errors": self._server_errors,
+            "failures": self._failures,
+            "rpm_available": round(self._request_bucket.available, 1) if self._request_bucket else None,
+            "tpm_available": round(self._token_bucket.available, 1) if self._token_bucket else None,
+        }
@@ -0,0 +1,94 @@
+"""
+複数ファイルの一括生成のベンチマーク（1ファイルずつの逐次リクエスト / /batch/generate）
+
+OpenAI APIは一定の待ち時間を返すスタブに置き換え、抽出は実際の抽出ワーカーで行う
+
+使い方（backendディレクトリで実行）:
+    OPENAI_API_KEY=dummy python -m benchmarks.bench_batch --files 30 --latency 0.5
+"""
+import io
+import time
+import types
+import asyncio
+import argparse
+
+import httpx
+from docx import Document
+
+import app.main as main_module
+
+
+def build_docx(index: int, paragraphs: int) -> bytes:
+    document = Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f"要件{index}-{i}: システムは利用者を認証し、応答時間は2秒以内とすること。")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def install_stub(latency: float):
+    """
+    OpenAI APIの呼び出しを一定時間待って固定の結果を返すスタブに置き換える
+    """
+    async def create(**kwargs):
+        await asyncio.sleep(latency)
+        message = types.SimpleNamespace(content="生成結果")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    completions = types.SimpleNamespace(create=create)
+    main_module.openai_client.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    # 同じプロンプトの結果キャッシュで計測が短縮されないようにする
+    main_module.openai_client.cache.max_memory_bytes = 0
+
+
+def reset_extraction_cache():
+    # 2回目の計測が抽出キャッシュで短縮されないようにする
+    main_module.extraction_cache.clear()
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, main_module.extraction_executor.start)
+    install_stub(args.latency)
+
+    documents = [(f"doc{i}.docx", build_docx(i, args.paragraphs)) for i in range(args.files)]
+    transport = httpx.ASGITransport(app=main_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        reset_extraction_cache()
+        start = time.perf_counter()
+        for filename, content in documents:
+            response = await client.post(f"/generate-{args.section}", files={"file": (filename, content)})
+            response.raise_for_status()
+        serial = time.perf_counter() - start
+        print(f"serial  files={args.files} total={serial:.2f}s per_file={serial / args.files * 1000:.0f}ms")
+
+        reset_extraction_cache()
+        start = time.perf_counter()
+        response = await client.post(
+            "/batch/generate",
+            files=[("files", document) for document in documents],
+            data={"sections": args.section}
+        )
+        response.raise_for_status()
+        batch = time.perf_counter() - start
+        print(
+            f"batch   files={args.files} total={batch:.2f}s per_file={batch / args.files * 1000:.0f}ms "
+            f"status={response.json()['status']} speedup={serial / batch:.1f}x"
+        )
+
+    main_module.extraction_executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数ファイルの一括生成のベンチマーク")
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--paragraphs", type=int, default=200, help="1ファイルあたりの段落数")
+    parser.add_argument("--latency", type=float, default=0.5, help="スタブのOpenAI APIの応答時間（秒）")
+    parser.add_argument("--section", default="functional-diagram")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
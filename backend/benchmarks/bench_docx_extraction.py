@@ -0,0 +1,80 @@
+"""
+DOCX抽出方式のベンチマーク（iterparseによるストリーミング解析 と python-docx の比較）
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_docx_extraction --paragraphs 2000 --rows 300 --cols 8
+"""
+import io
+import time
+import argparse
+import tracemalloc
+
+import docx
+
+from app.docx_engine import DocxExtractionEngine
+from app.file_processor import FileProcessor
+
+
+def build_document(paragraphs: int, rows: int, cols: int) -> bytes:
+    """
+    段落と、結合セルを含む大きな表を持つDOCXを作成
+    """
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f"要件{i}: システムは利用者の操作に対して応答しなければならない。")
+
+    table = document.add_table(rows=rows, cols=cols)
+    for r in range(rows):
+        for c in range(cols):
+            table.cell(r, c).text = f"R{r}C{c}"
+    # 横方向・縦方向の結合セルを作成
+    for r in range(0, rows - 1, 4):
+        table.cell(r, 0).merge(table.cell(r + 1, 0))
+        table.cell(r, 1).merge(table.cell(r, cols - 1))
+
+    for i in range(paragraphs // 10):
+        document.add_paragraph(f"補足{i}")
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(label: str, extract, file_content: bytes, repeat: int):
+    timings = []
+    peak = 0
+    text = ""
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        text = extract(file_content)
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    print(
+        f"{label:<12} best={min(timings):.3f}s avg={sum(timings) / len(timings):.3f}s "
+        f"peak_mem={peak / (1024 * 1024):.1f}MB text_length={len(text)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DOCX抽出方式のベンチマーク")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    file_content = build_document(args.paragraphs, args.rows, args.cols)
+    print(f"document size: {len(file_content) / 1024:.0f}KB")
+
+    stream_engine = DocxExtractionEngine("stream")
+    processor = FileProcessor()
+
+    measure("stream", stream_engine.extract_text, file_content, args.repeat)
+    measure("python-docx", processor._extract_from_docx_document, file_content, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
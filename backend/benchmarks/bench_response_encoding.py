@@ -0,0 +1,95 @@
+"""
+包括的な生成のレスポンスのJSON変換時間と転送サイズのベンチマーク
+
+- model: response_model（pydantic）での検証 → 標準のjson（ASCIIエスケープ）で変換（従来の方式）
+- fast: json_dumpsで直接変換（orjsonがあれば使用）
+- lean: 抽出テキストを含めずにjson_dumpsで変換（include_text=false）
+それぞれgzip / brotli（brotliパッケージがある場合）で圧縮した場合のサイズも表示する
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_response_encoding --chars 800000
+"""
+import gzip
+import json
+import time
+import random
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import SystemRequirementsResponse
+from app.response_encoding import CompressionMiddleware, json_dumps, brotli, orjson
+
+WORDS = [
+    "システム", "要件", "利用者", "認証", "データベース", "画面", "機能", "性能", "応答時間",
+    "は", "を", "に", "する", "こと。", "外部API", "連携", "管理者", "ログ", "保存", "\t", "\n", "12345",
+]
+
+
+def build_text(chars: int) -> str:
+    parts = []
+    length = 0
+    while length < chars:
+        word = random.choice(WORDS)
+        parts.append(word)
+        length += len(word)
+    return "".join(parts)
+
+
+def build_payload(chars: int) -> dict:
+    extracted_text = build_text(chars)
+    return {
+        "original_filename": "requirements.xlsx",
+        "extracted_text": extracted_text,
+        "text_length": len(extracted_text),
+        "generated_requirements": build_text(20000),
+        "generation_report": {"mode": "sections", "total_seconds": 42.0, "sections": []},
+        "session_id": "00000000-0000-0000-0000-000000000000",
+        "cached": False,
+        "status": "success"
+    }
+
+
+def encode_model(payload: dict) -> bytes:
+    model = SystemRequirementsResponse(**payload)
+    return json.dumps(jsonable_encoder(model.model_dump())).encode("utf-8")
+
+
+def encode_fast(payload: dict) -> bytes:
+    return json_dumps(payload)
+
+
+def encode_lean(payload: dict) -> bytes:
+    return json_dumps({key: value for key, value in payload.items() if key != "extracted_text"})
+
+
+def measure(label: str, encode, payload: dict, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(payload)
+        timings.append(time.perf_counter() - start)
+
+    middleware = CompressionMiddleware(None)
+    sizes = [f"raw={len(body) / 1024:.0f}KB", f"gzip={len(gzip.compress(body, middleware.gzip_level)) / 1024:.0f}KB"]
+    if brotli is not None:
+        sizes.append(f"br={len(brotli.compress(body, quality=middleware.brotli_quality)) / 1024:.0f}KB")
+    print(f"{label:<6} encode={sorted(timings)[len(timings) // 2] * 1000:.2f}ms {' '.join(sizes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レスポンスのJSON変換・圧縮のベンチマーク")
+    parser.add_argument("--chars", type=int, default=800000, help="抽出テキストの文字数")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    payload = build_payload(args.chars)
+    print(f"orjson={'yes' if orjson is not None else 'no'} brotli={'yes' if brotli is not None else 'no'}")
+    measure("model", encode_model, payload, args.repeat)
+    measure("fast", encode_fast, payload, args.repeat)
+    measure("lean", encode_lean, payload, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+期限切れセッションの削除中のセッション参照の待ち時間のベンチマーク
+
+有効なセッションと期限切れのセッションを保持した状態で、並行してセッションを参照しながら削除を実行し、
+参照の待ち時間のパーセンタイルを比較する
+- single: 1区画（1つのロック）で期限切れのセッションを一度に削除
+- sharded: 複数区画に分け、区画ごとに一定件数ずつ削除してイベントループ・ロックを解放
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_session_locking --live 20000 --expired 100000 --mode asyncio
+    python -m benchmarks.bench_session_locking --live 20000 --expired 100000 --mode threads
+"""
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+from app.session_manager import SessionManager
+from app.session_store import MemorySessionStore
+
+
+async def build_manager(shards: int, live: int, expired: int):
+    manager = SessionManager(store=MemorySessionStore(shards=shards))
+    session_ids = [await manager.create_session(f"要件{i}", f"doc{i}.docx") for i in range(live)]
+
+    # 作成済みの有効期限を過去にずらしたセッションを作成
+    expiring = SessionManager(session_timeout_minutes=0, store=manager.store)
+    for i in range(expired):
+        await expiring.create_session(f"期限切れ{i}", f"old{i}.docx")
+    return manager, session_ids
+
+
+def report(label: str, latencies, sweep_seconds: float, manager: SessionManager):
+    ordered = sorted(latencies)
+
+    def pick(ratio: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] * 1000
+
+    print(
+        f"{label:<8} lookups={len(ordered)} p50={pick(0.5):.3f}ms p99={pick(0.99):.3f}ms "
+        f"p99.9={pick(0.999):.3f}ms max={ordered[-1] * 1000:.3f}ms "
+        f"sweep={sweep_seconds * 1000:.1f}ms live={manager.get_session_count()}"
+    )
+
+
+async def run_asyncio(manager: SessionManager, session_ids, incremental: bool, workers: int, duration: float):
+    latencies = []
+    stop = asyncio.Event()
+
+    async def lookup_worker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            # 他のタスク（削除処理など）がイベントループを占有している時間も待ち時間に含める
+            await asyncio.sleep(0)
+            await manager.get_session_data(random.choice(session_ids), include_text=False)
+            latencies.append(time.perf_counter() - start)
+
+    tasks = [asyncio.ensure_future(lookup_worker()) for _ in range(workers)]
+    await asyncio.sleep(duration / 2)
+    start = time.perf_counter()
+    if incremental:
+        await manager.sweep_expired_sessions()
+    else:
+        manager.cleanup_expired_sessions()
+    sweep_seconds = time.perf_counter() - start
+    await asyncio.sleep(duration / 2)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return latencies, sweep_seconds
+
+
+def run_threads(manager: SessionManager, session_ids, incremental: bool, workers: int, duration: float):
+    latencies = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def lookup_worker():
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            # スレッドからはストアを直接参照する（区画のロックの待ち時間を計測）
+            manager.store.get(random.choice(session_ids), time.time(), include_text=False)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=lookup_worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration / 2)
+    start = time.perf_counter()
+    if incremental:
+        while manager.cleanup_expired_sessions(SessionManager.CLEANUP_BATCH):
+            time.sleep(0)
+    else:
+        manager.cleanup_expired_sessions()
+    sweep_seconds = time.perf_counter() - start
+    time.sleep(duration / 2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, sweep_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="セッション参照の待ち時間のベンチマーク")
+    parser.add_argument("--live", type=int, default=20000, help="有効なセッション数")
+    parser.add_argument("--expired", type=int, default=100000, help="削除対象の期限切れのセッション数")
+    parser.add_argument("--workers", type=int, default=4, help="並行して参照するタスク・スレッド数")
+    parser.add_argument("--duration", type=float, default=2.0, help="1回の計測時間（秒）")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--mode", choices=["asyncio", "threads"], default="asyncio")
+    args = parser.parse_args()
+
+    random.seed(0)
+    for label, shards, incremental in [("single", 1, False), ("sharded", args.shards, True)]:
+        manager, session_ids = asyncio.run(build_manager(shards, args.live, args.expired))
+        if args.mode == "asyncio":
+            latencies, sweep_seconds = asyncio.run(
+                run_asyncio(manager, session_ids, incremental, args.workers, args.duration)
+            )
+        else:
+            latencies, sweep_seconds = run_threads(
+                manager, session_ids, incremental, args.workers, args.duration
+            )
+        report(label, latencies, sweep_seconds, manager)
+
+
+if __name__ == "__main__":
+    main()
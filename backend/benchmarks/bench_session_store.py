@@ -0,0 +1,108 @@
+"""
+セッションストアのベンチマーク（create_sessionの書き込み時間と、保存件数ごとの再起動時間）
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_session_store --sessions 2000 --chars 50000
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from app.session_manager import SessionManager
+from app.session_store import MemorySessionStore, PersistentSessionStore, SQLiteSessionStore
+
+WORDS = [
+    "システム", "要件", "利用者", "認証", "データベース", "画面", "機能", "性能", "応答時間",
+    "は", "を", "に", "する", "こと。", "外部API", "連携", "管理者", "ログ", "保存", "\n",
+]
+
+
+def build_text(chars: int) -> str:
+    parts = []
+    length = 0
+    while length < chars:
+        word = random.choice(WORDS)
+        parts.append(word)
+        length += len(word)
+    return "".join(parts)
+
+
+def percentile(values, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+async def measure_create(label: str, manager: SessionManager, texts, repeat: int):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        await manager.create_session(texts[i % len(texts)], f"doc{i}.docx")
+        timings.append(time.perf_counter() - start)
+
+    print(
+        f"{label:<14} create avg={sum(timings) / len(timings) * 1000:.3f}ms "
+        f"p50={percentile(timings, 0.5) * 1000:.3f}ms p99={percentile(timings, 0.99) * 1000:.3f}ms"
+    )
+
+
+async def measure_restart(path: str, sessions: int, texts):
+    """
+    sessions件を保存したファイルから再起動し、起動時間と初回アクセス時間を計測
+    """
+    manager = SessionManager(store=PersistentSessionStore(MemorySessionStore(), SQLiteSessionStore(path)))
+    session_ids = [await manager.create_session(texts[i % len(texts)], f"doc{i}.docx") for i in range(sessions)]
+
+    start = time.perf_counter()
+    restarted = SessionManager(store=PersistentSessionStore(MemorySessionStore(), SQLiteSessionStore(path)))
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    session = await restarted.get_session_data(random.choice(session_ids))
+    session['extracted_text']
+    first_access = time.perf_counter() - start
+
+    print(
+        f"restart with {sessions:>6} sessions: startup={startup * 1000:.2f}ms "
+        f"first_access={first_access * 1000:.2f}ms file={os.path.getsize(path) / (1024 * 1024):.1f}MB"
+    )
+
+
+async def run(args):
+    random.seed(0)
+    texts = [build_text(args.chars) for _ in range(8)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        await measure_create("memory", SessionManager(store=MemorySessionStore()), texts, args.repeat)
+        await measure_create(
+            "memory+sqlite",
+            SessionManager(store=PersistentSessionStore(
+                MemorySessionStore(), SQLiteSessionStore(os.path.join(directory, "persist.db"))
+            )),
+            texts,
+            args.repeat,
+        )
+        await measure_create(
+            "sqlite",
+            SessionManager(store=SQLiteSessionStore(os.path.join(directory, "shared.db"))),
+            texts,
+            args.repeat,
+        )
+
+        for sessions in sorted({max(1, args.sessions // 100), max(1, args.sessions // 10), args.sessions}):
+            await measure_restart(os.path.join(directory, f"restart-{sessions}.db"), sessions, texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="セッションストアのベンチマーク")
+    parser.add_argument("--sessions", type=int, default=2000, help="再起動時間を計測する最大の保存件数")
+    parser.add_argument("--chars", type=int, default=50000, help="1セッションあたりの抽出テキストの文字数")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
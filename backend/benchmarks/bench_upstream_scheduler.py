@@ -0,0 +1,136 @@
+"""
+UpstreamSchedulerのベンチマーク（レート制限付きのローカルスタブサーバーに対して生成リクエストを送信）
+
+スタブサーバーは1分あたりのリクエスト数の上限を超えると429とRetry-Afterを返し、一定の割合で503を返す。
+
+使い方（backendディレクトリで実行）:
+    python -m benchmarks.bench_upstream_scheduler --requests 200 --server-rpm 600 --client-rpm 570
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+def build_stub_app(rpm: int, latency: float, error_rate: float) -> FastAPI:
+    """
+    Chat Completions APIを模したスタブサーバーを作成
+    """
+    app = FastAPI()
+    # 上流と同じく1分あたりの上限まで貯まり、連続的に補充されるバケットで制限する
+    bucket = {"tokens": float(rpm), "updated": time.monotonic()}
+    counts = {"ok": 0, "rate_limited": 0, "server_error": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions():
+        now = time.monotonic()
+        bucket["tokens"] = min(float(rpm), bucket["tokens"] + (now - bucket["updated"]) * rpm / 60)
+        bucket["updated"] = now
+        if bucket["tokens"] < 1:
+            counts["rate_limited"] += 1
+            retry_after = (1 - bucket["tokens"]) * 60 / rpm
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429,
+                headers={"retry-after-ms": str(int(retry_after * 1000))},
+            )
+        bucket["tokens"] -= 1
+
+        if random.random() < error_rate:
+            counts["server_error"] += 1
+            return JSONResponse({"error": {"message": "Service unavailable"}}, status_code=503)
+
+        await asyncio.sleep(latency)
+        counts["ok"] += 1
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "stub"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+        }
+
+    app.state.counts = counts
+    return app
+
+
+def start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_load(requests: int):
+    from app.openai_client import OpenAIClient
+
+    client = OpenAIClient()
+    failures = 0
+    start = time.perf_counter()
+
+    async def one(i: int):
+        nonlocal failures
+        try:
+            # プロンプトを変えてキャッシュ・相乗りを避ける
+            await client._create_completion(f"request {i}", max_tokens=16, temperature=0.0)
+        except Exception:
+            failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stats = client.get_stats()
+    await client.aclose()
+    return elapsed, failures, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UpstreamSchedulerのベンチマーク")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--server-rpm", type=int, default=600)
+    parser.add_argument("--client-rpm", type=int, default=0, help="OPENAI_RPM_LIMIT（0で無制限）")
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    app = build_stub_app(args.server_rpm, args.latency, args.error_rate)
+    server = start_server(app, args.port)
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ["OPENAI_RPM_LIMIT"] = str(args.client_rpm)
+    os.environ["OPENAI_RESPONSE_CACHE_MAX_MB"] = "0"
+    os.environ.setdefault("OPENAI_RETRY_MAX_DELAY", "5")
+
+    try:
+        elapsed, failures, stats = asyncio.run(run_load(args.requests))
+    finally:
+        server.should_exit = True
+
+    completed = args.requests - failures
+    print(
+        f"requests={args.requests} completed={completed} failed={failures} "
+        f"elapsed={elapsed:.2f}s throughput={completed / elapsed * 60:.0f}/min"
+    )
+    print(f"server: {app.state.counts}")
+    print(
+        f"scheduler: retries={stats['retries']} rate_limited={stats['rate_limited']} "
+        f"server_errors={stats['server_errors']} concurrency_limit={stats['concurrency_limit']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+共有セッションストア（RedisSessionStore / SQLiteSessionStore）のテスト
+
+Redisはfakeredis、複数のワーカーは同じSQLiteファイルを開いた2つのストアで代用する
+"""
+import time
+import asyncio
+import threading
+
+import pytest
+
+from app.session_manager import SessionManager
+from app.session_store import TEXT_FIELD, RedisSessionStore, SQLiteSessionStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_session(text: bytes = b"compressed", **fields) -> dict:
+    return {TEXT_FIELD: text, "filename": "a.docx", "text_length": 10, "created_at": 1.0, "last_accessed": 1.0, **fields}
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def redis_store(redis_client):
+    return RedisSessionStore("redis://unused", prefix="test:", client=redis_client)
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+class TestRedisSessionStore:
+    def test_create_and_get(self, redis_store):
+        redis_store.create("s1", make_session(requirements_digest={"security": ["MFA"]}), time.time() + 60)
+
+        session = redis_store.get("s1", time.time())
+        assert session[TEXT_FIELD] == b"compressed"
+        assert session["filename"] == "a.docx"
+        assert session["requirements_digest"] == {"security": ["MFA"]}
+
+    def test_text_is_stored_under_separate_key(self, redis_store, redis_client):
+        redis_store.create("s1", make_session(), time.time() + 60)
+
+        assert redis_client.get("test:s1:text") == b"compressed"
+        assert b"compressed_text" not in redis_client.hkeys("test:s1")
+        session = redis_store.get("s1", time.time(), include_text=False)
+        assert TEXT_FIELD not in session
+        assert session["text_length"] == 10
+
+    def test_update_merges_fields(self, redis_store):
+        redis_store.create("s1", make_session(), time.time() + 60)
+
+        assert redis_store.update("s1", {"generated:security": {"content": "要件"}, "last_accessed": 2.0}, time.time())
+        session = redis_store.get("s1", time.time())
+        assert session["generated:security"] == {"content": "要件"}
+        assert session["last_accessed"] == 2.0
+        assert session["filename"] == "a.docx"
+
+    def test_update_missing_session_does_not_create_it(self, redis_store, redis_client):
+        assert not redis_store.update("missing", {"last_accessed": 2.0}, time.time())
+        assert not redis_client.exists("test:missing")
+        assert redis_store.get("missing", time.time()) is None
+
+    def test_delete_removes_both_keys(self, redis_store, redis_client):
+        redis_store.create("s1", make_session(), time.time() + 60)
+
+        assert redis_store.delete("s1")
+        assert not redis_client.exists("test:s1", "test:s1:text")
+        assert redis_store.count(time.time()) == 0
+        assert not redis_store.delete("s1")
+
+    def test_expired_session(self, redis_store, redis_client):
+        redis_store.create("s1", make_session(), time.time() + 0.05)
+        redis_store.create("s2", make_session(), time.time() + 60)
+        time.sleep(0.1)
+
+        assert redis_store.get("s1", time.time()) is None
+        assert not redis_client.exists("test:s1:text")
+        assert not redis_store.update("s1", {"last_accessed": 2.0}, time.time())
+        assert redis_store.count(time.time()) == 1
+        assert redis_store.delete_expired(time.time()) == 1
+        assert redis_store.get_stats()["sessions"] == 1
+
+    def test_recreate_replaces_session(self, redis_store):
+        redis_store.create("s1", make_session(stale=True), time.time() + 60)
+        redis_store.create("s1", make_session(b"new"), time.time() + 60)
+
+        session = redis_store.get("s1", time.time())
+        assert session[TEXT_FIELD] == b"new"
+        assert "stale" not in session
+
+
+class TestSQLiteSessionStore:
+    def test_sessions_are_shared_between_workers(self, sqlite_path):
+        worker_a = SQLiteSessionStore(sqlite_path)
+        worker_b = SQLiteSessionStore(sqlite_path)
+
+        worker_a.create("s1", make_session(), time.time() + 60)
+        assert worker_b.get("s1", time.time())[TEXT_FIELD] == b"compressed"
+
+        assert worker_b.update("s1", {"requirements_digest": {"security": ["MFA"]}}, time.time())
+        assert worker_a.get("s1", time.time(), include_text=False)["requirements_digest"] == {"security": ["MFA"]}
+
+        assert worker_a.delete("s1")
+        assert worker_b.get("s1", time.time()) is None
+        assert not worker_b.update("s1", {"last_accessed": 2.0}, time.time())
+
+    def test_include_text(self, sqlite_path):
+        store = SQLiteSessionStore(sqlite_path)
+        store.create("s1", make_session(), time.time() + 60)
+
+        session = store.get("s1", time.time(), include_text=False)
+        assert TEXT_FIELD not in session
+        assert session["filename"] == "a.docx"
+
+    def test_concurrent_updates_from_two_workers_keep_all_fields(self, sqlite_path):
+        worker_a = SQLiteSessionStore(sqlite_path)
+        worker_b = SQLiteSessionStore(sqlite_path)
+        worker_a.create("s1", make_session(), time.time() + 60)
+
+        def update(store, prefix):
+            for i in range(50):
+                assert store.update("s1", {f"{prefix}{i}": i}, time.time())
+
+        threads = [
+            threading.Thread(target=update, args=(worker_a, "a")),
+            threading.Thread(target=update, args=(worker_b, "b")),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        session = worker_a.get("s1", time.time(), include_text=False)
+        assert all(session[f"a{i}"] == i and session[f"b{i}"] == i for i in range(50))
+
+    def test_expired_sessions(self, sqlite_path):
+        worker_a = SQLiteSessionStore(sqlite_path)
+        worker_b = SQLiteSessionStore(sqlite_path)
+        now = time.time()
+        worker_a.create("old", make_session(), now - 1)
+        worker_a.create("live", make_session(), now + 60)
+
+        assert worker_b.get("old", now) is None
+        assert worker_b.count(now) == 1
+        assert worker_b.delete_expired(now) == 1
+        assert worker_a.get_stats()["sessions"] == 1
+
+
+def test_reads_do_not_write_to_shared_store(sqlite_path):
+    store = SQLiteSessionStore(sqlite_path)
+    manager = SessionManager(store=store)
+    writes = []
+    update = store.update
+    store.update = lambda *args: writes.append(args) or update(*args)
+
+    async def scenario():
+        session_id = await manager.create_session("要件定義書", "a.docx")
+        first = await manager.get_session_data(session_id)
+        second = await manager.get_session_data(session_id, include_text=False)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert writes == []
+    assert first["extracted_text"] == "要件定義書"
+    assert first.last_accessed == second.last_accessed
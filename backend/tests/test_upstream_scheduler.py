@@ -0,0 +1,176 @@
+"""
+UpstreamSchedulerのテスト（OpenAI APIの呼び出しは429などを返す関数、時刻と待機は偽の時計で代用する）
+"""
+import asyncio
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app import upstream_scheduler
+from app.upstream_scheduler import TokenBucket, UpstreamScheduler
+
+
+class FakeClock:
+    """
+    asyncio.sleepで待った分だけ進む時計
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += max(0.0, delay)
+        await real_sleep(0)
+
+
+real_sleep = asyncio.sleep
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(upstream_scheduler, "time", fake)
+    monkeypatch.setattr(asyncio, "sleep", fake.sleep)
+    return fake
+
+
+def rate_limit_error(headers=None) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def fail_then_succeed(errors):
+    """
+    errorsを順に送出し、その後は"ok"を返すcreate関数
+    """
+    calls = []
+
+    async def create():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return create, calls
+
+
+def make_scheduler(**kwargs) -> UpstreamScheduler:
+    options = {"max_concurrency": 8, "rpm_limit": 0, "tpm_limit": 0, "base_delay": 0.0, "max_delay": 10.0}
+    options.update(kwargs)
+    return UpstreamScheduler(**options)
+
+
+def test_rate_limit_is_retried(clock):
+    async def scenario():
+        scheduler = make_scheduler()
+        create, calls = fail_then_succeed([rate_limit_error(), rate_limit_error()])
+        return scheduler, await scheduler.call(create), calls
+
+    scheduler, result, calls = asyncio.run(scenario())
+    assert result == "ok"
+    assert len(calls) == 3
+    stats = scheduler.get_stats()
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_retry_honors_retry_after(clock):
+    async def scenario():
+        scheduler = make_scheduler()
+        create, _ = fail_then_succeed([rate_limit_error({"retry-after": "3"})])
+        return await scheduler.call(create)
+
+    assert asyncio.run(scenario()) == "ok"
+    # 再試行前の待機（ジッターなし）と、停止期間の経過後に枠を確保するまでの待機
+    assert clock.sleeps[0] == pytest.approx(3.0)
+    assert sum(clock.sleeps) == pytest.approx(3.0)
+
+
+def test_retry_after_is_capped_at_max_delay(clock):
+    async def scenario():
+        scheduler = make_scheduler(max_delay=5.0)
+        create, _ = fail_then_succeed([rate_limit_error({"retry-after": "120"})])
+        return await scheduler.call(create)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert clock.sleeps[0] == pytest.approx(5.0)
+    assert max(clock.sleeps) <= 5.0
+
+
+def test_retry_after_ms_takes_precedence(clock):
+    async def scenario():
+        scheduler = make_scheduler()
+        create, _ = fail_then_succeed([rate_limit_error({"retry-after-ms": "250", "retry-after": "9"})])
+        return await scheduler.call(create)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert clock.sleeps[0] == pytest.approx(0.25)
+
+
+def test_concurrency_halves_on_rate_limit_and_recovers_additively(clock):
+    async def scenario():
+        scheduler = make_scheduler(max_concurrency=8)
+        create, _ = fail_then_succeed([rate_limit_error()])
+        await scheduler.call(create)
+        halved = scheduler._limit
+
+        # クールダウン中の429では続けて下げない
+        await scheduler.acquire()
+        await scheduler.release(success=False, rate_limited=True)
+        after_cooldown_hit = scheduler._limit
+
+        limits = []
+        for _ in range(40):
+            await scheduler.acquire()
+            await scheduler.release(success=True)
+            limits.append(scheduler._limit)
+        return halved, after_cooldown_hit, limits
+
+    halved, after_cooldown_hit, limits = asyncio.run(scenario())
+    # 成功した1回分（+1/limit）を含む
+    assert halved == pytest.approx(4.0 + 1 / 4.0)
+    assert after_cooldown_hit == halved
+    previous = halved
+    for limit in limits:
+        assert limit == pytest.approx(min(8.0, previous + 1 / previous))
+        previous = limit
+    assert limits[-1] == 8.0
+
+
+def test_concurrency_halves_again_after_cooldown(clock):
+    async def scenario():
+        scheduler = make_scheduler(max_concurrency=8)
+        for _ in range(2):
+            await scheduler.acquire()
+            await scheduler.release(success=False, rate_limited=True)
+            clock.now += UpstreamScheduler.DECREASE_COOLDOWN
+        return scheduler.concurrency_limit
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_token_bucket_clamps_oversize_requests(clock):
+    async def scenario():
+        bucket = TokenBucket(60)
+        # 容量（60）を超える要求も満杯のバケットで送信できる
+        await bucket.acquire(1000)
+        first_wait = sum(clock.sleeps)
+        # 次の同じ要求は容量分が補充されるまで（60秒）待つ
+        await bucket.acquire(1000)
+        return first_wait, sum(clock.sleeps) - first_wait, bucket.available
+
+    first_wait, second_wait, available = asyncio.run(scenario())
+    assert first_wait == 0
+    assert second_wait == pytest.approx(60.0)
+    assert available == pytest.approx(0.0)
@@ -113,7 +113,7 @@ const App: React.FC = () => {
         setState(prev => ({
           ...prev,
           isLoading: false,
-          extractedText: response.extracted_text,
+          extractedText: response.extracted_text ?? null,
           generatedRequirements: response.generated_requirements,
           sessionId: response.session_id,
           currentStep: 'result',
@@ -147,23 +147,27 @@ const App: React.FC = () => {
           }
           sessionId = state.sessionId;
         } else {
-          // 新しいファイルアップロードの場合
+          // 新しいファイルアップロードの場合（作成されたセッションを以降の生成で再利用）
           switch (generationType) {
             case 'functional-diagram':
               const diagResponse = await ApiService.generateFunctionalDiagram(file);
               result = diagResponse.functional_diagram;
+              sessionId = diagResponse.session_id;
               break;
             case 'external-interfaces':
               const extResponse = await ApiService.generateExternalInterfaces(file);
               result = extResponse.external_interfaces;
+              sessionId = extResponse.session_id;
               break;
             case 'performance':
               const perfResponse = await ApiService.generatePerformanceRequirements(file);
               result = perfResponse.performance_requirements;
+              sessionId = perfResponse.session_id;
               break;
             case 'security':
               const secResponse = await ApiService.generateSecurityRequirements(file);
               result = secResponse.security_requirements;
+              sessionId = secResponse.session_id;
               break;
           }
         }
@@ -512,10 +516,11 @@ const App: React.FC = () => {
         {state.currentStep === 'result' && state.uploadedFile && (
           <div className="result-section">
             {(state.generationType === 'comprehensive' || state.generationType === 'basic') && 
-             state.extractedText && state.generatedRequirements ? (
+             state.generatedRequirements ? (
               <ResultDisplay
                 filename={state.uploadedFile.name}
                 extractedText={state.extractedText}
+                sessionId={state.sessionId}
                 generatedRequirements={state.generatedRequirements}
                 onDownload={handleDownload}
                 onReset={handleReset}
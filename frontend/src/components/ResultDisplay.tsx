@@ -1,14 +1,28 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { ResultDisplayProps } from '../types';
+import { ApiService } from '../services/api';
 
 const ResultDisplay: React.FC<ResultDisplayProps> = ({
   filename,
   extractedText,
+  sessionId,
   generatedRequirements,
   onDownload,
   onReset,
 }) => {
   const [activeTab, setActiveTab] = useState<'generated' | 'extracted'>('generated');
+  const [loadedText, setLoadedText] = useState<string | null>(null);
+  const [textError, setTextError] = useState<string | null>(null);
+
+  // 抽出テキストは生成のレスポンスに含めないため、タブを開いた時点でセッションから取得する
+  useEffect(() => {
+    if (activeTab !== 'extracted' || extractedText !== null || loadedText !== null || !sessionId) {
+      return;
+    }
+    ApiService.getSessionText(sessionId)
+      .then((response) => setLoadedText(response.extracted_text))
+      .catch((error) => setTextError(error instanceof Error ? error.message : '抽出テキストを取得できませんでした'));
+  }, [activeTab, extractedText, loadedText, sessionId]);
 
   return (
     <div style={{
@@ -332,7 +346,7 @@ const ResultDisplay: React.FC<ResultDisplayProps> = ({
               maxHeight: '600px',
               overflowY: 'auto'
             }}>
-              {extractedText}
+              {extractedText ?? loadedText ?? textError ?? '読み込み中...'}
             </div>
           </div>
         )}
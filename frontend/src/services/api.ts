@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { SystemRequirementsResponse, FileUploadResponse } from '../types';
+import { SystemRequirementsResponse, FileUploadResponse, StreamHandlers, StreamSection, JobSubmission, JobStatus, GenerateAllResponse, BatchResponse } from '../types';
 
 // APIベースURL
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8002';
@@ -36,9 +36,13 @@ export class ApiService {
   /**
    * 要件定義書をアップロードしてシステム要件定義書を生成
    */
-  static async uploadAndGenerate(file: File): Promise<SystemRequirementsResponse> {
+  static async uploadAndGenerate(file: File, includeText = false): Promise<SystemRequirementsResponse> {
     const formData = new FormData();
     formData.append('file', file);
+    if (!includeText) {
+      // 抽出テキストは必要になった時点で getSessionText で取得する
+      formData.append('include_text', 'false');
+    }
 
     const response = await apiClient.post<SystemRequirementsResponse>(
       '/upload-and-generate',
@@ -76,9 +80,13 @@ export class ApiService {
   /**
    * 包括的なシステム要件定義書を生成
    */
-  static async generateComprehensive(file: File): Promise<SystemRequirementsResponse> {
+  static async generateComprehensive(file: File, includeText = false): Promise<SystemRequirementsResponse> {
     const formData = new FormData();
     formData.append('file', file);
+    if (!includeText) {
+      // 抽出テキストは必要になった時点で getSessionText で取得する
+      formData.append('include_text', 'false');
+    }
 
     const response = await apiClient.post<SystemRequirementsResponse>(
       '/generate-comprehensive',
@@ -101,7 +109,7 @@ export class ApiService {
   /**
    * 機能構成図を生成
    */
-  static async generateFunctionalDiagram(file: File): Promise<{ original_filename: string; functional_diagram: string; status: string }> {
+  static async generateFunctionalDiagram(file: File): Promise<{ original_filename: string; functional_diagram: string; session_id: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('file', file);
 
@@ -116,7 +124,7 @@ export class ApiService {
   /**
    * 外部インターフェース要件を生成
    */
-  static async generateExternalInterfaces(file: File): Promise<{ original_filename: string; external_interfaces: string; status: string }> {
+  static async generateExternalInterfaces(file: File): Promise<{ original_filename: string; external_interfaces: string; session_id: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('file', file);
 
@@ -131,7 +139,7 @@ export class ApiService {
   /**
    * 性能要件を生成
    */
-  static async generatePerformanceRequirements(file: File): Promise<{ original_filename: string; performance_requirements: string; status: string }> {
+  static async generatePerformanceRequirements(file: File): Promise<{ original_filename: string; performance_requirements: string; session_id: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('file', file);
 
@@ -146,7 +154,7 @@ export class ApiService {
   /**
    * セキュリティ要件を生成
    */
-  static async generateSecurityRequirements(file: File): Promise<{ original_filename: string; security_requirements: string; status: string }> {
+  static async generateSecurityRequirements(file: File): Promise<{ original_filename: string; security_requirements: string; session_id: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('file', file);
 
@@ -158,12 +166,59 @@ export class ApiService {
     return response.data;
   }
 
+  /**
+   * ファイルまたはセッションIDから複数のセクションを並行して生成（sectionsを省略すると個別の4セクション）
+   */
+  static async generateAll(
+    source: { file?: File; sessionId?: string },
+    sections?: StreamSection[],
+    regenerate = false
+  ): Promise<GenerateAllResponse> {
+    const formData = new FormData();
+    if (source.file) {
+      formData.append('file', source.file);
+    } else if (source.sessionId) {
+      formData.append('session_id', source.sessionId);
+    }
+    if (sections && sections.length > 0) {
+      formData.append('sections', sections.join(','));
+    }
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
+
+    const response = await apiClient.post<GenerateAllResponse>('/generate-all', formData);
+
+    return response.data;
+  }
+
+  /**
+   * 複数の要件定義書をまとめてアップロードし、ファイルごとに生成（sectionsを省略するとcomprehensive）
+   */
+  static async batchGenerate(files: File[], sections?: StreamSection[], regenerate = false): Promise<BatchResponse> {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    if (sections && sections.length > 0) {
+      formData.append('sections', sections.join(','));
+    }
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
+
+    const response = await apiClient.post<BatchResponse>('/batch/generate', formData);
+
+    return response.data;
+  }
+
   /**
    * セッションIDを使用して機能構成図を生成
    */
-  static async generateFunctionalDiagramFromSession(sessionId: string): Promise<{ original_filename: string; functional_diagram: string; status: string }> {
+  static async generateFunctionalDiagramFromSession(sessionId: string, regenerate = false): Promise<{ original_filename: string; functional_diagram: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('session_id', sessionId);
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
 
     const response = await apiClient.post(
       '/generate-from-session/functional-diagram',
@@ -176,9 +231,12 @@ export class ApiService {
   /**
    * セッションIDを使用して外部インターフェース要件を生成
    */
-  static async generateExternalInterfacesFromSession(sessionId: string): Promise<{ original_filename: string; external_interfaces: string; status: string }> {
+  static async generateExternalInterfacesFromSession(sessionId: string, regenerate = false): Promise<{ original_filename: string; external_interfaces: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('session_id', sessionId);
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
 
     const response = await apiClient.post(
       '/generate-from-session/external-interfaces',
@@ -191,9 +249,12 @@ export class ApiService {
   /**
    * セッションIDを使用して性能要件を生成
    */
-  static async generatePerformanceRequirementsFromSession(sessionId: string): Promise<{ original_filename: string; performance_requirements: string; status: string }> {
+  static async generatePerformanceRequirementsFromSession(sessionId: string, regenerate = false): Promise<{ original_filename: string; performance_requirements: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('session_id', sessionId);
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
 
     const response = await apiClient.post(
       '/generate-from-session/performance-requirements',
@@ -206,9 +267,12 @@ export class ApiService {
   /**
    * セッションIDを使用してセキュリティ要件を生成
    */
-  static async generateSecurityRequirementsFromSession(sessionId: string): Promise<{ original_filename: string; security_requirements: string; status: string }> {
+  static async generateSecurityRequirementsFromSession(sessionId: string, regenerate = false): Promise<{ original_filename: string; security_requirements: string; cached: boolean; status: string }> {
     const formData = new FormData();
     formData.append('session_id', sessionId);
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
 
     const response = await apiClient.post(
       '/generate-from-session/security-requirements',
@@ -218,14 +282,156 @@ export class ApiService {
     return response.data;
   }
 
+  /**
+   * ファイルから指定セクションをストリーミングで生成（トークンを受信するたびにonDeltaを呼び出す）
+   */
+  static async streamGenerate(file: File, section: StreamSection, handlers: StreamHandlers): Promise<void> {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    await ApiService.streamPost(`/stream/generate-${section}`, formData, handlers);
+  }
+
+  /**
+   * セッションIDを使用して指定セクションをストリーミングで生成（生成済みの場合は保存した結果を受信する）
+   */
+  static async streamGenerateFromSession(sessionId: string, section: StreamSection, handlers: StreamHandlers, regenerate = false): Promise<void> {
+    const formData = new FormData();
+    formData.append('session_id', sessionId);
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
+
+    await ApiService.streamPost(`/stream/generate-from-session/${section}`, formData, handlers);
+  }
+
+  /**
+   * ファイルから指定セクションを生成するジョブを投入
+   */
+  static async submitJob(file: File, section: StreamSection): Promise<JobSubmission> {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const response = await apiClient.post<JobSubmission>(`/jobs/generate-${section}`, formData);
+    return response.data;
+  }
+
+  /**
+   * セッションIDを使用して指定セクションを生成するジョブを投入
+   */
+  static async submitJobFromSession(sessionId: string, section: StreamSection, regenerate = false): Promise<JobSubmission> {
+    const formData = new FormData();
+    formData.append('session_id', sessionId);
+    if (regenerate) {
+      formData.append('regenerate', 'true');
+    }
+
+    const response = await apiClient.post<JobSubmission>(`/jobs/generate-from-session/${section}`, formData);
+    return response.data;
+  }
+
+  /**
+   * ジョブの状態・進捗・結果を取得
+   */
+  static async getJob(jobId: string): Promise<JobStatus> {
+    const response = await apiClient.get<JobStatus>(`/jobs/${jobId}`);
+    return response.data;
+  }
+
+  /**
+   * ジョブが完了するまでポーリングし、結果を返す（ページを再読み込みしてもjobIdから再開できる）
+   */
+  static async waitForJob(
+    jobId: string,
+    onProgress?: (job: JobStatus) => void,
+    intervalMs: number = 2000
+  ): Promise<Record<string, any>> {
+    while (true) {
+      const job = await ApiService.getJob(jobId);
+      onProgress?.(job);
+      if (job.status === 'succeeded') {
+        return job.result || {};
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || '生成中にエラーが発生しました');
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  }
+
+  /**
+   * SSEレスポンスを読み込み、イベントごとにハンドラーを呼び出す
+   */
+  private static async streamPost(path: string, formData: FormData, handlers: StreamHandlers): Promise<void> {
+    let response: Response;
+    try {
+      response = await fetch(`${API_BASE_URL}${path}`, { method: 'POST', body: formData });
+    } catch (error) {
+      throw new Error('サーバーに接続できません');
+    }
+
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.detail || 'サーバーエラーが発生しました');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true });
+
+      let separatorIndex = buffer.indexOf('\n\n');
+      while (separatorIndex !== -1) {
+        const message = buffer.slice(0, separatorIndex);
+        buffer = buffer.slice(separatorIndex + 2);
+        separatorIndex = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        let data = '';
+        for (const line of message.split('\n')) {
+          if (line.startsWith('event: ')) {
+            event = line.slice(7);
+          } else if (line.startsWith('data: ')) {
+            data += line.slice(6);
+          }
+        }
+        const payload = data ? JSON.parse(data) : {};
+
+        if (event === 'metadata') {
+          handlers.onMetadata?.(payload);
+        } else if (event === 'delta') {
+          handlers.onDelta(payload.content);
+        } else if (event === 'done') {
+          handlers.onDone?.(payload);
+        } else if (event === 'error') {
+          throw new Error(payload.detail || '生成中にエラーが発生しました');
+        }
+      }
+    }
+  }
+
   /**
    * セッション情報を取得
    */
-  static async getSessionInfo(sessionId: string): Promise<{ session_id: string; filename: string; created_at: string; last_accessed: string; text_length: number }> {
+  static async getSessionInfo(sessionId: string): Promise<{ session_id: string; filename: string; created_at: string; last_accessed: string; text_length: number; available_sections: StreamSection[] }> {
     const response = await apiClient.get(`/session/${sessionId}`);
     return response.data;
   }
 
+  /**
+   * セッションの抽出テキストを取得
+   */
+  static async getSessionText(sessionId: string): Promise<{ session_id: string; filename: string; extracted_text: string; text_length: number }> {
+    const response = await apiClient.get(`/session/${sessionId}/text`);
+    return response.data;
+  }
+
   /**
    * セッションを削除
    */
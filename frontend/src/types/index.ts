@@ -2,12 +2,27 @@
 
 export interface SystemRequirementsResponse {
   original_filename: string;
-  extracted_text: string;
+  extracted_text?: string;
+  text_length?: number;
   generated_requirements: string;
+  generation_report?: GenerationReport;
   session_id: string;
+  cached?: boolean;
   status: string;
 }
 
+export interface GenerationReport {
+  mode: 'sections' | 'single';
+  total_seconds: number;
+  input: {
+    estimated_tokens: number;
+    condensed_tokens: number | null;
+    chunks: number;
+    map_reduce_rounds: number;
+  };
+  sections: { section: string; seconds: number }[];
+}
+
 export interface FileUploadResponse {
   filename: string;
   extracted_text: string;
@@ -54,31 +69,113 @@ export type GenerationType = 'comprehensive' | 'basic' | 'functional-diagram' |
 export interface FunctionalDiagramResponse {
   original_filename: string;
   functional_diagram: string;
+  session_id?: string;
+  cached?: boolean;
   status: string;
 }
 
 export interface ExternalInterfacesResponse {
   original_filename: string;
   external_interfaces: string;
+  session_id?: string;
+  cached?: boolean;
   status: string;
 }
 
 export interface PerformanceRequirementsResponse {
   original_filename: string;
   performance_requirements: string;
+  session_id?: string;
+  cached?: boolean;
   status: string;
 }
 
 export interface SecurityRequirementsResponse {
   original_filename: string;
   security_requirements: string;
+  session_id?: string;
+  cached?: boolean;
+  status: string;
+}
+
+// ストリーミング生成（SSE）のイベント型
+export type StreamSection = 'comprehensive' | 'functional-diagram' | 'external-interfaces' | 'performance-requirements' | 'security-requirements';
+
+export interface StreamDoneEvent {
+  section: StreamSection;
   status: string;
+  finish_reason: string | null;
+  usage: { prompt_tokens: number; completion_tokens: number; total_tokens: number } | null;
+  cached: boolean;
+  timing: { first_token_seconds: number | null; total_seconds: number };
+}
+
+export interface StreamHandlers {
+  onMetadata?: (metadata: { section: StreamSection; original_filename: string; session_id?: string }) => void;
+  onDelta: (content: string) => void;
+  onDone?: (event: StreamDoneEvent) => void;
+}
+
+// 複数セクションの一括生成の型
+export interface GenerateAllResponse {
+  original_filename: string;
+  session_id: string;
+  sections: Partial<Record<StreamSection, { content: string; generation_report: GenerationReport | null; cached: boolean }>>;
+  errors: Partial<Record<StreamSection, string>>;
+  status: 'success' | 'partial';
+}
+
+// 複数ファイルの一括生成の型
+export interface BatchFileResult {
+  index: number;
+  filename: string;
+  status: 'success' | 'partial' | 'error';
+  session_id?: string;
+  sections?: GenerateAllResponse['sections'];
+  errors?: GenerateAllResponse['errors'];
+  stage?: 'upload' | 'extraction' | 'generation';
+  detail?: string;
+}
+
+export interface BatchResponse {
+  sections: StreamSection[];
+  files: BatchFileResult[];
+  succeeded: number;
+  failed: number;
+  status: 'success' | 'partial' | 'error';
+  timing: { total_seconds: number };
+}
+
+// バックグラウンド生成（ジョブ）の型
+export interface JobSubmission {
+  job_id: string;
+  section: StreamSection;
+  status: string;
+  original_filename: string;
+  session_id: string;
+}
+
+export interface JobStatus {
+  job_id: string;
+  kind: StreamSection;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  progress: number | null;
+  message: string;
+  metadata: { original_filename: string; session_id: string };
+  result: Record<string, any> | null;
+  error: string | null;
+  created_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+  expires_at: number | null;
+  queue_position?: number | null;
 }
 
 // 結果表示用の型
 export interface ResultDisplayProps {
   filename: string;
-  extractedText: string;
+  extractedText: string | null;
+  sessionId?: string | null;
   generatedRequirements: string;
   onDownload: () => void;
   onReset: () => void;